@@ -164,8 +164,11 @@ def _create_row(
 
 
 def export_supplier_details(
-    data_api_client, framework_slug, filename, framework_lot_slugs, map_impl=map, logger=None
+    data_api_client, framework_slug, filename, framework_lot_slugs, map_impl=map, logger=None, export_format='csv',
+    bulk=False,
 ):
-    records = find_suppliers_with_details_and_draft_service_counts(data_api_client, framework_slug, map_impl=map_impl)
+    records = find_suppliers_with_details_and_draft_service_counts(
+        data_api_client, framework_slug, map_impl=map_impl, bulk=bulk
+    )
     headers, rows_iter = get_csv_rows(records, framework_slug, framework_lot_slugs, logger=logger)
-    write_csv(headers, rows_iter, filename)
+    write_csv(headers, rows_iter, filename, export_format=export_format)
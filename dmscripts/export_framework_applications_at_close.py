@@ -56,6 +56,10 @@ class GenerateFrameworkApplicationsCSV(GenerateCSVFromAPI):
         """Method to actually populate our output placeholder."""
         self._update_with_supplier_data(self.output)
 
+    def generate_rows(self):
+        """Yield a row per supplier as soon as its services have been counted."""
+        return self._generate_supplier_rows()
+
     def get_supplier_service_data(self, supplier_id):
         """Given a supplier ID return a list of dictionaries for services related to framework."""
         return self.client.find_draft_services_iter(supplier_id, framework=self.target_framework_slug)
@@ -73,6 +77,10 @@ class GenerateFrameworkApplicationsCSV(GenerateCSVFromAPI):
 
     def _update_with_supplier_data(self, output):
         """Update self.output with supplier data."""
+        output.extend(self._generate_supplier_rows())
+
+    def _generate_supplier_rows(self):
+        """Yield a dict of supplier data and service counts for each supplier on the framework."""
         supplier_frameworks = self.get_supplier_frameworks()
         field_names = self.get_fieldnames()
         supplier_application_statuses = self.get_supplier_application_status()
@@ -97,4 +105,4 @@ class GenerateFrameworkApplicationsCSV(GenerateCSVFromAPI):
                 # Calculate the status of each service an what lot it is in then +1 to the corresponding column.
                 column_name = self.get_column_name(service['status'], service['lotSlug'])
                 supplier_dict[column_name] += 1
-            output.append(supplier_dict)
+            yield supplier_dict
@@ -9,6 +9,7 @@ from dmutils.env_helpers import get_web_url_from_stage
 
 from dmscripts.helpers.csv_helpers import MultiCSVWriter
 from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_service_counts
+from dmscripts.helpers.logging_helpers import ProgressReporter
 
 
 DRAFT_STATUSES = [
@@ -77,12 +78,14 @@ def find_suppliers_with_details(client,
                                 declaration_discretionary_pass_schema,
                                 supplier_ids=None,
                                 map_impl=map,
+                                bulk=False,
                                 ):
     records = find_suppliers_with_details_and_draft_service_counts(
         client,
         framework_slug,
         supplier_ids,
         map_impl=map_impl,
+        bulk=bulk,
     )
     records = list(map(add_failed_questions(questions_numbers,
                                             declaration_definite_pass_schema,
@@ -127,7 +130,22 @@ def admin_link(record):
     return [('admin_link', admin_path)]
 
 
+def made_complete_application(record):
+    if record.get('failed_mandatory') and 'INCOMPLETE' in record.get('failed_mandatory'):
+        return False
+    draft_counts = record.get('counts')
+    # Keys in the Counter are tuples such as ('digital-specialists', 'submitted') so count[1] will match the status
+    # Failed services are also "submitted" and "complete" so count these too
+    completed_count = sum(
+        draft_counts[key] for key in
+        [count for count in draft_counts if count[1] in ['submitted', 'failed']]
+    )
+    return completed_count > 0
+
+
 class SuccessfulHandler(object):
+    ROUTE_KEY = 'onFramework'
+    ROUTE_VALUE = True
     NAME = 'successful'
     CCS_FILENAME_FORMAT = '{}-automatically-successful-suppliers-{}'
 
@@ -148,6 +166,8 @@ class SuccessfulHandler(object):
 
 
 class FailedHandler(object):
+    ROUTE_KEY = 'onFramework'
+    ROUTE_VALUE = False
     NAME = 'failed'
     CCS_FILENAME_FORMAT = '{}-suppliers-who-failed-{}'
 
@@ -159,16 +179,7 @@ class FailedHandler(object):
 
     def should_write(self, record):
         # Only include failed complete applications, not people who didn't make an application
-        if record.get('failed_mandatory') and 'INCOMPLETE' in record.get('failed_mandatory'):
-            return False
-        draft_counts = record.get('counts')
-        # Keys in the Counter are tuples such as ('digital-specialists', 'submitted') so count[1] will match the status
-        # Failed services are also "submitted" and "complete" so count these too
-        completed_count = sum(
-            draft_counts[key] for key in
-            [count for count in draft_counts if count[1] in ['submitted', 'failed']]
-        )
-        if completed_count == 0:
+        if not made_complete_application(record):
             return False
         if not record.get('failed_mandatory'):
             record['failed_mandatory'] = ['No passed lot']
@@ -184,6 +195,8 @@ class FailedHandler(object):
 
 
 class DiscretionaryHandler(object):
+    ROUTE_KEY = 'onFramework'
+    ROUTE_VALUE = None
     NAME = 'discretionary'
     CCS_FILENAME_FORMAT = '{}-suppliers-who-declared-discretionary-data-{}'
 
@@ -194,7 +207,8 @@ class DiscretionaryHandler(object):
         return record['onFramework'] is None
 
     def should_write(self, record):
-        return True
+        # Only include suppliers who made an application, as for FailedHandler
+        return made_complete_application(record)
 
     def create_row(self, record):
         return (
@@ -224,6 +238,8 @@ def export_suppliers(
     declaration_discretionary_pass_schema=None,
     supplier_ids=None,
     map_impl=map,
+    compress=False,
+    bulk=False,
 ):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -238,6 +254,7 @@ def export_suppliers(
         declaration_discretionary_pass_schema,
         supplier_ids,
         map_impl=map_impl,
+        bulk=bulk,
     )
 
     now = datetime.utcnow().strftime("%Y-%m-%d-%H-%M")
@@ -247,11 +264,12 @@ def export_suppliers(
         DiscretionaryHandler(framework_slug, now)
     ]
 
-    with MultiCSVWriter(output_dir, handlers) as writer:
-        for i, record in enumerate(records):
+    progress = ProgressReporter("suppliers", total=len(records), every=100)
+    with MultiCSVWriter(output_dir, handlers, compress=compress, progress=progress) as writer:
+        progress.detail = writer.counts
+        for record in records:
             writer.write_row(record)
-            if (i + 1) % 100 == 0:
-                writer.print_counts()
 
+        progress.finish()
         writer.print_counts()
         print("DONE")
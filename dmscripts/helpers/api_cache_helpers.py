@@ -0,0 +1,152 @@
+"""A read-through cache of API responses, kept on disk so that it lasts between runs of a script."""
+import atexit
+from collections import Counter
+from functools import wraps
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Mapping, Optional
+
+from dmscripts.helpers.logging_helpers import Logger, get_logger
+
+# How long, in seconds, responses from each DataAPIClient method can be reused for. Only methods listed here are
+# cached: anything else, including every method that changes something, goes straight to the API.
+DEFAULT_TTLS = {
+    'find_frameworks': 6 * 60 * 60,
+    'get_framework': 6 * 60 * 60,
+    'get_interested_suppliers': 60 * 60,
+    'get_supplier': 60 * 60,
+    'get_supplier_framework_info': 60 * 60,
+    'get_framework_agreement': 60 * 60,
+}
+
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024
+
+
+class CachedDataAPIClient(object):
+    """Wrap a DataAPIClient so that responses from its read methods are stored in a local SQLite database, and reused
+    until they are older than the TTL for the method
+
+    Responses are keyed by the API's URL, the method and its arguments, and stored compressed. Once they take up more
+    than `max_size` bytes the least recently used are removed. Errors from the API are never cached.
+
+    Methods not listed in `ttls` are passed straight to the client, so writes always go to the API. A script that
+    needs to read back something it has just changed should use `uncached`, which is the wrapped client.
+
+    The cache can be shared by threads. Hit and miss counts are logged when the script exits, or on `close()`.
+    """
+    def __init__(
+        self,
+        client,
+        path: str,
+        ttls: Optional[Mapping[str, float]] = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+        logger: Optional[Logger] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.uncached = client
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_size = max_size
+        self.logger = logger or get_logger()
+        self.clock = clock
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, method TEXT, response BLOB, size INTEGER, stored_at REAL, used_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        atexit.register(self.close)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.uncached, name)
+        if name not in self.ttls or not callable(attribute):
+            return attribute
+
+        @wraps(attribute)
+        def cached(*args, **kwargs):
+            return self._get(name, attribute, args, kwargs)
+
+        return cached
+
+    def _key(self, name, args, kwargs):
+        base_url = getattr(self.uncached, '_base_url', '')
+        return json.dumps([base_url, name, args, kwargs], sort_keys=True, default=str)
+
+    def _get(self, name, method, args, kwargs):
+        key = self._key(name, args, kwargs)
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute("SELECT response, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] < self.ttls[name]:
+                self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+                self.stats['hits'] += 1
+                self.stats[f'{name} hits'] += 1
+                return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+            self.stats['expired' if row is not None else 'misses'] += 1
+            self.stats[f'{name} misses'] += 1
+
+        response = method(*args, **kwargs)
+        self._store(key, name, response, now)
+        return response
+
+    def _store(self, key, name, response, now):
+        compressed = zlib.compress(json.dumps(response).encode('utf-8'))
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._size += len(compressed) - (previous[0] if previous else 0)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, method, response, size, stored_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, name, compressed, len(compressed), now, now),
+            )
+            if self._size > self.max_size:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # remove the least recently used responses until the cache is back under its size limit
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY used_at").fetchall():
+            if self._size <= self.max_size:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._size = 0
+
+    def log_stats(self):
+        requests = self.stats['hits'] + self.stats['misses'] + self.stats['expired']
+        self.logger.info(
+            "API cache: {hits} hits, {misses} misses, {expired} expired, {evictions} evicted "
+            "({hit_rate:.0f}% hit rate)",
+            extra={
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'expired': self.stats['expired'],
+                'evictions': self.stats['evictions'],
+                'hit_rate': 100.0 * self.stats['hits'] / requests if requests else 0.0,
+            }
+        )
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._db.commit()
+            self._db.close()
+        atexit.unregister(self.close)
+        self.log_stats()
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 """Base classes/ helpers for CSV creation."""
 import collections
+import gzip
+import io
 import os
 import sys
 from datetime import date
 
+from dmscripts.helpers.export_helpers import open_export_writer
+from dmscripts.helpers.logging_helpers import ProgressReporter
+
 if sys.version_info > (3, 0):
     import csv
 else:
@@ -17,6 +22,7 @@ class GenerateCSVFromAPI(object):
     def __init__(self, client):
         self.client = client
         self.output = []
+        self.rows_written = 0
 
     def get_fieldnames(self):
         raise NotImplementedError("Required: Method for getting fieldnames.")
@@ -25,6 +31,15 @@ class GenerateCSVFromAPI(object):
         """Generally you should populate self.output here."""
         raise NotImplementedError("Required: Method for populating output.")
 
+    def generate_rows(self):
+        """Yield the rows for the CSV one at a time.
+
+        Override this to stream rows straight from the API. By default it falls back to populate_output and
+        iterates over self.output, so subclasses that only implement populate_output keep working.
+        """
+        self.populate_output()
+        return iter(self.output)
+
     def write_csv(self, outfile=None):
         """Write CSV header from get_fieldnames and contents from self.output."""
         outfile = outfile or sys.stdout
@@ -34,6 +49,34 @@ class GenerateCSVFromAPI(object):
         for row in self.output:
             writer.writerow(row)
 
+    def stream_csv(self, outfile=None, progress=None, flush_every=100):
+        """Write CSV header from get_fieldnames and each row from generate_rows as soon as it is produced.
+
+        Rows are not kept in memory, and the file is flushed every `flush_every` rows so the output written so far
+        survives if the script dies part way through.
+
+        :param progress: optional logging_helpers.ProgressReporter, updated after each row
+        :return: the number of rows written
+        """
+        outfile = outfile or sys.stdout
+        writer = csv.DictWriter(outfile, lineterminator="\n", fieldnames=self.get_fieldnames())
+
+        writer.writeheader()
+        outfile.flush()
+        self.rows_written = 0
+        for row in self.generate_rows():
+            writer.writerow(row)
+            self.rows_written += 1
+            if self.rows_written % flush_every == 0:
+                outfile.flush()
+            if progress is not None:
+                progress.update()
+        outfile.flush()
+        if progress is not None:
+            progress.finish()
+
+        return self.rows_written
+
 
 class MultiCSVWriter(object):
     """
@@ -45,78 +88,165 @@ class MultiCSVWriter(object):
         Handlers need to implement three methods:
         * matches(record) - returns a boolean, True if the handler will deal with the record passed in
         * should_write(record) - returns a boolean, True if the handler should write a line for this particular record
-        * create_row(record) - returns a list of things that should be written as a csv row from the record
+        * create_row(record) - returns a list of things that should be written as a csv row from the record, as
+          (field name, value) pairs in the same order for every record. A row with different fields to the first
+          row its handler wrote raises a ValueError
+
+        Handlers can also set ROUTE_KEY and ROUTE_VALUE, meaning they match any record where
+        record[ROUTE_KEY] == ROUTE_VALUE. When every handler does this the writer finds the handler for a record
+        with a single dict lookup instead of asking each handler in turn.
+
+        Each file gets a `buffer_size` byte write buffer, and is gzipped (with a .csv.gz extension) if `compress`.
+        If `progress` is a logging_helpers.ProgressReporter it is updated for every record.
     """
-    def __init__(self, output_dir, handlers):
+    DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, output_dir, handlers, buffer_size=DEFAULT_BUFFER_SIZE, compress=False, progress=None):
         self.output_dir = output_dir
         self.handlers = handlers
+        self.buffer_size = buffer_size
+        self.compress = compress
+        self.progress = progress
         self._csv_writers = dict()
         self._csv_files = dict()
+        self._fieldnames = dict()
         self._counters = collections.Counter()
+        self._route_key, self._routes = self._compile_routes(handlers)
+
+    @staticmethod
+    def _compile_routes(handlers):
+        route_keys = {getattr(handler, 'ROUTE_KEY', None) for handler in handlers}
+        if len(route_keys) != 1 or None in route_keys:
+            return None, None
+
+        routes = dict()
+        for handler in handlers:
+            # the first handler for a value wins, as it would when asking each handler in turn
+            routes.setdefault(handler.ROUTE_VALUE, handler)
+        return route_keys.pop(), routes
+
+    def handler_for(self, record):
+        if self._route_key is not None:
+            handler = self._routes.get(record.get(self._route_key))
+            if handler is not None:
+                return handler
+        else:
+            for handler in self.handlers:
+                if handler.matches(record):
+                    return handler
+        raise ValueError("record not handled by any handler")
 
     def write_row(self, record):
-        for handler in self.handlers:
-            should_write = handler.should_write(record)
-            if handler.matches(record) and should_write:
-                self._counters.update([handler.NAME])
-                row = handler.create_row(record)
-                return self.csv_writer(handler, row).writerow(dict(row))
-            elif not should_write:
-                return self.csv_writer
-        raise ValueError("record not handled by any handler")
+        if self.progress is not None:
+            self.progress.update()
+        handler = self.handler_for(record)
+        if not handler.should_write(record):
+            return
+        self._counters[handler.NAME] += 1
+        row = handler.create_row(record)
+        writer = self.csv_writer(handler, row)
+        # rows are written by position, so a row with different fields to the header would be written to the wrong
+        # columns
+        if [key for key, _ in row] != self._fieldnames[handler.NAME]:
+            raise ValueError("row fields for {} don't match its header: {}".format(
+                handler.NAME, [key for key, _ in row]
+            ))
+        return writer.writerow([value for _, value in row])
 
     def csv_writer(self, handler, row):
-        if handler.NAME not in self._csv_writers:
-            fieldnames = [key for key, _ in row]
-            self._csv_writers[handler.NAME] = csv.DictWriter(self._csv_files[handler.NAME], fieldnames=fieldnames)
-            self._csv_writers[handler.NAME].writeheader()
+        writer = self._csv_writers.get(handler.NAME)
+        if writer is None:
+            writer = self._csv_writers[handler.NAME] = csv.writer(self._csv_files[handler.NAME])
+            self._fieldnames[handler.NAME] = [key for key, _ in row]
+            writer.writerow(self._fieldnames[handler.NAME])
 
-        return self._csv_writers[handler.NAME]
+        return writer
 
     def csv_path(self, handler):
-        return os.path.join(self.output_dir, handler.filename + '.csv')
+        return os.path.join(self.output_dir, handler.filename + ('.csv.gz' if self.compress else '.csv'))
+
+    def _open(self, path):
+        if self.compress:
+            return io.TextIOWrapper(io.BufferedWriter(gzip.GzipFile(path, 'wb'), self.buffer_size))
+        return open(path, 'w', buffering=self.buffer_size)
 
     def __enter__(self):
         for handler in self.handlers:
-            self._csv_files[handler.NAME] = open(self.csv_path(handler), 'w+')
+            self._csv_files[handler.NAME] = self._open(self.csv_path(handler))
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         for f in self._csv_files.values():
             f.close()
 
+    def counts(self):
+        return " ".join("{}={}".format(handler.NAME, self._counters[handler.NAME]) for handler in self.handlers)
+
     def print_counts(self):
-        print(" ".join("{}={}".format(handler.NAME, self._counters[handler.NAME]) for handler in self.handlers))
+        print(self.counts())
 
 
 def make_fields_from_content_questions(questions, record):
-    return [
-        field
-        for question in questions
-        for field in _make_fields_from_content_question(question, record)
-    ]
+    return ContentQuestionFields(questions)(record)
 
 
-def _make_fields_from_content_question(question, record):
-    if question["type"] == "checkboxes":
-        for option in question.options:
+class ContentQuestionFields(object):
+    """
+       Make CSV fields for a record's services from a list of content questions
+
+       The questions are inspected once, when this is created, rather than for every record, so build one of these
+       per content manifest and call it with each record:
+
+           fields = ContentQuestionFields(questions)
+           rows = [fields(record) for record in records]
+
+       Calling it with a record returns the same (field name, value) pairs as make_fields_from_content_questions.
+    """
+    def __init__(self, questions):
+        self._extractors = [self._compile(question) for question in questions]
+
+    def __call__(self, record):
+        if not self._extractors:
+            return []
+
+        services = record["services"]
+        fields = []
+        for extractor in self._extractors:
+            fields.extend(extractor(services))
+        return fields
+
+    @staticmethod
+    def _compile(question):
+        if question["type"] == "checkboxes":
             # Make a CSV column for each label
-            yield (
-                make_field_title(question.id, option["label"]),
-                count_field_in_record(question.id, option["label"], record)
-            )
-    elif hasattr(question, 'fields'):
-        for field_id in sorted(question.fields.values()):
+            question_id = question.id
+            columns = [(make_field_title(question_id, option["label"]), option["label"]) for option in question.options]
+
+            def count_labels(services):
+                answers = [service.get(question_id, []) for service in services]
+                answers = [set(answer) if isinstance(answer, list) else answer for answer in answers]
+                return [(title, sum(1 for answer in answers if label in answer)) for title, label in columns]
+
+            return count_labels
+
+        if hasattr(question, 'fields'):
             # Make a CSV column containing all values
-            yield (
-                field_id,
-                "|".join(service.get(field_id, "") for service in record["services"])
-            )
-    else:
-        yield (
-            question["id"],
-            "|".join(str(service.get(question["id"], "")) for service in record["services"])
-        )
+            field_ids = sorted(question.fields.values())
+
+            def join_fields(services):
+                return [
+                    (field_id, "|".join(service.get(field_id, "") for service in services))
+                    for field_id in field_ids
+                ]
+
+            return join_fields
+
+        question_id = question["id"]
+
+        def join_values(services):
+            return [(question_id, "|".join(str(service.get(question_id, "")) for service in services))]
+
+        return join_values
 
 
 def make_field_title(field_id, field_label):
@@ -138,34 +268,42 @@ def read_csv(filepath):
     return all_rows
 
 
-def write_csv(headers, rows_iter, filename):
-    """Write a list of rows out to CSV"""
-
-    writer = None
-    with open(filename, "w+") as f:
+def write_csv(headers, rows_iter, filename, export_format='csv'):
+    """Write a list of rows out to CSV, or to another format from export_helpers.EXPORT_FORMATS"""
+    with open_export_writer(filename, headers, export_format) as writer:
         for row in rows_iter:
-            if writer is None:
-                writer = csv.DictWriter(f, fieldnames=headers)
-                writer.writeheader()
-            writer.writerow(dict(row))
+            writer.write_row(dict(row))
+
 
+def write_csv_with_make_row(
+    records, make_row, filename, include_last_updated=True, export_format='csv', progress=None
+):
+    """Write a list of records out to CSV, using a custom make_row method to convert records to rows
 
-def write_csv_with_make_row(records, make_row, filename, include_last_updated=True):
-    """Write a list of records out to CSV, using a custom make_row method to convert records to rows"""
+    Other formats from export_helpers.EXPORT_FORMATS can be written instead of CSV, in which case there is no
+    "Last updated" line. Progress is logged with `progress`, or a logging_helpers.ProgressReporter if not given.
+    """
     def fieldnames(row):
         return [field[0] for field in row]
 
+    if progress is None:
+        total = len(records) if hasattr(records, '__len__') else None
+        progress = ProgressReporter(os.path.basename(filename), total=total)
     writer = None
 
-    with open(filename, "w+") as f:
+    try:
         for record in records:
-            sys.stdout.write(".")
-            sys.stdout.flush()
+            progress.update()
             row = make_row(record)
             if writer is None:
-                writer = csv.DictWriter(f, fieldnames=fieldnames(row))
-                writer.writeheader()
-            writer.writerow(dict(row))
-
-        if include_last_updated:
-            f.write("Last updated {}".format(date.today().strftime("%d %B %Y")))
+                writer = open_export_writer(filename, fieldnames(row), export_format)
+            writer.write_row(dict(row))
+
+        if writer is None:
+            writer = open_export_writer(filename, [], export_format)
+        if include_last_updated and export_format == 'csv':
+            writer.write_footer("Last updated {}".format(date.today().strftime("%d %B %Y")))
+        progress.finish()
+    finally:
+        if writer is not None:
+            writer.close()
@@ -1,6 +1,15 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
 
 from dmutils.email import DMNotifyClient
+from dmutils.email.exceptions import EmailError, EmailTemplateError
+from dmutils.email.helpers import hash_string
+
+from dmscripts.helpers.logging_helpers import Logger, get_logger
 
 
 DEFAULT_REDIRECT_DOMAINS = {
@@ -9,5 +18,145 @@ DEFAULT_REDIRECT_DOMAINS = {
     "user.marketplace.team": "success@simulator.amazonses.com",
 }
 
+# Notify allows a service to send 3,000 messages a minute
+NOTIFY_MESSAGES_PER_MINUTE = 3000
+DEFAULT_SEND_WORKERS = 4
+
 
 scripts_notify_client = partial(DMNotifyClient, redirect_domains_to_address=DEFAULT_REDIRECT_DOMAINS)
+
+
+class Email(NamedTuple):
+    to_email_address: str
+    template_name_or_id: str
+    personalisation: Optional[Dict[str, Any]] = None
+    reference: Optional[str] = None
+
+
+class EmailResult(NamedTuple):
+    email: Email
+    response: Optional[Dict[str, Any]]
+    error: Optional[EmailError]
+    attempts: int
+
+
+class TokenBucket(object):
+    """Make callers of `take` wait so that on average no more than `rate` calls a second go through, allowing bursts
+    of up to `capacity`"""
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # take the token now, even if it's not there yet, so that waiting callers are served in turn
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+def _is_transient_email_error(error: EmailError) -> bool:
+    """Whether sending the email again might work: DMNotifyClient raises EmailError from the Notify client's
+    HTTPError, which has the status code. Connection errors are reported as 503s."""
+    if isinstance(error, EmailTemplateError):
+        return False
+    status_code = getattr(error.__cause__ or error.__context__, "status_code", None)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def send_emails(
+    notify_client: DMNotifyClient,
+    emails: Iterable[Email],
+    *,
+    workers: int = DEFAULT_SEND_WORKERS,
+    messages_per_minute: int = NOTIFY_MESSAGES_PER_MINUTE,
+    max_tries: int = 3,
+    retry_delay: float = 1.0,
+    stop_on_error: bool = False,
+    logger: Optional[Logger] = None,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+    **send_email_kwargs,
+) -> List[EmailResult]:
+    """Send `emails` with `workers` threads, keeping under `messages_per_minute`, and return the result for each one
+
+    Emails are read from `emails` as they're needed, so it can be a generator. `send_email_kwargs` (for example
+    `allow_resend=False`) are passed to every `notify_client.send_email` call.
+
+    Errors which might be temporary, like Notify's rate limit or server errors, are retried up to `max_tries` times
+    with a growing delay. A failed request might still have reached Notify, so with `allow_resend=False` the retries
+    check Notify for the email's reference instead of the recently sent cache. Other errors are logged and returned in
+    the result, and if `stop_on_error` is set no more emails are sent after one has failed. An EmailTemplateError
+    means every other email would fail too, so it stops all the workers and is raised.
+    """
+    logger = logger or get_logger()
+    rate_limit = TokenBucket(messages_per_minute / 60, capacity=workers, clock=clock, sleep=sleep)
+    abort = threading.Event()
+    template_errors = []
+
+    def send(email):
+        send_kwargs = dict(send_email_kwargs, reference=email.reference) if email.reference else send_email_kwargs
+        for attempt in range(1, max_tries + 1):
+            if abort.is_set():
+                return None
+            rate_limit.take()
+            try:
+                response = notify_client.send_email(
+                    email.to_email_address, email.template_name_or_id, email.personalisation, **send_kwargs
+                )
+            except EmailError as e:
+                if isinstance(e, EmailTemplateError):
+                    abort.set()
+                    template_errors.append(e)
+                elif attempt < max_tries and _is_transient_email_error(e):
+                    logger.warning(
+                        "Retrying sending to {email_hash} after error: {e}",
+                        extra={"email_hash": hash_string(email.to_email_address), "e": str(e)},
+                    )
+                    sleep(retry_delay * 2 ** (attempt - 1))
+                    if send_kwargs.get("allow_resend") is False:
+                        send_kwargs = dict(send_kwargs, use_recent_cache=False)
+                    continue
+                logger.error(
+                    "Failed sending to {email_hash}: {e}",
+                    extra={"email_hash": hash_string(email.to_email_address), "e": str(e)},
+                )
+                if stop_on_error:
+                    abort.set()
+                return EmailResult(email, None, e, attempt)
+            return EmailResult(email, response, None, attempt)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for email in emails:
+            if abort.is_set():
+                break
+            if not results and not in_flight and send_email_kwargs.get("allow_resend") is False \
+                    and send_email_kwargs.get("use_recent_cache", True):
+                # fetch the references of emails already sent before the workers all try to at once
+                notify_client.get_delivered_references()
+            if len(in_flight) >= 2 * workers:
+                results.append(in_flight.popleft().result())
+            in_flight.append(executor.submit(send, email))
+        while in_flight:
+            results.append(in_flight.popleft().result())
+
+    if template_errors:
+        raise template_errors[0]
+    return [result for result in results if result is not None]
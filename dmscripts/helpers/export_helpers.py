@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Writers for exporting rows as CSV, JSON Lines or Parquet.
+
+Each writer takes rows as dicts one at a time, so exports don't need to hold all their rows in memory. Parquet needs
+pyarrow, which isn't installed by default - `pip install pyarrow` before using it.
+"""
+import json
+import os
+import sys
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+if sys.version_info > (3, 0):
+    import csv
+else:
+    import unicodecsv as csv
+
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+FILE_EXTENSIONS = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+
+def export_format_error(export_format):
+    """Why `export_format` can't be written here, or None if it can. Scripts should check this before they start."""
+    if export_format not in EXPORT_FORMATS:
+        return "Unknown export format {!r}, expected one of {}".format(export_format, ", ".join(EXPORT_FORMATS))
+    if export_format == 'parquet' and pyarrow is None:
+        return "Writing Parquet needs pyarrow, which isn't installed - install it with `pip install pyarrow`"
+    return None
+
+
+def _check_export_format(export_format):
+    error = export_format_error(export_format)
+    if error:
+        raise ValueError(error)
+
+
+def export_path(filename, export_format):
+    """Swap the extension of `filename` for the one for `export_format`, eg 'suppliers.csv' to 'suppliers.jsonl'."""
+    _check_export_format(export_format)
+    return os.path.splitext(filename)[0] + FILE_EXTENSIONS[export_format]
+
+
+def open_export_writer(filename, fieldnames, export_format='csv', **kwargs):
+    _check_export_format(export_format)
+    return {
+        'csv': CSVExportWriter,
+        'jsonl': JSONLinesExportWriter,
+        'parquet': ParquetExportWriter,
+    }[export_format](filename, fieldnames, **kwargs)
+
+
+class ExportWriter(object):
+    """
+       Write rows to a file, one at a time
+
+       The file is created straight away, but nothing is written to it until the first row. Use as a context manager,
+       or call close() when done.
+    """
+    def __init__(self, filename, fieldnames):
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.rows_written = 0
+
+    def write_row(self, row):
+        raise NotImplementedError("Required: Method for writing a row.")
+
+    def close(self):
+        raise NotImplementedError("Required: Method for closing the file.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CSVExportWriter(ExportWriter):
+    def __init__(self, filename, fieldnames):
+        super(CSVExportWriter, self).__init__(filename, fieldnames)
+        self._file = open(filename, "w+")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+
+    def write_row(self, row):
+        if self.rows_written == 0:
+            self._writer.writeheader()
+        self._writer.writerow(row)
+        self.rows_written += 1
+
+    def write_footer(self, text):
+        self._file.write(text)
+
+    def close(self):
+        self._file.close()
+
+
+class JSONLinesExportWriter(ExportWriter):
+    """Write each row as a JSON object on its own line, keeping numbers and booleans as they are."""
+    def __init__(self, filename, fieldnames):
+        super(JSONLinesExportWriter, self).__init__(filename, fieldnames)
+        self._file = open(filename, "w")
+
+    def write_row(self, row):
+        self._file.write(json.dumps({name: row.get(name) for name in self.fieldnames}, default=str))
+        self._file.write("\n")
+        self.rows_written += 1
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExportWriter(ExportWriter):
+    """
+       Write rows to a Parquet file, `batch_size` rows at a time
+
+       Column types are worked out from the first batch: a column is boolean, integer or float if every value in it
+       is, ignoring None and "", and text otherwise. Empty values in typed columns are written as nulls, and values
+       in text columns are written as they would appear in a CSV.
+    """
+    def __init__(self, filename, fieldnames, batch_size=10000):
+        if pyarrow is None:
+            raise ImportError("Writing Parquet needs pyarrow - install it with `pip install pyarrow`")
+        super(ParquetExportWriter, self).__init__(filename, fieldnames)
+        self.batch_size = batch_size
+        self.column_types = None
+        self._batch = []
+        self._writer = None
+        open(filename, "wb").close()
+
+    def write_row(self, row):
+        self._batch.append(row)
+        self.rows_written += 1
+        if len(self._batch) >= self.batch_size:
+            self._write_batch()
+
+    def _write_batch(self):
+        columns = [[row.get(name) for row in self._batch] for name in self.fieldnames]
+        if self.column_types is None:
+            self.column_types = [_column_type(values) for values in columns]
+            schema = pyarrow.schema(zip(self.fieldnames, self.column_types))
+            self._writer = pyarrow.parquet.ParquetWriter(self.filename, schema)
+
+        arrays = [
+            pyarrow.array(_convert_column(name, values, column_type), type=column_type)
+            for name, values, column_type in zip(self.fieldnames, columns, self.column_types)
+        ]
+        self._writer.write_table(pyarrow.Table.from_arrays(arrays, names=self.fieldnames))
+        self._batch = []
+
+    def close(self):
+        if self._batch or self._writer is None:
+            self._write_batch()
+        self._writer.close()
+
+
+def _column_type(values):
+    values = [value for value in values if value is not None and value != ""]
+    if values and all(isinstance(value, bool) for value in values):
+        return pyarrow.bool_()
+    if values and all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return pyarrow.int64()
+    if values and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def _convert_column(name, values, column_type):
+    if column_type == pyarrow.string():
+        return [value if value is None or isinstance(value, str) else str(value) for value in values]
+
+    python_type = {pyarrow.bool_(): bool, pyarrow.int64(): int, pyarrow.float64(): (int, float)}[column_type]
+    converted = []
+    for value in values:
+        if value is None or value == "":
+            converted.append(None)
+        elif isinstance(value, python_type) and (python_type is bool or not isinstance(value, bool)):
+            converted.append(value)
+        else:
+            raise ValueError("Column {!r} holds {} values, but got {!r}".format(name, column_type, value))
+    return converted
@@ -1,9 +1,10 @@
 from typing import Iterable, Mapping
 
-from collections import Counter
+from collections import Counter, defaultdict
 from functools import partial
 import logging
 import re
+import threading
 
 from dmapiclient import DataAPIClient, HTTPError
 
@@ -36,7 +37,10 @@ def find_suppliers_with_details_and_draft_services(
     lot=None,
     statuses=None,
     map_impl=map,
+    bulk=False,
 ):
+    if bulk:
+        client = FrameworkSuppliersIndex(client, framework_slug, lot=lot)
     records = find_suppliers(client, framework_slug, supplier_ids)
     records = map_impl(partial(add_supplier_info, client), records)
     records = map_impl(partial(add_framework_info, client, framework_slug), records)
@@ -58,12 +62,17 @@ def find_suppliers_with_details_and_draft_service_counts(
     framework_slug,
     supplier_ids=None,
     map_impl=map,
+    bulk=False,
 ):
+    draft_counts = None
+    if bulk:
+        client = FrameworkSuppliersIndex(client, framework_slug)
+        draft_counts = client.draft_counts
     records = find_suppliers(client, framework_slug, supplier_ids)
     length = len(records)
     records = map_impl(partial(add_supplier_info, client), records)
     records = map_impl(partial(add_framework_info, client, framework_slug), records)
-    records = map_impl(partial(add_draft_counts, client, framework_slug), records)
+    records = map_impl(partial(add_draft_counts, client, framework_slug, draft_counts=draft_counts), records)
     records = map_watch(
         records,
         f"fetched details and draft counts for supplier {{count}}/{length}"
@@ -111,6 +120,111 @@ def find_suppliers(client, framework_slug, supplier_ids=None):
     return suppliers
 
 
+def find_draft_service_counts(client, framework_slug, lot=None):
+    """Count each supplier's draft services on a framework by (lotSlug, status), from one paginated sweep of all the
+    framework's draft services instead of a request per supplier.
+
+    Suppliers with no draft services are not in the returned dict.
+    """
+    draft_counts = defaultdict(Counter)
+    for draft in client.find_draft_services_by_framework_iter(framework_slug, lot=lot):
+        draft_counts[draft['supplierId']][(draft['lotSlug'], draft['status'])] += 1
+    logger.debug(f"counted draft services for {len(draft_counts)} suppliers on '{framework_slug}'")
+    return dict(draft_counts)
+
+
+def count_draft_statuses(counts):
+    """Add up a Counter of (lotSlug, status) tuples, as made by add_draft_counts, across lots"""
+    statuses = Counter()
+    for (lot, status), count in counts.items():
+        statuses[status] += count
+    return statuses
+
+
+class FrameworkSuppliersIndex(object):
+    """Look up suppliers, their framework interests and their draft services for one framework, from one paginated
+    sweep of each instead of a few requests per supplier.
+
+    This has the same get_supplier, get_supplier_framework_info, find_draft_services and find_draft_services_iter
+    methods as DataAPIClient, so it can be passed to the add_* functions below in place of the client. Each sweep is
+    made the first time it's needed. Anything not found in a sweep, or for another framework, is looked up with the
+    client, as is any other client method.
+
+    If `lot` is given only draft services in that lot are fetched. `draft_counts` has the draft service counts from
+    find_draft_service_counts, for callers that don't need the services themselves.
+    """
+    def __init__(self, client, framework_slug, lot=None):
+        self.client = client
+        self.framework_slug = framework_slug
+        self.lot = lot
+        self._lock = threading.Lock()
+        self._suppliers = None
+        self._supplier_frameworks = None
+        self._draft_services = None
+        self._draft_counts = None
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _load(self, attribute, load):
+        with self._lock:
+            if getattr(self, attribute) is None:
+                setattr(self, attribute, load())
+            return getattr(self, attribute)
+
+    @property
+    def suppliers(self):
+        return self._load('_suppliers', lambda: {
+            supplier['id']: supplier for supplier in self.client.find_suppliers_iter(framework=self.framework_slug)
+        })
+
+    @property
+    def supplier_frameworks(self):
+        return self._load('_supplier_frameworks', lambda: {
+            supplier_framework['supplierId']: supplier_framework
+            for supplier_framework in self.client.find_framework_suppliers_iter(
+                self.framework_slug, with_declarations=True
+            )
+        })
+
+    @property
+    def draft_services(self):
+        def load():
+            draft_services = defaultdict(list)
+            for draft in self.client.find_draft_services_by_framework_iter(self.framework_slug, lot=self.lot):
+                draft_services[draft['supplierId']].append(draft)
+            logger.debug(f"found draft services for {len(draft_services)} suppliers on '{self.framework_slug}'")
+            return draft_services
+
+        return self._load('_draft_services', load)
+
+    @property
+    def draft_counts(self):
+        return self._load('_draft_counts', lambda: find_draft_service_counts(
+            self.client, self.framework_slug, lot=self.lot
+        ))
+
+    def get_supplier(self, supplier_id):
+        if supplier_id not in self.suppliers:
+            return self.client.get_supplier(supplier_id)
+        return {'suppliers': self.suppliers[supplier_id]}
+
+    def get_supplier_framework_info(self, supplier_id, framework_slug):
+        if framework_slug != self.framework_slug or supplier_id not in self.supplier_frameworks:
+            return self.client.get_supplier_framework_info(supplier_id, framework_slug)
+        return {'frameworkInterest': self.supplier_frameworks[supplier_id]}
+
+    def find_draft_services(self, supplier_id, framework=None):
+        if framework != self.framework_slug:
+            return self.client.find_draft_services(supplier_id, framework=framework)
+        return {'services': list(self.draft_services.get(supplier_id, []))}
+
+    def find_draft_services_iter(self, supplier_id, framework=None):
+        if framework != self.framework_slug:
+            return self.client.find_draft_services_iter(supplier_id, framework=framework)
+        return iter(self.draft_services.get(supplier_id, []))
+
+
 def add_supplier_info(client, record):
     supplier = client.get_supplier(record['supplier_id'])
     return dict(record, supplier=supplier['suppliers'])
@@ -152,12 +266,16 @@ def add_draft_services(client, framework_slug, record, lot=None, statuses=None):
     return dict(record, services=drafts)
 
 
-def add_draft_counts(client, framework_slug, record):
+def add_draft_counts(client, framework_slug, record, draft_counts=None):
     # "counts" is a counter of (lotSlug, status) tuples
-    counts = Counter(
-        (ds['lotSlug'], ds['status'])
-        for ds in client.find_draft_services_iter(record['supplier']['id'], framework=framework_slug)
-    )
+    if draft_counts is not None:
+        # precomputed by find_draft_service_counts
+        counts = Counter(draft_counts.get(record['supplier']['id'], {}))
+    else:
+        counts = Counter(
+            (ds['lotSlug'], ds['status'])
+            for ds in client.find_draft_services_iter(record['supplier']['id'], framework=framework_slug)
+        )
     return dict(record, counts=counts)
 
 
@@ -1,7 +1,9 @@
 from __future__ import absolute_import
 
 import sys
-from typing import Optional, Mapping
+import time
+from datetime import timedelta
+from typing import Callable, Optional, Mapping
 import logging
 from logging import DEBUG, INFO, WARNING, ERROR, CRITICAL, getLogger, Logger  # noqa
 
@@ -53,3 +55,63 @@ def merge_log_levels(added_log_levels: Mapping) -> Mapping:
     log_levels.update(added_log_levels)
 
     return log_levels
+
+
+class ProgressReporter(object):
+    """Log progress through a long loop, at most once every `every` items or `interval` seconds
+
+    Call update() for each item done and finish() at the end. Each log line gives the number done and the rate, plus
+    the percentage and an estimate of the time left if `total` is known, and the result of `detail()` if given.
+    """
+    def __init__(
+        self,
+        description: str = "records",
+        total: Optional[int] = None,
+        every: int = 1000,
+        interval: float = 30,
+        logger: Optional[Logger] = None,
+        detail: Optional[Callable[[], str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.description = description
+        self.total = total
+        self.every = every
+        self.interval = interval
+        self.logger = logger or get_logger()
+        self.detail = detail
+        self.clock = clock
+        self.done = 0
+        self.start_time = self._last_logged_time = clock()
+        self._last_logged_count = 0
+
+    def update(self, count: int = 1) -> None:
+        self.done += count
+        if self.done - self._last_logged_count >= self.every or self.clock() - self._last_logged_time >= self.interval:
+            self.log()
+
+    def finish(self) -> None:
+        self.log()
+
+    def log(self) -> None:
+        now = self.clock()
+        elapsed = now - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        extra = {
+            'description': self.description,
+            'done': self.done,
+            'total': self.total,
+            'rate': rate,
+            'detail': " {}".format(self.detail()) if self.detail else "",
+        }
+        if self.total:
+            remaining = max(self.total - self.done, 0)
+            extra['percent'] = 100.0 * self.done / self.total
+            extra['eta'] = timedelta(seconds=round(remaining / rate)) if rate else "unknown"
+            self.logger.info(
+                "{description}: {done} of {total} ({percent:.0f}%) at {rate:.1f}/s, {eta} left{detail}", extra=extra
+            )
+        else:
+            self.logger.info("{description}: {done} at {rate:.1f}/s{detail}", extra=extra)
+
+        self._last_logged_time = now
+        self._last_logged_count = self.done
@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+from dmapiclient.base import BaseAPIClient
+
+T = TypeVar('T')
+
+
+def iter_pages(
+    client: BaseAPIClient, method_name: str, model_name: str, *, start_url: Optional[str] = None, **kwargs
+) -> Iterator[Tuple[Optional[str], List[Mapping]]]:
+    """Page through a paginated `find_*` API endpoint one page at a time
+
+    Unlike the client's `*_iter` methods this exposes the pagination links, so the caller can record how far through
+    the results it has got and start again from there later.
+
+    :param client: API client
+    :param method_name: name of the client's `find_*` method for the first page, e.g. 'find_services'
+    :param model_name: key of the list of models in each page of the response, e.g. 'services'
+    :param start_url: a `next` link from a previous run to start from, instead of the first page
+    :param kwargs: passed to the `find_*` method
+
+    :return: a generator of (URL of the next page or None if this is the last page, list of models on this page)
+    """
+    if start_url:
+        result = client._get(start_url)
+    else:
+        result = getattr(client, method_name)(**kwargs)
+
+    while True:
+        next_url = result.get('links', {}).get('next')
+        yield next_url, result.get(model_name, [])
+        if not next_url:
+            return
+        result = client._get(next_url)
+
+
+def _put_unless_closed(q: queue.Queue, entry, closed: threading.Event) -> bool:
+    # keep checking whether the consumer has gone away, so that the thread doesn't block on a full queue forever
+    while not closed.is_set():
+        try:
+            q.put(entry, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+class Prefetcher(Iterator[T]):
+    """Iterate over `iterable` on a background thread, keeping up to `depth` of its values ready for the consumer
+
+    Wrapping `iter_pages` (or any `*_iter` method) in a Prefetcher means the next pages are already being fetched
+    while the current one is being processed, rather than the consumer stalling at every page boundary. Exceptions
+    raised fetching a value are raised to the consumer in its place.
+
+    The background thread is only started on the first `next()`. `wait_time` and `waits` record how long and how
+    often the consumer had to wait for a value that wasn't ready yet.
+    """
+    _END = object()
+
+    def __init__(self, iterable: Iterable[T], depth: int = 2):
+        self._iterable = iterable
+        self._queue = queue.Queue(maxsize=depth)
+        self._thread = None
+        self._finished = False
+        self._closed = threading.Event()
+        self.count = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def _fetch(self):
+        try:
+            for value in self._iterable:
+                if not self._put((value, None)):
+                    return
+        except Exception as e:
+            self._put((self._END, e))
+        else:
+            self._put((self._END, None))
+
+    def _put(self, entry):
+        return _put_unless_closed(self._queue, entry, self._closed)
+
+    def __next__(self) -> T:
+        if self._finished:
+            raise StopIteration
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._fetch, daemon=True)
+            self._thread.start()
+
+        try:
+            value, error = self._queue.get_nowait()
+        except queue.Empty:
+            start = time.monotonic()
+            value, error = self._queue.get()
+            self.wait_time += time.monotonic() - start
+            self.waits += 1
+
+        if value is self._END:
+            self._finished = True
+            if error is not None:
+                raise error
+            raise StopIteration
+        self.count += 1
+        return value
+
+    def close(self):
+        """Stop fetching values, if the consumer doesn't need any more"""
+        self._finished = True
+        self._closed.set()
+
+
+def merge_iterators(iterables: Iterable[Iterable[T]], depth: int = 100) -> Iterator[T]:
+    """Iterate over several iterables at once, each on its own background thread, yielding values as they're ready
+
+    Values from the same iterable stay in order, but values from different iterables are interleaved. At most `depth`
+    values are kept waiting for the consumer. An exception raised by any of the iterables is raised to the consumer.
+
+    :param iterables: e.g. an `iter_pages` or `*_iter` generator for each framework
+    :param depth: maximum number of values fetched but not yet taken by the consumer
+    """
+    end = object()
+    merged = queue.Queue(maxsize=depth)
+    closed = threading.Event()
+
+    def feed(iterable):
+        try:
+            for value in iterable:
+                if not _put_unless_closed(merged, (value, None), closed):
+                    return
+        except Exception as e:
+            _put_unless_closed(merged, (end, e), closed)
+        else:
+            _put_unless_closed(merged, (end, None), closed)
+
+    threads = [threading.Thread(target=feed, args=(iterable,), daemon=True) for iterable in iterables]
+    for thread in threads:
+        thread.start()
+
+    remaining = len(threads)
+    try:
+        while remaining:
+            value, error = merged.get()
+            if value is end:
+                if error is not None:
+                    raise error
+                remaining -= 1
+            else:
+                yield value
+    finally:
+        closed.set()
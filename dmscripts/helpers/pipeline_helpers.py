@@ -0,0 +1,151 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, TypeVar
+
+from dmscripts.helpers.logging_helpers import Logger, get_logger
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def stage_name(func: Callable) -> str:
+    """Name a stage after the function it runs, looking through any `functools.partial` wrapping it"""
+    while isinstance(func, partial):
+        func = func.func
+    return getattr(func, '__name__', repr(func))
+
+
+class StageStats(object):
+    """Timing and error counts for one stage of a Pipeline
+
+    `busy_time` is the total time spent in the stage's function across all its workers, and `wall_time` the time from
+    the stage's first record going in to its last one coming out, so `utilisation` is the fraction of the time its
+    workers had something to do. The stage with the highest utilisation is the bottleneck.
+    """
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, started_at: float, finished_at: float, failed: bool) -> None:
+        with self._lock:
+            self.processed += 1
+            self.errors += failed
+            self.busy_time += finished_at - started_at
+            if self.started_at is None or started_at < self.started_at:
+                self.started_at = started_at
+            if self.finished_at is None or finished_at > self.finished_at:
+                self.finished_at = finished_at
+
+    @property
+    def wall_time(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def average_time(self) -> float:
+        return self.busy_time / self.processed if self.processed else 0.0
+
+    @property
+    def utilisation(self) -> float:
+        if not self.wall_time:
+            return 0.0
+        return self.busy_time / (self.wall_time * self.workers)
+
+
+class Pipeline(object):
+    """Run each stage of a record pipeline on its own pool of worker threads
+
+    A Pipeline can be passed as `map_impl` to the `find_suppliers_with_*` functions in framework_helpers in place of
+    `ThreadPool.imap`. Each time it's called it starts a new stage, named after the function it's given (e.g.
+    'add_draft_counts'), with its own `workers` threads and at most `queue_size` records in flight. Records come out of
+    each stage in the order they went in.
+
+    Settings for particular stages can be given in `stages`, e.g. `{'add_draft_counts': {'workers': 6}}`, so a stage
+    that makes more requests per record can have more threads without the others getting more too.
+
+    An exception raised by a stage's function is raised to the consumer in place of that record, as with `map`.
+    Timings and error counts for each stage are kept in `stats`; call `log_stats()` at the end to see which stage was
+    the bottleneck.
+    """
+    def __init__(
+        self,
+        workers: int = 3,
+        queue_size: int = 50,
+        stages: Optional[Mapping[str, Mapping[str, int]]] = None,
+        logger: Optional[Logger] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stage_settings = stages or {}
+        self.logger = logger or get_logger()
+        self.clock = clock
+        self.stats: Dict[str, StageStats] = {}
+
+    def __call__(self, func: Callable[[T], R], iterable: Iterable[T]) -> Iterator[R]:
+        return self._run_stage(self._stage_stats(stage_name(func)), func, iterable)
+
+    def _stage_stats(self, name: str) -> StageStats:
+        if name not in self.stats:
+            settings = self.stage_settings.get(name, {})
+            workers = settings.get('workers', self.workers)
+            queue_size = max(settings.get('queue_size', self.queue_size), workers)
+            self.stats[name] = StageStats(name, workers, queue_size)
+        return self.stats[name]
+
+    def _call(self, stats: StageStats, func: Callable[[T], R], item: T) -> R:
+        started_at = self.clock()
+        failed = True
+        try:
+            result = func(item)
+            failed = False
+            return result
+        finally:
+            stats.record(started_at, self.clock(), failed)
+
+    def _run_stage(self, stats: StageStats, func: Callable[[T], R], iterable: Iterable[T]) -> Iterator[R]:
+        executor = ThreadPoolExecutor(max_workers=stats.workers)
+        pending = deque()
+        try:
+            for item in iterable:
+                pending.append(executor.submit(self._call, stats, func, item))
+                if len(pending) >= stats.queue_size:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # if the consumer stops early, or a record failed, don't start on anything still queued
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def log_stats(self) -> None:
+        for stats in self.busiest_stages():
+            self.logger.info(
+                "Stage {stage}: {processed} records, {errors} errors, {average:.3f}s each, "
+                "{utilisation:.0f}% of {workers} workers busy over {wall_time:.1f}s",
+                extra={
+                    'stage': stats.name,
+                    'processed': stats.processed,
+                    'errors': stats.errors,
+                    'average': stats.average_time,
+                    'utilisation': 100 * stats.utilisation,
+                    'workers': stats.workers,
+                    'wall_time': stats.wall_time,
+                }
+            )
+
+    def busiest_stages(self) -> List[StageStats]:
+        """Stages ordered from busiest to least busy, so the bottleneck comes first"""
+        return sorted(self.stats.values(), key=lambda stats: stats.utilisation, reverse=True)
@@ -0,0 +1,221 @@
+"""Save everything the framework reports need for one framework to a local file, and read it back in place of the API.
+
+A snapshot is a gzipped JSON file holding the framework, the suppliers interested in it, their supplier frameworks
+(with declarations), draft services, users and framework agreements. Each of these is keyed by supplier ID (or
+agreement ID), so looking one up in a loaded snapshot is a dict lookup rather than a request.
+
+`SnapshotClient` has the read methods of `DataAPIClient` used by `framework_helpers` and `supplier_data_helpers`, so
+it can be passed to them (and to the scripts built on them) in place of the client.
+"""
+from collections import defaultdict
+from datetime import datetime
+import gzip
+import json
+import os
+from typing import Iterator, Mapping
+
+from dmutils.formats import DATETIME_FORMAT
+
+from dmscripts.helpers.framework_helpers import FrameworkSuppliersIndex
+
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotError(LookupError):
+    pass
+
+
+def create_snapshot(client, framework_slug, path, map_impl=map, logger=None):
+    """Fetch everything for `framework_slug` from the API and save it to `path`
+
+    Suppliers, supplier frameworks and draft services are fetched in one paginated sweep each. Agreements are fetched
+    one at a time, for suppliers who've returned one, using `map_impl`. The file is written to a temporary path and
+    moved into place, so an interrupted run never leaves a partial snapshot behind.
+    """
+    index = FrameworkSuppliersIndex(client, framework_slug)
+    framework = client.get_framework(framework_slug)['frameworks']
+    interested_supplier_ids = client.get_interested_suppliers(framework_slug)['interestedSuppliers']
+    interested = set(interested_supplier_ids)
+    if logger:
+        logger.info(f"Snapshotting {len(interested)} suppliers interested in '{framework_slug}'")
+
+    supplier_frameworks = {
+        supplier_id: supplier_framework
+        for supplier_id, supplier_framework in index.supplier_frameworks.items()
+        if supplier_id in interested
+    }
+
+    users = defaultdict(list)
+    for user in client.find_users_iter(role='supplier'):
+        supplier_id = (user.get('supplier') or {}).get('supplierId')
+        if supplier_id in interested:
+            users[supplier_id].append(user)
+
+    def get_framework_agreement(agreement_id):
+        return client.get_framework_agreement(agreement_id)['agreement']
+
+    agreement_ids = [sf['agreementId'] for sf in supplier_frameworks.values() if sf.get('agreementId')]
+    agreements = map_impl(get_framework_agreement, agreement_ids)
+
+    snapshot = {
+        'snapshotVersion': SNAPSHOT_VERSION,
+        'frameworkSlug': framework_slug,
+        'createdAt': datetime.utcnow().strftime(DATETIME_FORMAT),
+        'framework': framework,
+        'interestedSuppliers': interested_supplier_ids,
+        # the suppliers sweep is filtered by framework, so anyone it leaves out is fetched on their own
+        'suppliers': {
+            supplier_id: index.get_supplier(supplier_id)['suppliers'] for supplier_id in interested_supplier_ids
+        },
+        'supplierFrameworks': supplier_frameworks,
+        'draftServices': {
+            supplier_id: drafts for supplier_id, drafts in index.draft_services.items() if supplier_id in interested
+        },
+        'users': users,
+        'exportUsers': client.export_users(framework_slug).get('users', []),
+        'agreements': {agreement['id']: agreement for agreement in agreements},
+    }
+
+    temporary_path = f"{path}.partial"
+    with gzip.open(temporary_path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(temporary_path, path)
+
+    if logger:
+        logger.info(
+            f"Saved snapshot of '{framework_slug}' to {path}: {len(snapshot['suppliers'])} suppliers, "
+            f"{sum(map(len, snapshot['draftServices'].values()))} draft services, "
+            f"{len(snapshot['agreements'])} agreements"
+        )
+    return snapshot
+
+
+def _int_keys(section: Mapping) -> dict:
+    # JSON object keys are always strings, but supplier and agreement IDs are ints everywhere else
+    return {int(key): value for key, value in section.items()}
+
+
+class SnapshotClient(object):
+    """Answer the read requests the framework reports make from a snapshot made by `create_snapshot`
+
+    Requests for anything outside the snapshot, including other frameworks, raise SnapshotError rather than going to
+    the API. There are no write methods, so a script run with a SnapshotClient can't change anything.
+    """
+    def __init__(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+        if snapshot.get('snapshotVersion') != SNAPSHOT_VERSION:
+            raise SnapshotError(f"{path} is not a version {SNAPSHOT_VERSION} framework snapshot")
+
+        self.path = path
+        self.framework_slug = snapshot['frameworkSlug']
+        self.created_at = snapshot['createdAt']
+        self.framework = snapshot['framework']
+        self.interested_suppliers = snapshot['interestedSuppliers']
+        self.suppliers = _int_keys(snapshot['suppliers'])
+        self.supplier_frameworks = _int_keys(snapshot['supplierFrameworks'])
+        self.draft_services = _int_keys(snapshot['draftServices'])
+        self.users = _int_keys(snapshot['users'])
+        self.export_users_list = snapshot['exportUsers']
+        self.agreements = _int_keys(snapshot['agreements'])
+
+    def _check_framework(self, framework_slug):
+        if framework_slug != self.framework_slug:
+            raise SnapshotError(f"{self.path} is a snapshot of '{self.framework_slug}', not '{framework_slug}'")
+
+    def _lookup(self, section, key, description):
+        try:
+            return section[key]
+        except KeyError:
+            raise SnapshotError(f"{description} {key} is not in the snapshot {self.path}")
+
+    def get_framework(self, framework_slug):
+        self._check_framework(framework_slug)
+        return {'frameworks': self.framework}
+
+    def get_interested_suppliers(self, framework_slug):
+        self._check_framework(framework_slug)
+        return {'interestedSuppliers': list(self.interested_suppliers)}
+
+    def get_supplier(self, supplier_id):
+        return {'suppliers': self._lookup(self.suppliers, supplier_id, "Supplier")}
+
+    def find_suppliers_iter(self, framework=None) -> Iterator[Mapping]:
+        if framework is not None:
+            self._check_framework(framework)
+        return iter(self.suppliers.values())
+
+    def get_supplier_framework_info(self, supplier_id, framework_slug):
+        self._check_framework(framework_slug)
+        return {'frameworkInterest': self._lookup(self.supplier_frameworks, supplier_id, "Supplier framework for")}
+
+    def find_framework_suppliers_iter(
+        self, framework_slug, agreement_returned=None, statuses=None, with_declarations=True
+    ) -> Iterator[Mapping]:
+        self._check_framework(framework_slug)
+        for supplier_framework in self.supplier_frameworks.values():
+            if agreement_returned is not None:
+                if bool(supplier_framework.get('agreementReturned')) != bool(agreement_returned):
+                    continue
+            elif statuses is not None and supplier_framework.get('agreementStatus') not in statuses.split(','):
+                continue
+            if not with_declarations:
+                supplier_framework = {
+                    key: value for key, value in supplier_framework.items() if key != 'declaration'
+                }
+            yield supplier_framework
+
+    def find_framework_suppliers(self, framework_slug, agreement_returned=None, statuses=None, with_declarations=True):
+        return {'supplierFrameworks': list(self.find_framework_suppliers_iter(
+            framework_slug, agreement_returned=agreement_returned, statuses=statuses,
+            with_declarations=with_declarations,
+        ))}
+
+    def find_draft_services_iter(self, supplier_id, service_id=None, framework=None) -> Iterator[Mapping]:
+        if framework is not None:
+            self._check_framework(framework)
+        return (
+            draft for draft in self.draft_services.get(supplier_id, [])
+            if service_id is None or draft.get('serviceId') == service_id
+        )
+
+    def find_draft_services(self, supplier_id, service_id=None, framework=None):
+        return {'services': list(
+            self.find_draft_services_iter(supplier_id, service_id=service_id, framework=framework)
+        )}
+
+    def find_draft_services_by_framework_iter(
+        self, framework_slug, status=None, supplier_id=None, lot=None
+    ) -> Iterator[Mapping]:
+        self._check_framework(framework_slug)
+        for drafts in self.draft_services.values():
+            for draft in drafts:
+                if status is not None and draft['status'] != status:
+                    continue
+                if supplier_id is not None and draft['supplierId'] != supplier_id:
+                    continue
+                if lot is not None and draft['lotSlug'] != lot:
+                    continue
+                yield draft
+
+    def get_framework_agreement(self, agreement_id):
+        return {'agreement': self._lookup(self.agreements, agreement_id, "Framework agreement")}
+
+    def find_users_iter(self, supplier_id=None, role=None, personal_data_removed=None) -> Iterator[Mapping]:
+        if supplier_id is None:
+            if role not in (None, 'supplier'):
+                raise SnapshotError(f"The snapshot {self.path} only holds supplier users")
+            users = (user for supplier_users in self.users.values() for user in supplier_users)
+        else:
+            users = iter(self.users.get(supplier_id, []))
+        if personal_data_removed is not None:
+            users = (user for user in users if bool(user.get('personalDataRemoved')) == personal_data_removed)
+        return users
+
+    def export_users(self, framework_slug):
+        self._check_framework(framework_slug)
+        return {'users': list(self.export_users_list)}
+
+    def export_users_iter(self, framework_slug) -> Iterator[Mapping]:
+        return iter(self.export_users(framework_slug)['users'])
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 """Helper classes for fetching supplier data given a client."""
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from datetime import date, timedelta, datetime
 from functools import lru_cache
-from typing import List
+from typing import Dict, List, Optional
 
 from dmapiclient import DataAPIClient
 from dmapiclient.audit import AuditTypes
@@ -15,6 +15,7 @@ import json
 import backoff
 import requests
 
+from govuk_country_register import to_country
 from dmutils.dates import update_framework_with_formatted_dates
 from dmutils.formats import DISPLAY_DATE_FORMAT, DATETIME_FORMAT
 
@@ -58,17 +59,41 @@ class SupplierFrameworkData(object):
         """Given a supplier ID return a list of dictionaries for services related to framework."""
         return self.client.find_draft_services_iter(supplier_id, framework=self.target_framework_slug)
 
-    def populate_data(self):
-        """Populate a dict with supplier data from the api."""
+    def get_draft_services_by_supplier(self):
+        """Return a dict, {supplier id: [draft services]}, from one sweep of all draft services on the framework."""
+        draft_services = defaultdict(list)
+        for draft_service in self.client.find_draft_services_by_framework_iter(self.target_framework_slug):
+            if not self.supplier_ids or draft_service["supplierId"] in self.supplier_ids:
+                draft_services[draft_service["supplierId"]].append(draft_service)
+        return draft_services
+
+    def _list_supplier_draft_services(self, supplier_id):
+        return list(self.get_supplier_draft_service_data(supplier_id))
+
+    def populate_data(self, bulk=False, map_impl=map):
+        """Populate a dict with supplier data from the api.
+
+        :param bulk: Fetch draft services for all suppliers in one sweep, rather than a request per supplier
+        :param map_impl: map function used to make the per-supplier requests, e.g. to make them concurrently
+        """
         self.data = self.get_supplier_frameworks()
         supplier_count = len(self.data)
         users = self.get_supplier_users()
-        for supplier_number, supplier_framework in enumerate(self.data, start=1):
+        supplier_ids = [supplier_framework['supplierId'] for supplier_framework in self.data]
+        if bulk:
+            draft_services_by_supplier = self.get_draft_services_by_supplier()
+            draft_services = (list(draft_services_by_supplier.get(supplier_id, ())) for supplier_id in supplier_ids)
+        else:
+            draft_services = map_impl(self._list_supplier_draft_services, supplier_ids)
+
+        for supplier_number, (supplier_framework, supplier_draft_services) in enumerate(
+            zip(self.data, draft_services), start=1
+        ):
             if self.logger:
                 self.logger.info(f"Populating data for supplier {supplier_number} of {supplier_count}")
             supplier_id = supplier_framework['supplierId']
             supplier_framework['users'] = users.get(supplier_id, [])
-            supplier_framework['draft_services'] = list(self.get_supplier_draft_service_data(supplier_id))
+            supplier_framework['draft_services'] = supplier_draft_services
 
 
 class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
@@ -94,24 +119,37 @@ class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
         """Return {email_address: {personalisations}} for users eligible for the
         'Your application result - if successful' email
         """
+        return dict(self.iter_users_personalisations())
+
+    def iter_users_personalisations(self):
+        """Yield (email_address, personalisation) for users eligible for the
+        'Your application result - if successful' email, each with its own copy of its supplier's personalisation.
+
+        An email address belonging to users of more than one supplier gets the personalisation of the last of them.
+        A primary contact email address is only used if it hasn't already been found for an earlier supplier.
+        """
         suppliers_on_framework = list(filter(lambda i: i['onFramework'], self.data))
         supplier_count = len(suppliers_on_framework)
 
-        output = {}
+        personalisations = {}
         for supplier_number, supplier_framework in enumerate(suppliers_on_framework, start=1):
             if self.logger:
                 self.logger.info(
                     f"Building user personalisations for supplier {supplier_number} of {supplier_count}: "
                     f"{supplier_framework['supplierId']}"
                 )
+            personalisation = self.get_supplier_personalisation(supplier_framework)
+            if not personalisation:
+                continue
+
             for user in supplier_framework['users']:
-                output.update(self.get_user_personalisation(user, supplier_framework))
+                personalisations[user['email address']] = personalisation
             primary_email_address = supplier_framework.get('declaration', {}).get('primaryContactEmail')
-            if primary_email_address and primary_email_address not in output:
-                output.update(
-                    self.get_user_personalisation({'email address': primary_email_address}, supplier_framework)
-                )
-        return output
+            if primary_email_address and primary_email_address not in personalisations:
+                personalisations[primary_email_address] = personalisation
+
+        for email_address, personalisation in personalisations.items():
+            yield email_address, dict(personalisation)
 
     def get_lot_dict(self, supplier_framework):
         """Return a dict of lot status for each lot on the framework.
@@ -139,8 +177,11 @@ class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
             return {}
         return lot_dict
 
-    def get_user_personalisation(self, user, supplier_framework):
-        """Get dict of all info required by template given a user and framework."""
+    def get_supplier_personalisation(self, supplier_framework):
+        """Get dict of all info required by template for a supplier framework, shared by all of its users.
+
+        This is empty if the supplier has no successful lots.
+        """
         lot_dict = self.get_lot_dict(supplier_framework)
         if not lot_dict:
             return {}
@@ -156,6 +197,13 @@ class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
             'framework_slug': self.framework['slug'],
         }
         personalisation.update(lot_dict)
+        return personalisation
+
+    def get_user_personalisation(self, user, supplier_framework):
+        """Get dict of all info required by template given a user and framework."""
+        personalisation = self.get_supplier_personalisation(supplier_framework)
+        if not personalisation:
+            return {}
         return {user['email address']: personalisation}
 
 
@@ -329,9 +377,8 @@ def get_supplier_ids_from_args(args):
     return supplier_ids
 
 
-@lru_cache()
 @backoff.on_exception(backoff.expo, requests.exceptions.RequestException, max_tries=3)
-def country_code_to_name(country_code):
+def _fetch_register_record_name(country_code):
     register, code = country_code.split(':')
 
     register_response = requests.get(f'https://{register}.register.gov.uk/records/{code}.json')
@@ -342,7 +389,39 @@ def country_code_to_name(country_code):
     raise requests.exceptions.RequestException(register_response)
 
 
-def unsuspend_suspended_supplier_services(record, suspending_user, client, logger, dry_run):
+@lru_cache()
+def country_code_to_name(country_code):
+    """Get the name of a country or territory from its register code, e.g. 'country:GB'.
+
+    Countries are looked up in the copy of the country register that comes with govuk-country-register, so only
+    territories need a request.
+    """
+    register, code = country_code.split(':')
+    if register == 'country':
+        return to_country(code)
+    return _fetch_register_record_name(country_code)
+
+
+def find_services_suspended_by_user(client, suspending_user):
+    """
+    Find the services whose status was changed by `suspending_user`, from one sweep of their audit events rather than
+    one per supplier.
+    :param client: API client
+    :param suspending_user: user name of user who performed automated suspension
+    :return: {supplier id: {service ids}}
+    :rtype: Dict[int, Set[str]]
+    """
+    suspended_services = defaultdict(set)
+    for event in client.find_audit_events_iter(audit_type=AuditTypes.update_service_status, user=suspending_user):
+        data = event.get("data") or {}
+        # events without a supplier or service ID would never match the per-supplier query, so skip them
+        if data.get("supplierId") is None or data.get("serviceId") is None:
+            continue
+        suspended_services[int(data["supplierId"])].add(data["serviceId"])
+    return dict(suspended_services)
+
+
+def unsuspend_suspended_supplier_services(record, suspending_user, client, logger, dry_run, suspended_services=None):
     """
     This method checks if the supplier has services suspended by the suspending_user, if so it un-suspends them.
     :param record: augmented supplier record object generated by countersigning script
@@ -350,6 +429,8 @@ def unsuspend_suspended_supplier_services(record, suspending_user, client, logge
     :param client: API client
     :param logger: logger
     :param dry_run: bool
+    :param suspended_services: index from find_services_suspended_by_user, to use instead of fetching the supplier's
+                               audit events
     :return: None
     :rtype: None
     """
@@ -365,15 +446,18 @@ def unsuspend_suspended_supplier_services(record, suspending_user, client, logge
     if not suspended_services_on_framework:
         logger.info(f'Supplier {record["supplier_id"]} has no {old_service_status} services on the framework.')
 
-    services_suspended_by_script = set(
-        event["data"]["serviceId"]
-        for event in
-        client.find_audit_events_iter(
-            audit_type=AuditTypes.update_service_status,
-            data_supplier_id=supplier_id,
-            user=suspending_user
+    if suspended_services is not None:
+        services_suspended_by_script = suspended_services.get(supplier_id, set())
+    else:
+        services_suspended_by_script = set(
+            event["data"]["serviceId"]
+            for event in
+            client.find_audit_events_iter(
+                audit_type=AuditTypes.update_service_status,
+                data_supplier_id=supplier_id,
+                user=suspending_user
+            )
         )
-    )
     service_ids = suspended_services_on_framework & services_suspended_by_script
     # Unsuspend all services for supplier (the API will re-index the services for search results)
     if service_ids:
@@ -387,10 +471,28 @@ def unsuspend_suspended_supplier_services(record, suspending_user, client, logge
             client.update_service_status(service_id, new_service_status, "Unsuspend services helper")
 
 
-def get_email_addresses_for_supplier(api_client: DataAPIClient, supplier_id: int) -> List[str]:
+def get_email_addresses_by_supplier(api_client: DataAPIClient) -> Dict[int, List[str]]:
+    """
+    Get the email addresses of each supplier's active users, keyed by supplier ID, from one paginated sweep of all
+    supplier users rather than a request per supplier. Rows from `export_users` don't say whether a user is active,
+    so framework-scoped scripts use this index too.
+    """
+    email_addresses = defaultdict(list)
+    for user in api_client.find_users_iter(role="supplier", personal_data_removed=False):
+        if user["active"]:
+            email_addresses[user["supplier"]["supplierId"]].append(user["emailAddress"])
+    return dict(email_addresses)
+
+
+def get_email_addresses_for_supplier(
+    api_client: DataAPIClient, supplier_id: int, email_addresses_by_supplier: Optional[Dict[int, List[str]]] = None
+) -> List[str]:
     """
-    Get the email addresses for each user belonging to `supplier_id`. Use `SupplierFrameworkData.get_supplier_users`
-    instead if you need to get email addresses for a large number of suppliers.
+    Get the email addresses for each user belonging to `supplier_id`. If you need to get email addresses for a large
+    number of suppliers, pass `email_addresses_by_supplier` from `get_email_addresses_by_supplier` to look them up
+    from that instead of making a request for each supplier.
     """
+    if email_addresses_by_supplier is not None:
+        return list(email_addresses_by_supplier.get(supplier_id, []))
     supplier_users = api_client.find_users_iter(supplier_id=supplier_id, personal_data_removed=False)
     return [user["emailAddress"] for user in supplier_users if user["active"]]
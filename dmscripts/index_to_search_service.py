@@ -1,30 +1,350 @@
-from datetime import datetime
-from itertools import chain
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from functools import partial
+import hashlib
+from itertools import chain, islice
+import json
 from multiprocessing.pool import ThreadPool
+import os
+import queue
+import resource
+import sqlite3
+import threading
+import time
 
 import dmapiclient
+from dmutils.formats import DATETIME_FORMAT
 from six.moves import map
 
 from dmscripts.helpers import logging_helpers
 from dmscripts.helpers.logging_helpers import logging
+from dmscripts.helpers.pagination_helpers import iter_pages, merge_iterators, Prefetcher
 
 logger = logging_helpers.configure_logger({"dmapiclient": logging.WARNING})
 
+# Number of threads indexing at once, unless the run is serial or uses the async engine
+POOL_SIZE = 10
 
-def print_progress(counter, start_time):
+
+def print_progress(counter, start_time, framework_counts=None):
     if counter % 100 == 0:
         time_delta = datetime.utcnow() - start_time
         logger.info("{counter} in {time} ({rps}/s)", extra={
             'counter': counter, 'time': time_delta, 'rps': counter / time_delta.total_seconds()
         })
+        if framework_counts:
+            logger.info("{summary}", extra={'summary': framework_counts.summary()})
+
+
+def bounded_imap_unordered(pool, func, iterable, queue_depth):
+    """Like `pool.imap_unordered`, but only takes items from `iterable` while fewer than `queue_depth` are waiting for
+    or being processed by a worker.
+
+    `ThreadPool.imap_unordered` reads its iterable as fast as it can, so a paginated API iterator would otherwise be
+    read entirely into memory ahead of the workers. Here the first `queue_depth` items are submitted straight away,
+    and each result taken from the returned iterator makes room for the next item.
+    """
+    iterator = iter(iterable)
+    results = queue.Queue()
+
+    def submit(item):
+        pool.apply_async(
+            func, (item,), callback=lambda result: results.put((True, result)),
+            error_callback=lambda e: results.put((False, e)),
+        )
+
+    in_flight = 0
+    for item in islice(iterator, queue_depth):
+        submit(item)
+        in_flight += 1
+
+    def results_as_completed(in_flight):
+        while in_flight:
+            ok, result = results.get()
+            in_flight -= 1
+            if not ok:
+                raise result
+            for item in islice(iterator, 1):
+                submit(item)
+                in_flight += 1
+            yield result
+
+    return results_as_completed(in_flight)
+
+
+# Responses from the search API that mean it is struggling to keep up, rather than that the document is bad
+OVERLOAD_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# What happened during a call to a worker on the current thread, for the async engine to adapt its concurrency to
+_worker_call = threading.local()
+
+
+def record_api_error(e):
+    """Note the status code of an API error raised while indexing"""
+    if hasattr(_worker_call, 'status_codes'):
+        _worker_call.status_codes.append(getattr(e, 'status_code', None))
+
+
+def record_skipped():
+    """Note that the search API wasn't called, so the time taken says nothing about how it's coping"""
+    if hasattr(_worker_call, 'status_codes'):
+        _worker_call.skipped = True
+
+
+class AdaptiveConcurrencyLimit(object):
+    """How many index requests the async engine keeps in flight at once, adjusted to how the search API is coping
+
+    The limit is halved whenever a request is rejected with a 429 or 5xx. It drops by one (at most once every few
+    requests) while the smoothed latency is well above the baseline latency, and rises by one after each full window
+    of requests without either. The baseline follows the lowest recent latency, drifting up towards the current
+    latency so that one unusually quick request doesn't make every later one look slow.
+    """
+    def __init__(self, initial=10, minimum=1, maximum=50, latency_tolerance=2.0, baseline_drift=0.01):
+        self.concurrency = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.baseline_drift = baseline_drift
+        self.baseline_latency = None
+        self.smoothed_latency = None
+        self._window = 0
+
+    def record(self, latency, error_status_codes=()):
+        if self.baseline_latency is None or latency < self.baseline_latency:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency += self.baseline_drift * (latency - self.baseline_latency)
+        self.smoothed_latency = (
+            latency if self.smoothed_latency is None else 0.8 * self.smoothed_latency + 0.2 * latency
+        )
+
+        if any(status_code in OVERLOAD_STATUS_CODES for status_code in error_status_codes):
+            self._set(self.concurrency // 2)
+            return
+
+        self._window += 1
+        if self.smoothed_latency > self.baseline_latency * self.latency_tolerance:
+            # give the last change a few requests to take effect before reducing again
+            if self._window >= min(self.concurrency, 10):
+                self._set(self.concurrency - 1)
+        elif self._window >= self.concurrency:
+            self._set(self.concurrency + 1)
+
+    def _set(self, concurrency):
+        concurrency = max(self.minimum, min(self.maximum, concurrency))
+        if concurrency != self.concurrency:
+            logger.debug("Concurrency {old} -> {new}", extra={'old': self.concurrency, 'new': concurrency})
+        self.concurrency = concurrency
+        self._window = 0
+
+
+class AsyncIndexEngine(object):
+    """Index items with an asyncio event loop, keeping an adaptive number of requests in flight
+
+    Used in place of `map` or the thread pool: calling the engine with a worker (an indexer, a BulkIndexer or a
+    journal's recording wrapper) and an iterable of items returns an iterator of the worker's results in the order
+    they finish. Items are only taken from the iterable when there is room under the current concurrency limit.
+
+    The API clients are synchronous, so each request runs on a thread of an executor sized for the maximum
+    concurrency; the event loop decides how many of them are running at once.
+    """
+    def __init__(self, initial_concurrency=10, max_concurrency=50):
+        self.limit = AdaptiveConcurrencyLimit(
+            initial=min(initial_concurrency, max_concurrency), maximum=max_concurrency,
+        )
+
+    @staticmethod
+    def _timed(worker, item):
+        _worker_call.status_codes = []
+        _worker_call.skipped = False
+        start = time.monotonic()
+        try:
+            result = worker(item)
+        finally:
+            latency = time.monotonic() - start
+            status_codes, skipped = _worker_call.status_codes, _worker_call.skipped
+            del _worker_call.status_codes, _worker_call.skipped
+        return result, latency, status_codes, skipped
+
+    def __call__(self, worker, items):
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(self.limit.maximum)
+        items = iter(items)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.limit.concurrency:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(loop.run_in_executor(executor, self._timed, worker, item))
+                if not pending:
+                    return
+                done, pending = loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                )
+                for future in done:
+                    result, latency, status_codes, skipped = future.result()
+                    if not skipped:
+                        self.limit.record(latency, status_codes)
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            loop.close()
+
+
+def log_peak_memory_usage():
+    # ru_maxrss is in kilobytes on Linux
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    logger.info("Peak memory usage {peak_memory:.1f}MB", extra={'peak_memory': peak_memory / 1024})
+
+
+def is_updated_since(item, updated_since):
+    # Changing the status of a brief or service also changes its `updatedAt`, so newly withdrawn briefs and
+    # unpublished services are still included here and get deleted from the index.
+    return item.get('updatedAt') is None or item['updatedAt'] >= updated_since
+
+
+# Checkpoints are taken from our clock but compared with `updatedAt` timestamps from the API server's, so they are set
+# this far before the start of the run to allow for the clocks disagreeing
+CHECKPOINT_CLOCK_SKEW_MARGIN = timedelta(minutes=15)
+
+
+def checkpoint_for_run(started_at):
+    """The checkpoint to save after a successful run that started at `started_at` (a DATETIME_FORMAT string)"""
+    started_at = datetime.strptime(started_at, DATETIME_FORMAT)
+    return (started_at - CHECKPOINT_CLOCK_SKEW_MARGIN).strftime(DATETIME_FORMAT)
+
+
+def _write_json_atomically(path, data):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write to a temporary file first so that a failed write can't lose the existing contents
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+class MappingProjection(object):
+    """Strip the fields that a search mapping doesn't use from documents before they are sent to the search API
+
+    Mapping properties are named after the document fields they are made from, with a prefix saying how the field is
+    indexed (e.g. `dmtext_serviceName`). Fields used by the transformations in the mapping's `_meta` are kept too, as
+    are the fields in `always_keep`.
+    """
+    PROPERTY_PREFIXES = ('dmtext_', 'dmfilter_', 'dmagg_', 'sortonly_')
+
+    def __init__(self, mapping, always_keep=('id',)):
+        self.fields = set(always_keep)
+        mappings = mapping.get('mappings', mapping)
+        # mappings may or may not be grouped by document type
+        type_mappings = [mappings] if 'properties' in mappings else list(mappings.values())
+        for type_mapping in type_mappings:
+            for name in type_mapping.get('properties', {}):
+                self.fields.add(self._field_name(name))
+            self.fields.update(self._strings(type_mapping.get('_meta', {}).get('transformations', [])))
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _field_name(self, name):
+        for prefix in self.PROPERTY_PREFIXES:
+            if name.startswith(prefix):
+                return name[len(prefix):]
+        return name
+
+    def _strings(self, value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for v in value.values():
+                yield from self._strings(v)
+        elif isinstance(value, list):
+            for v in value:
+                yield from self._strings(v)
+
+    def __call__(self, document, record_savings=True):
+        """Return the projected document, adding the bytes saved to `bytes_saved` if `record_savings`"""
+        dropped = [key for key in document if key not in self.fields]
+        if dropped and record_savings:
+            saved = sum(len(json.dumps(document[key])) + len(key) + 4 for key in dropped)
+            with self._lock:
+                self.bytes_saved += saved
+        return {key: value for key, value in document.items() if key in self.fields}
+
+
+def merge_framework_streams(streams, concurrent):
+    """Combine a list of (framework, items) into one iterable of items
+
+    If `concurrent`, the streams for each framework are read on their own thread and their items are interleaved.
+    Otherwise (or if there's only one framework) they are read one after another.
+    """
+    by_framework = OrderedDict()
+    for framework, items in streams:
+        by_framework.setdefault(framework, []).append(items)
+    framework_streams = [chain.from_iterable(items) for items in by_framework.values()]
+
+    if concurrent and len(framework_streams) > 1:
+        return merge_iterators(framework_streams)
+    return chain.from_iterable(framework_streams)
+
+
+class FrameworkCounts(object):
+    """Counts of items indexed and not indexed for each framework, from the items' `frameworkSlug`"""
+    def __init__(self):
+        self.indexed = Counter()
+        self.failed = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, item, ok):
+        with self._lock:
+            (self.indexed if ok else self.failed)[item.get('frameworkSlug')] += 1
+
+    def counting(self, worker, batched=False):
+        """Wrap an indexer (or a BulkIndexer if `batched`) so that each item's result is counted"""
+        def count_item(item):
+            ok = worker(item)
+            self.add(item, ok)
+            return ok
+
+        def count_batch(batch):
+            results = worker(batch)
+            for item, ok in zip(batch, results):
+                self.add(item, ok)
+            return results
+
+        return count_batch if batched else count_item
+
+    def summary(self):
+        with self._lock:
+            frameworks = sorted(set(self.indexed) | set(self.failed), key=str)
+            return ", ".join(
+                "{}: {} indexed, {} failed".format(framework, self.indexed[framework], self.failed[framework])
+                for framework in frameworks
+            )
 
 
 class IndexerBase(object):
+    # set to a MappingProjection to strip fields the search mapping doesn't use from documents
+    projection = None
+
     def __init__(self, document_type, data_client, search_client, index):
         self.document_type = document_type
         self.index = index
         self.search_client = search_client
         self.data_client = data_client
+        self.prefetchers = []
 
     def create_index(self, mapping):
         logger.info("Creating {index} index", extra={'index': self.index})
@@ -38,40 +358,176 @@ class IndexerBase(object):
             else:
                 raise
 
-    def request_items(self, frameworks):
+    def requests(self, frameworks):
+        """Return a list of (name, find method name, kwargs) for the paginated API requests for items to index"""
+        raise NotImplementedError()
+
+    def framework_requests(self, frameworks):
+        """Return a list of (framework, name, find method name, kwargs) for the paginated API requests for each of the
+        comma-separated `frameworks` separately, so that they can be fetched in parallel
+
+        When there are several frameworks the framework is added to the names of the requests to tell them apart.
+        """
+        framework_list = frameworks.split(',')
+        return [
+            (framework, name if len(framework_list) == 1 else '{}:{}'.format(name, framework), method_name, kwargs)
+            for framework in framework_list
+            for name, method_name, kwargs in self.requests(framework)
+        ]
+
+    def request_items(self, frameworks, prefetch_pages=0, concurrent=False):
+        """Items to index from all the API requests for the frameworks
+
+        If `concurrent`, each framework's requests are made on their own thread and their items are interleaved.
+        """
+        if prefetch_pages:
+            streams = [
+                (framework, chain.from_iterable(items for _, items in pages))
+                for framework, _, pages in self.request_pages(frameworks, {}, prefetch_pages=prefetch_pages)
+            ]
+        else:
+            streams = [
+                (framework, getattr(self.data_client, method_name + '_iter')(**kwargs))
+                for framework, _, method_name, kwargs in self.framework_requests(frameworks)
+            ]
+        return merge_framework_streams(streams, concurrent)
+
+    def request_pages(self, frameworks, start_urls, prefetch_pages=0):
+        """Return a list of (framework, name, pages) for each of the API requests, where pages is a generator of
+        (next page URL, items) starting from the URL in `start_urls` for that request, if there is one
+
+        If `prefetch_pages` is given, up to that many pages of each request are fetched ahead of the consumer.
+        """
+        request_pages = []
+        for framework, name, method_name, kwargs in self.framework_requests(frameworks):
+            pages = iter_pages(
+                self.data_client, method_name, self.document_type, start_url=start_urls.get(name), **kwargs
+            )
+            if prefetch_pages:
+                pages = Prefetcher(pages, depth=prefetch_pages)
+                self.prefetchers.append((name, pages))
+            request_pages.append((framework, name, pages))
+        return request_pages
+
+    def request_items_updated_since(self, frameworks, updated_since, prefetch_pages=0, concurrent=False):
+        return (
+            item for item in self.request_items(frameworks, prefetch_pages=prefetch_pages, concurrent=concurrent)
+            if is_updated_since(item, updated_since)
+        )
+
+    def get_item(self, item_id):
         raise NotImplementedError()
 
     def __call__(self, item):
         try:
             self.index_item(item)
             return True
-        except dmapiclient.APIError:
+        except dmapiclient.APIError as e:
+            record_api_error(e)
             logger.exception("{id} not indexed", extra={'id': item.get('id')})
             return False
 
     def include_in_index(self, item):
         raise NotImplementedError()
 
+    def document(self, item, record_savings=True):
+        """The document to send to the search API for an item that is included in the index
+
+        Pass `record_savings=False` if the document isn't about to be sent, so that it doesn't count towards the
+        projection's `bytes_saved`.
+        """
+        return self.projection(item, record_savings=record_savings) if self.projection else item
+
     def index_item(self, item):
         if self.include_in_index(item):
-            self.search_client.index(self.index, item['id'], item, self.document_type)
+            self.search_client.index(self.index, item['id'], self.document(item), self.document_type)
         else:
             self.search_client.delete(self.index, item['id'])
 
 
+class BulkIndexer(object):
+    """Send documents to the search API in batches rather than one request per document
+
+    Wraps one of the indexers below: `batches` groups the items into lists bounded by both a document count and an
+    approximate serialised size, and calling the bulk indexer with a batch sends every index and delete action in
+    that batch in a single request. The search API reports a result for each document, so a bad document only fails
+    itself rather than the rest of its batch.
+
+    Bulk requests need a search API with a `/<index>/<doc-type>/bulk` endpoint, so check `is_supported` once before
+    using it.
+    """
+    def __init__(self, indexer, batch_size=500, max_batch_bytes=5 * 1024 * 1024):
+        self.indexer = indexer
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+
+    @property
+    def url(self):
+        return '/{}/{}/bulk'.format(self.indexer.index, self.indexer.document_type)
+
+    def is_supported(self):
+        """Whether the search API has a bulk endpoint, found by sending it an empty batch"""
+        try:
+            self.indexer.search_client._post(self.url, data={'actions': []})
+        except dmapiclient.HTTPError as e:
+            if e.status_code == 404:
+                return False
+            raise
+        return True
+
+    def batches(self, items):
+        batch, batch_bytes = [], 0
+        for item in items:
+            item_bytes = len(json.dumps(item))
+            if batch and (len(batch) >= self.batch_size or batch_bytes + item_bytes > self.max_batch_bytes):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(item)
+            batch_bytes += item_bytes
+        if batch:
+            yield batch
+
+    def make_action(self, item):
+        if self.indexer.include_in_index(item):
+            return {'action': 'index', 'id': item['id'], 'document': self.indexer.document(item)}
+        return {'action': 'delete', 'id': item['id']}
+
+    def __call__(self, batch):
+        """Index a batch of items, returning a list of booleans indicating success for each item"""
+        try:
+            response = self.indexer.search_client._post(
+                self.url, data={'actions': [self.make_action(item) for item in batch]},
+            )
+        except dmapiclient.APIError as e:
+            record_api_error(e)
+            logger.exception(
+                "Batch of {count} items starting with {id} not indexed",
+                extra={'count': len(batch), 'id': batch[0].get('id')},
+            )
+            return [False] * len(batch)
+
+        errors = {result['id']: result.get('error') for result in response['results'] if result['status'] >= 400}
+        for item_id, error in errors.items():
+            logger.error("{id} not indexed: {error}", extra={'id': item_id, 'error': error})
+        return [item['id'] not in errors for item in batch]
+
+
 class BriefIndexer(IndexerBase):
-    def request_items(self, frameworks):
+    def requests(self, frameworks):
         # this is done as two separate calls because the bulk of the results should be deliverable in a compressed
         # response (which we want as it tends to be more reliable), however we still need to send "withdrawn" briefs
         # to the search api as this is the only way such briefs get removed from the search results. the api will
         # likely refuse to compress these but that's fine as there aren't many of them.
-        return chain(
-            self.data_client.find_briefs_iter(
-                framework=frameworks,
-                status="live,cancelled,unsuccessful,awarded,closed",
-            ),
-            self.data_client.find_briefs_iter(framework=frameworks, status="withdrawn"),
-        )
+        return [
+            ('briefs', 'find_briefs', {
+                'framework': frameworks,
+                'status': "live,cancelled,unsuccessful,awarded,closed",
+            }),
+            ('withdrawn-briefs', 'find_briefs', {'framework': frameworks, 'status': "withdrawn"}),
+        ]
+
+    def get_item(self, item_id):
+        return self.data_client.get_brief(item_id)['briefs']
 
     def include_in_index(self, item):
         # Even draft briefs will be in the index, for now at least
@@ -79,14 +535,264 @@ class BriefIndexer(IndexerBase):
 
 
 class ServiceIndexer(IndexerBase):
-    def request_items(self, frameworks):
+    def requests(self, frameworks):
         # despite the name, frameworks takes a string containing a comma-separated list of framework slugs
-        return self.data_client.find_services_iter(framework=frameworks)
+        return [('services', 'find_services', {'framework': frameworks})]
+
+    def get_item(self, item_id):
+        return self.data_client.get_service(item_id)['services']
 
     def include_in_index(self, item):
         return item['status'] == 'published'
 
 
+class IndexCheckpoints(object):
+    """High-water marks recording when each framework was last successfully indexed into each index
+
+    Stored in a local JSON file as {index: {framework_slug: timestamp}}.
+    """
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.checkpoints = json.load(f)
+        except FileNotFoundError:
+            self.checkpoints = {}
+
+    def get(self, index, frameworks):
+        """Return the earliest checkpoint for the frameworks, or None if any of them has never been indexed"""
+        timestamps = [self.checkpoints.get(index, {}).get(framework) for framework in frameworks.split(',')]
+        if None in timestamps:
+            return None
+        return min(timestamps)
+
+    def set(self, index, frameworks, timestamp):
+        for framework in frameworks.split(','):
+            self.checkpoints.setdefault(index, {})[framework] = timestamp
+        _write_json_atomically(self.path, self.checkpoints)
+
+
+def index_target(search_api_url, index):
+    return '{}/{}'.format(search_api_url.rstrip('/'), index)
+
+
+class IndexedDocumentCache(object):
+    """A hash of each document as it was last sent to each index, so that unchanged documents can be skipped
+
+    Stored in a local SQLite database keyed by the target index (see `index_target`) and document id. The hash covers
+    whether the document was indexed or deleted as well as its contents. With `force` every document is sent, and the
+    hashes are updated.
+    """
+    def __init__(self, path, index, force=False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.index = index
+        self.force = force
+        self.skipped = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents (index_name TEXT, id TEXT, hash TEXT, PRIMARY KEY (index_name, id))"
+        )
+
+    @staticmethod
+    def document_hash(indexer, item):
+        action = 'index' if indexer.include_in_index(item) else 'delete'
+        document = indexer.document(item, record_savings=False) if action == 'index' else None
+        serialised = json.dumps([action, document], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(serialised.encode('utf-8')).hexdigest()
+
+    def is_unchanged(self, item_id, document_hash):
+        if self.force:
+            return False
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hash FROM documents WHERE index_name = ? AND id = ?", (self.index, str(item_id))
+            ).fetchone()
+        return row is not None and row[0] == document_hash
+
+    def record(self, item_id, document_hash):
+        """Record the hash of a document that has been sent successfully"""
+        with self._lock:
+            self.written += 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (index_name, id, hash) VALUES (?, ?, ?)",
+                (self.index, str(item_id), document_hash),
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= 100:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def clear(self):
+        """Forget every document sent to the index, e.g. because the index has been created again"""
+        with self._lock:
+            self._db.execute("DELETE FROM documents WHERE index_name = ?", (self.index,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def skipping(self, indexer, worker, batched=False):
+        """Wrap an indexer (or a BulkIndexer if `batched`) so that unchanged items are skipped, counting as successful,
+        and the hashes of items that are sent successfully are recorded
+        """
+        def skip_item(item):
+            document_hash = self.document_hash(indexer, item)
+            if self.is_unchanged(item['id'], document_hash):
+                record_skipped()
+                with self._lock:
+                    self.skipped += 1
+                return True
+            ok = worker(item)
+            if ok:
+                self.record(item['id'], document_hash)
+            return ok
+
+        def skip_batch(batch):
+            hashes = [self.document_hash(indexer, item) for item in batch]
+            changed = [i for i, item in enumerate(batch) if not self.is_unchanged(item['id'], hashes[i])]
+            with self._lock:
+                self.skipped += len(batch) - len(changed)
+
+            results = [True] * len(batch)
+            if not changed:
+                record_skipped()
+            else:
+                for i, ok in zip(changed, worker([batch[i] for i in changed])):
+                    results[i] = ok
+                    if ok:
+                        self.record(batch[i]['id'], hashes[i])
+            return results
+
+        return skip_batch if batched else skip_item
+
+
+class IndexJournal(object):
+    """Progress of an indexing run, so that an interrupted run can be resumed
+
+    For each of the indexer's paginated API requests the journal records the URL of the first page that hasn't been
+    completely indexed yet (or that the request is complete), along with the ids of any items that failed to index.
+    Pages can finish out of order when indexing in parallel, so the cursor only moves past a page once it and all of
+    the pages before it are done.
+    """
+    def __init__(self, path, index, frameworks, started_at, resume=False):
+        self.path = path
+        self.index = index
+        self.frameworks = frameworks
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._item_pages = {}
+
+        journal = {}
+        if resume:
+            try:
+                with open(path) as f:
+                    journal = json.load(f)
+            except FileNotFoundError:
+                logger.warning("No journal found at {path}, starting from the beginning", extra={'path': path})
+        if journal and (journal['index'], journal['frameworks']) != (index, frameworks):
+            raise ValueError("Journal {} is for index '{}' and frameworks '{}'".format(
+                path, journal['index'], journal['frameworks']
+            ))
+        self.started_at = journal.get('started_at', started_at)
+        self.cursors = journal.get('cursors', {})
+        self.completed = set(journal.get('completed', []))
+        self.failed = set(journal.get('failed', []))
+
+    def save(self):
+        _write_json_atomically(self.path, {
+            'index': self.index,
+            'frameworks': self.frameworks,
+            'started_at': self.started_at,
+            'cursors': self.cursors,
+            'completed': sorted(self.completed),
+            'failed': sorted(self.failed),
+        })
+
+    def request_items(self, indexer, frameworks, updated_since=None, prefetch_pages=0, concurrent=False):
+        """Items still to index: retries of previously failed items, then any unfinished API requests"""
+        return chain(
+            self._retry_items(indexer),
+            merge_framework_streams(
+                [
+                    (framework, self._track_pages(name, pages, updated_since))
+                    for framework, name, pages in indexer.request_pages(
+                        frameworks, self.cursors, prefetch_pages=prefetch_pages
+                    )
+                    if name not in self.completed
+                ],
+                concurrent,
+            ),
+        )
+
+    def _retry_items(self, indexer):
+        for item_id in sorted(self.failed):
+            try:
+                yield indexer.get_item(item_id)
+            except dmapiclient.APIError:
+                logger.exception("{id} could not be fetched to retry", extra={'id': item_id})
+
+    def _track_pages(self, name, pages, updated_since):
+        page_numbers = self._pages[name] = {}
+        for page_number, (next_url, items) in enumerate(pages):
+            if updated_since:
+                items = [item for item in items if is_updated_since(item, updated_since)]
+            with self._lock:
+                page_numbers[page_number] = [next_url, len(items)]
+                for item in items:
+                    self._item_pages[item['id']] = (name, page_number)
+                self._advance(name)
+            yield from items
+
+    def _advance(self, name):
+        pages = self._pages[name]
+        changed = False
+        while pages and pages[min(pages)][1] == 0:
+            next_url, _ = pages.pop(min(pages))
+            if next_url:
+                self.cursors[name] = next_url
+            else:
+                self.cursors.pop(name, None)
+                self.completed.add(name)
+            changed = True
+        if changed:
+            self.save()
+
+    def item_done(self, item, ok):
+        with self._lock:
+            if ok:
+                self.failed.discard(item['id'])
+            else:
+                self.failed.add(item['id'])
+
+            if item['id'] in self._item_pages:
+                name, page_number = self._item_pages.pop(item['id'])
+                self._pages[name][page_number][1] -= 1
+                self._advance(name)
+            else:
+                self.save()
+
+    def recording(self, worker, batched=False):
+        """Wrap an indexer (or a BulkIndexer if `batched`) so that the journal records each item's result"""
+        def record_item(item):
+            ok = worker(item)
+            self.item_done(item, ok)
+            return ok
+
+        def record_batch(batch):
+            results = worker(batch)
+            for item, ok in zip(batch, results):
+                self.item_done(item, ok)
+            return results
+
+        return record_batch if batched else record_item
+
+
 indexers = {
     'briefs': BriefIndexer,
     'services': ServiceIndexer,
@@ -116,32 +822,152 @@ def search_mapping_matches_framework(mapping_name, frameworks):
     raise ValueError("Incorrect mapping '{}' for the supplied framework(s): {}".format(mapping_name, frameworks))
 
 
+def make_mapper(serial, async_engine, max_concurrency, queue_depth, batch_size=None):
+    """Return a function like `map` for calling the index worker with each item, or with each batch if `batch_size`
+    is given"""
+    if serial:
+        return map
+    if async_engine:
+        return AsyncIndexEngine(max_concurrency=max_concurrency)
+    pool = ThreadPool(POOL_SIZE)
+    # in bulk mode the pool's tasks are whole batches, so bound the number of batches to keep about the same number of
+    # items read ahead, but always have enough batches to keep every worker busy
+    task_queue_depth = max(POOL_SIZE, queue_depth // batch_size) if batch_size else queue_depth
+    return partial(bounded_imap_unordered, pool, queue_depth=task_queue_depth)
+
+
 def do_index(doc_type, search_api_url, search_api_access_token, data_api_url, data_api_access_token, mapping, serial,
-             index, frameworks):
+             index, frameworks, bulk=False, bulk_batch_size=500, bulk_max_batch_bytes=5 * 1024 * 1024, queue_depth=100,
+             checkpoint_file=None, journal_file=None, resume=False, async_engine=False, max_concurrency=50,
+             prefetch_pages=0, cache_file=None, force=False, projection_mapping_file=None):
+    """Index briefs or services from the data API into the search API
+
+    If `checkpoint_file` is given, only items updated since the last successful run for the same index and
+    frameworks are indexed, and the checkpoint is moved forward to shortly before the start of this run if it
+    succeeds.
+
+    If `journal_file` is given, progress is recorded there as the run goes. With `resume` an interrupted run carries
+    on from the journal: finished pages are skipped and only items that failed are retried, and the result is only
+    successful if every item has been indexed successfully by one of the attempts.
+
+    With `async_engine` requests are made by an `AsyncIndexEngine` instead of the fixed-size thread pool, with up to
+    `max_concurrency` in flight depending on how the search API is coping.
+
+    With `prefetch_pages` the next pages of items are fetched from the data API in the background while the current
+    page is being indexed.
+
+    Unless `serial` is set, each of the comma-separated `frameworks` is paged through on its own thread, with their
+    items interleaved into the workers. The number of items indexed and not indexed is logged for each framework.
+
+    If `cache_file` is given, documents that haven't changed since they were last sent to the same index of the same
+    search API are skipped, unless `force` is set. The cache can't tell if the index has been changed some other way,
+    so it is only cleared when the index is created by this run.
+
+    If `projection_mapping_file` is given, fields that aren't used by the search mapping in that file are stripped
+    from documents before they are sent.
+    """
     logger.info("Search API URL: {search_api_url}", extra={'search_api_url': search_api_url})
     logger.info("Data API URL: {data_api_url}", extra={'data_api_url': data_api_url})
 
-    if serial:
-        mapper = map
-    else:
-        pool = ThreadPool(10)
-        mapper = pool.imap_unordered
-
     indexer = indexers[doc_type](
         doc_type,
         dmapiclient.DataAPIClient(data_api_url, data_api_access_token),
         dmapiclient.SearchAPIClient(search_api_url, search_api_access_token),
         index)
+
+    bulk_indexer = None
+    if bulk:
+        bulk_indexer = BulkIndexer(indexer, batch_size=bulk_batch_size, max_batch_bytes=bulk_max_batch_bytes)
+        if not bulk_indexer.is_supported():
+            logger.warning("Search API does not support bulk requests, indexing one item at a time")
+            bulk_indexer = None
+
+    mapper = make_mapper(
+        serial, async_engine, max_concurrency, queue_depth, batch_size=bulk_batch_size if bulk_indexer else None,
+    )
+    # the same index name can be used by the search API on each stage, so the cache is kept for the target index
+    cache = IndexedDocumentCache(cache_file, index_target(search_api_url, index), force=force) if cache_file else None
     if mapping and search_mapping_matches_framework(mapping, frameworks):
         indexer.create_index(mapping=mapping)
+        if cache:
+            # the index may have been deleted and created again empty, so documents have to be sent regardless
+            cache.clear()
+    if projection_mapping_file:
+        indexer.projection = MappingProjection.from_file(projection_mapping_file)
 
     counter = 0
     start_time = datetime.utcnow()
     status = True
-    items = indexer.request_items(frameworks)
-    for result in mapper(indexer, items):
-        counter += 1
-        status = status and result
-        print_progress(counter, start_time)
+    checkpoints = IndexCheckpoints(checkpoint_file) if checkpoint_file else None
+    updated_since = checkpoints.get(index, frameworks) if checkpoints else None
+    if updated_since:
+        logger.info("Indexing items updated since {updated_since}", extra={'updated_since': updated_since})
+
+    journal = None
+    if journal_file:
+        journal = IndexJournal(journal_file, index, frameworks, start_time.strftime(DATETIME_FORMAT), resume=resume)
+        journal.save()
+        items = journal.request_items(
+            indexer, frameworks, updated_since=updated_since, prefetch_pages=prefetch_pages, concurrent=not serial,
+        )
+    elif updated_since:
+        items = indexer.request_items_updated_since(
+            frameworks, updated_since, prefetch_pages=prefetch_pages, concurrent=not serial,
+        )
+    else:
+        items = indexer.request_items(frameworks, prefetch_pages=prefetch_pages, concurrent=not serial)
+
+    framework_counts = FrameworkCounts()
+
+    if bulk_indexer:
+        worker = cache.skipping(indexer, bulk_indexer, batched=True) if cache else bulk_indexer
+        worker = journal.recording(worker, batched=True) if journal else worker
+        worker = framework_counts.counting(worker, batched=True)
+        results = chain.from_iterable(mapper(worker, bulk_indexer.batches(items)))
+    else:
+        worker = cache.skipping(indexer, indexer) if cache else indexer
+        worker = journal.recording(worker) if journal else worker
+        worker = framework_counts.counting(worker)
+        results = mapper(worker, items)
+    try:
+        for result in results:
+            counter += 1
+            status = status and result
+            print_progress(counter, start_time, framework_counts)
+    finally:
+        if cache:
+            cache.close()
+        if prefetch_pages:
+            for _, prefetcher in indexer.prefetchers:
+                prefetcher.close()
+
+    logger.info("{summary}", extra={'summary': framework_counts.summary()})
+    if cache:
+        logger.info("{written} documents written, {skipped} unchanged documents skipped", extra={
+            'written': cache.written, 'skipped': cache.skipped,
+        })
+
+    if prefetch_pages:
+        for name, prefetcher in indexer.prefetchers:
+            logger.info("Waited {wait_time:.1f}s for {waits} of {count} pages of {name}", extra={
+                'wait_time': prefetcher.wait_time, 'waits': prefetcher.waits, 'count': prefetcher.count, 'name': name,
+            })
+
+    if indexer.projection:
+        logger.info("Projection to the search mapping saved {saved:.1f}MB", extra={
+            'saved': indexer.projection.bytes_saved / (1024 * 1024),
+        })
+
+    if journal:
+        # items that failed on an earlier attempt stay in the journal until they are indexed successfully
+        status = not journal.failed
+        if journal.failed:
+            logger.error("{count} items not indexed", extra={'count': len(journal.failed)})
+
+    if checkpoints and status:
+        # a resumed run only covers items updated since the original run started
+        started_at = journal.started_at if journal else start_time.strftime(DATETIME_FORMAT)
+        checkpoints.set(index, frameworks, checkpoint_for_run(started_at))
 
+    log_peak_memory_usage()
     return status
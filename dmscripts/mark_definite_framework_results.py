@@ -4,6 +4,8 @@ import logging
 
 import jsonschema
 
+from dmscripts.helpers.framework_helpers import count_draft_statuses, find_draft_service_counts
+
 
 def _passes_validation(candidate, schema, logger, schema_name="schema", tablevel=0, loglevel=logging.INFO):
     try:
@@ -22,11 +24,15 @@ def _assess_draft_services(
     framework_slug,
     supplier_id,
     logger=logging.getLogger("script"),
+    draft_counts=None,
 ):
     # A supplier must have at least 1 submitted service
-    counter = Counter()
-    for draft_service in client.find_draft_services_by_framework_iter(framework_slug, supplier_id=supplier_id):
-        counter[draft_service["status"]] += 1
+    if draft_counts is not None:
+        counter = count_draft_statuses(draft_counts.get(supplier_id, {}))
+    else:
+        counter = Counter()
+        for draft_service in client.find_draft_services_by_framework_iter(framework_slug, supplier_id=supplier_id):
+            counter[draft_service["status"]] += 1
 
     logger.info(
         "\tDraft services:  %s submitted, %s not-submitted",
@@ -48,6 +54,7 @@ def mark_definite_framework_results(
     supplier_ids=None,
     logger=logging.getLogger("script"),
     excluded_supplier_ids=None,
+    bulk=False,
 ):
     interested_supplier_ids = supplier_ids or client.get_interested_suppliers(
         framework_slug
@@ -58,6 +65,9 @@ def mark_definite_framework_results(
     if excluded_supplier_ids is not None:
         interested_supplier_ids = list(set(interested_supplier_ids) - set(excluded_supplier_ids))
 
+    # count every supplier's draft services in one sweep, rather than a request per supplier
+    draft_counts = find_draft_service_counts(client, framework_slug) if bulk else None
+
     # Loop over suppliers breaking out if they pass or fail, if they make it to the end they get a discretionary pass
     for i, supplier_id in enumerate(interested_supplier_ids, start=1):
         logger.info(
@@ -85,7 +95,8 @@ def mark_definite_framework_results(
             client,
             framework_slug,
             supplier_id,
-            logger=logger
+            logger=logger,
+            draft_counts=draft_counts,
         )
         if not service_counter["submitted"]:
             fail_supplier(supplier_id, framework_slug, updated_by, supplier_framework, client, logger, dry_run=dry_run)
@@ -2,12 +2,11 @@
 from datetime import datetime, date, timedelta
 
 import dmapiclient
-from dmutils.email.exceptions import EmailError, EmailTemplateError
 from dmutils.formats import DATE_FORMAT
 
 from dmscripts.helpers import logging_helpers, brief_data_helpers
 
-from dmscripts.helpers.email_helpers import scripts_notify_client
+from dmscripts.helpers.email_helpers import DEFAULT_SEND_WORKERS, Email, scripts_notify_client, send_emails
 
 logger = logging_helpers.configure_logger({'dmapiclient': logging_helpers.logging.INFO})
 
@@ -46,36 +45,30 @@ def _get_brief_closing_date(offset_days, closing_date_arg=None):
     return date.today() - timedelta(days=offset_days)
 
 
-def send_email_to_brief_user_via_notify(notify_client, notify_template_id, user, brief, user_id_list, dry_run):
+def email_for_brief_user(notify_template_id, user, brief, user_id_list, dry_run):
+    """Return the email to send to `user` about `brief`, or None if they aren't to be sent one"""
     if user_id_list and user['id'] not in user_id_list:
         # If a user ID list is supplied, only email users for this brief that are in the list
-        return
+        return None
 
     logging_context = {
         'brief_title': brief['title'],
         'brief_id': brief['id'],
         'user_id': user['id'],
     }
-    email_context_data = _create_context_for_brief(brief)
-    if user['active']:
-        try:
-            if dry_run:
-                logger.info(
-                    "Would notify user ID {user_id} about brief ID {brief_id}: '{brief_title}'",
-                    extra=logging_context
-                )
-            else:
-                logger.info(
-                    "Notifying user ID {user_id} about brief ID {brief_id}: '{brief_title}'",
-                    extra=logging_context
-                )
-                notify_client.send_email(
-                    user['emailAddress'], notify_template_id, email_context_data, allow_resend=False
-                )
-        except EmailTemplateError:
-            raise  # do not try to continue
-        except EmailError:
-            return user['id']
+    if not user['active']:
+        return None
+    if dry_run:
+        logger.info(
+            "Would notify user ID {user_id} about brief ID {brief_id}: '{brief_title}'",
+            extra=logging_context
+        )
+        return None
+    logger.info(
+        "Notifying user ID {user_id} about brief ID {brief_id}: '{brief_title}'",
+        extra=logging_context
+    )
+    return Email(user['emailAddress'], notify_template_id, _create_context_for_brief(brief))
 
 
 def _log_failures(failed_users_by_brief_id, date_closed):
@@ -101,7 +94,7 @@ def _log_failures(failed_users_by_brief_id, date_closed):
 
 def main(
     data_api_url, data_api_access_token, notify_api_key, notify_template_id, offset_days,
-    dry_run=None, date_closed=None, user_id_list=None
+    dry_run=None, date_closed=None, user_id_list=None, workers=DEFAULT_SEND_WORKERS
 ):
     """
     Send emails to buyers via Notify, reminding them to award their closed briefs
@@ -110,6 +103,7 @@ def main(
     dry_run:        log instead of sending emails
     date_closed:    if supplied, send emails for briefs that closed on this date
     user_id_list:   if supplied, only send emails to buyers with these user IDs
+    workers:        number of emails to send at once
     """
     logger.info("Data API URL: {data_api_url}", extra={'data_api_url': data_api_url})
 
@@ -134,17 +128,21 @@ def main(
         'briefs_count': len(closed_briefs), "date_closed": date_closed
     })
 
-    failed_users_by_brief_id = {}
+    brief_users, emails = [], []
     for brief in closed_briefs:
-        failed_users_for_this_brief = []
         for user in brief['users']:
-            failed_user_id = send_email_to_brief_user_via_notify(
-                notify_client, notify_template_id, user, brief, user_id_list, dry_run
-            )
-            if failed_user_id:
-                failed_users_for_this_brief.append(failed_user_id)
-        if failed_users_for_this_brief:
-            failed_users_by_brief_id[brief['id']] = failed_users_for_this_brief
+            email = email_for_brief_user(notify_template_id, user, brief, user_id_list, dry_run)
+            if email:
+                brief_users.append((brief['id'], user['id']))
+                emails.append(email)
+
+    # An EmailTemplateError stops all the sending and is raised, other failures are logged below
+    results = send_emails(notify_client, emails, workers=workers, logger=logger, allow_resend=False)
+
+    failed_users_by_brief_id = {}
+    for (brief_id, user_id), result in zip(brief_users, results):
+        if result.error:
+            failed_users_by_brief_id.setdefault(brief_id, []).append(user_id)
 
     if failed_users_by_brief_id:
         _log_failures(failed_users_by_brief_id, date_closed)
@@ -8,11 +8,13 @@ from warnings import warn
 from dmapiclient import DataAPIClient
 
 from dmutils.email import DMNotifyClient
-from dmutils.email.exceptions import EmailError, EmailTemplateError
 from dmutils.email.helpers import hash_string
 from dmutils.env_helpers import get_web_url_from_stage
 from dmutils import formats
 
+from dmscripts.helpers.email_helpers import DEFAULT_SEND_WORKERS, Email, send_emails
+from dmscripts.helpers.supplier_data_helpers import get_email_addresses_by_supplier, get_email_addresses_for_supplier
+
 
 _date_formats = (
     "displaytimeformat",
@@ -63,6 +65,8 @@ def notify_suppliers_of_framework_application_event(
     dry_run: bool,
     logger: Logger,
     run_id: Optional[UUID] = None,
+    workers: int = DEFAULT_SEND_WORKERS,
+    bulk: bool = False,
 ) -> int:
     run_is_new = not run_id
     run_id = run_id or uuid4()
@@ -77,14 +81,16 @@ def notify_suppliers_of_framework_application_event(
         **_formatted_dates_from_framework(framework),
     }
 
-    failure_count = 0
+    email_addresses_by_supplier = get_email_addresses_by_supplier(data_api_client) if bulk else None
 
-    for supplier_framework in data_api_client.find_framework_suppliers_iter(framework_slug):
-        for user in data_api_client.find_users_iter(supplier_id=supplier_framework["supplierId"]):
-            if user["active"]:
+    def emails_to_send():
+        for supplier_framework in data_api_client.find_framework_suppliers_iter(framework_slug):
+            for email_address in get_email_addresses_for_supplier(
+                data_api_client, supplier_framework["supplierId"], email_addresses_by_supplier
+            ):
                 # generating ref separately so we can exclude certain parameters from the context dict
                 notify_ref = notify_client.get_reference(
-                    user["emailAddress"],
+                    email_address,
                     notify_template_id,
                     {
                         "framework_slug": framework["slug"],
@@ -96,35 +102,24 @@ def notify_suppliers_of_framework_application_event(
                     if notify_client.has_been_sent(notify_ref, use_recent_cache=run_is_new):
                         logger.debug(
                             "[DRY RUN] Would NOT send notification to {email_hash} (already sent)",
-                            extra={"email_hash": hash_string(user["emailAddress"])},
+                            extra={"email_hash": hash_string(email_address)},
                         )
                     else:
                         logger.info(
                             "[DRY RUN] Would send notification to {email_hash}",
-                            extra={"email_hash": hash_string(user["emailAddress"])},
+                            extra={"email_hash": hash_string(email_address)},
                         )
                 else:
-                    try:
-                        # Use the sent references cache unless we're re-running the script following a failure
-                        notify_client.send_email(
-                            user["emailAddress"],
-                            notify_template_id,
-                            framework_context,
-                            allow_resend=False,
-                            reference=notify_ref,
-                            use_recent_cache=run_is_new,
-                        )
-                    except EmailError as e:
-                        failure_count += 1
-                        logger.error(
-                            "Failed sending to {email_hash}: {e}",
-                            extra={
-                                "email_hash": hash_string(user["emailAddress"]),
-                                "e": str(e),
-                            },
-                        )
-
-                        if isinstance(e, EmailTemplateError):
-                            raise  # do not try to continue
-
-    return failure_count
+                    yield Email(email_address, notify_template_id, framework_context, reference=notify_ref)
+
+    # An EmailTemplateError stops all the sending and is raised, other failures are counted
+    results = send_emails(
+        notify_client,
+        emails_to_send(),
+        workers=workers,
+        logger=logger,
+        allow_resend=False,
+        # Use the sent references cache unless we're re-running the script following a failure
+        use_recent_cache=run_is_new,
+    )
+    return sum(1 for result in results if result.error)
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 
 from dmscripts.helpers import logging_helpers
 from dmscripts.helpers.logging_helpers import logging
+from dmscripts.helpers.supplier_data_helpers import get_email_addresses_by_supplier
 from dmutils.email.exceptions import EmailError, EmailTemplateError
 from dmutils.email.dm_notify import DMNotifyClient
 from dmutils.formats import DATETIME_FORMAT
@@ -96,7 +97,7 @@ def send_supplier_emails(email_api_key, email_addresses, supplier_context, logge
         )
 
 
-def main(data_api_url, data_api_token, email_api_key, stage, dry_run, supplier_ids=[]):
+def main(data_api_url, data_api_token, email_api_key, stage, dry_run, supplier_ids=[], bulk=False):
     logger.info("Begin to send brief update notification emails")
 
     # get today at 8 in the morning
@@ -129,6 +130,8 @@ def main(data_api_url, data_api_token, email_api_key, stage, dry_run, supplier_i
         )
     )
 
+    email_addresses_by_supplier = get_email_addresses_by_supplier(data_api_client) if bulk else None
+
     failed_supplier_ids = []
 
     for supplier_id, brief_ids in interested_suppliers.items():
@@ -136,7 +139,10 @@ def main(data_api_url, data_api_token, email_api_key, stage, dry_run, supplier_i
         supplier_briefs = [b for b in briefs if b['id'] in brief_ids]
         # get a context for each supplier email
         supplier_context = create_context_for_supplier(stage, supplier_briefs)
-        email_addresses = get_supplier_email_addresses_by_supplier_id(data_api_client, supplier_id)
+        if email_addresses_by_supplier is not None:
+            email_addresses = email_addresses_by_supplier.get(supplier_id, [])
+        else:
+            email_addresses = get_supplier_email_addresses_by_supplier_id(data_api_client, supplier_id)
         if not email_addresses:
             logger.info(
                 "Email not sent for the following supplier ID due to no active users: {supplier_id}",
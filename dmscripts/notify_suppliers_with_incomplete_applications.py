@@ -1,5 +1,5 @@
-from dmscripts.helpers.email_helpers import scripts_notify_client
-from dmutils.email.exceptions import EmailError, EmailTemplateError
+from dmscripts.helpers.email_helpers import DEFAULT_SEND_WORKERS, Email, scripts_notify_client, send_emails
+from dmscripts.helpers.framework_helpers import count_draft_statuses, find_draft_service_counts
 from dmutils.email.helpers import hash_string
 from dmutils.formats import utctoshorttimelongdateformat
 
@@ -15,39 +15,7 @@ MESSAGES = {
 }
 
 
-def send_notification(mail_client, message, framework, email, supplier_id, dry_run):
-    prefix = "[Dry Run] " if dry_run else ""
-    mail_client.logger.info(
-        f"{prefix}Sending email to supplier '{supplier_id}' "
-        f"user '{hash_string(email)}'"
-    )
-    if not dry_run:
-        try:
-            mail_client.send_email(
-                email,
-                NOTIFY_TEMPLATE_ID,
-                {
-                    'message': message,
-                    'framework_name': framework['name'],
-                    'framework_slug': framework['slug'],
-                    'application_deadline': utctoshorttimelongdateformat(framework['applicationsCloseAtUTC'])
-                },
-                allow_resend=False
-            )
-        except EmailError as e:
-            mail_client.logger.error(
-                f"Error sending email to supplier '{supplier_id}' "
-                f"user '{hash_string(email)}': {e}"
-            )
-
-            if isinstance(e, EmailTemplateError):
-                raise  # do not try to continue
-
-            return 1
-    return 0
-
-
-def build_message(sf, framework_slug, data_api_client):
+def build_message(sf, framework_slug, data_api_client, draft_counts=None):
     message = ''
     if not sf.get('applicationCompanyDetailsConfirmed', None):
         message += MESSAGES['unconfirmed_company_details']
@@ -55,11 +23,15 @@ def build_message(sf, framework_slug, data_api_client):
         message += MESSAGES['incomplete_declaration']
 
     submitted_draft_services, unsubmitted_draft_services = 0, 0
-    for service in data_api_client.find_draft_services_iter(sf['supplierId'], framework=framework_slug):
-        if service.get('status') == 'not-submitted':
-            unsubmitted_draft_services += 1
-        if service.get('status') == 'submitted':
-            submitted_draft_services += 1
+    if draft_counts is not None:
+        statuses = count_draft_statuses(draft_counts.get(sf['supplierId'], {}))
+        submitted_draft_services, unsubmitted_draft_services = statuses['submitted'], statuses['not-submitted']
+    else:
+        for service in data_api_client.find_draft_services_iter(sf['supplierId'], framework=framework_slug):
+            if service.get('status') == 'not-submitted':
+                unsubmitted_draft_services += 1
+            if service.get('status') == 'submitted':
+                submitted_draft_services += 1
     if submitted_draft_services == 0:
         message += MESSAGES['no_services']
     elif unsubmitted_draft_services > 0:
@@ -68,45 +40,55 @@ def build_message(sf, framework_slug, data_api_client):
 
 
 def notify_suppliers_with_incomplete_applications(
-    framework_slug, data_api_client, notify_api_key, dry_run, logger, supplier_ids=None
+    framework_slug, data_api_client, notify_api_key, dry_run, logger, supplier_ids=None, bulk=False,
+    workers=DEFAULT_SEND_WORKERS,
 ):
     framework = data_api_client.get_framework(framework_slug)['frameworks']
     if framework['status'] != 'open':
         raise ValueError("Suppliers cannot amend applications unless the framework is open.")
 
     mail_client = scripts_notify_client(notify_api_key, logger=logger)
-    error_count = 0
-
-    for sf in data_api_client.find_framework_suppliers_iter(framework_slug):
-        # Restrict suppliers to those specified in the argument, if given.
-        # While this is inefficient for a small number of supplier IDs, looking up
-        # each supplier individually for a large number of supplier IDs would be worse.
-        if supplier_ids:
-            if sf['supplierId'] not in supplier_ids:
-                continue
-
-        message = build_message(sf, framework_slug, data_api_client)
-
-        if message:
-            primary_email = sf.get('declaration', {'primaryContactEmail': None}).get('primaryContactEmail', None)
-            if primary_email:
-                error_count += send_notification(
-                    mail_client,
-                    message,
-                    framework,
-                    primary_email,
-                    sf['supplierId'],
-                    dry_run
+    # count every supplier's draft services in one sweep, rather than a request per supplier
+    draft_counts = find_draft_service_counts(data_api_client, framework_slug) if bulk else None
+
+    def emails_to_send():
+        for sf in data_api_client.find_framework_suppliers_iter(framework_slug):
+            # Restrict suppliers to those specified in the argument, if given.
+            # While this is inefficient for a small number of supplier IDs, looking up
+            # each supplier individually for a large number of supplier IDs would be worse.
+            if supplier_ids:
+                if sf['supplierId'] not in supplier_ids:
+                    continue
+
+            message = build_message(sf, framework_slug, data_api_client, draft_counts=draft_counts)
+
+            if message:
+                primary_email = sf.get('declaration', {'primaryContactEmail': None}).get('primaryContactEmail', None)
+                email_addresses = [primary_email] if primary_email else []
+                email_addresses.extend(
+                    user['emailAddress']
+                    for user in data_api_client.find_users(supplier_id=sf['supplierId']).get('users', [])
+                    if user['active']
                 )
-            for user in data_api_client.find_users(supplier_id=sf['supplierId']).get('users', []):
-                if user['active']:
-                    error_count += send_notification(
-                        mail_client,
-                        message,
-                        framework,
-                        user['emailAddress'],
-                        sf['supplierId'],
-                        dry_run
+                for email_address in email_addresses:
+                    logger.info(
+                        f"{'[Dry Run] ' if dry_run else ''}Sending email to supplier '{sf['supplierId']}' "
+                        f"user '{hash_string(email_address)}'"
                     )
-
-    return error_count
+                    if not dry_run:
+                        yield Email(
+                            email_address,
+                            NOTIFY_TEMPLATE_ID,
+                            {
+                                'message': message,
+                                'framework_name': framework['name'],
+                                'framework_slug': framework['slug'],
+                                'application_deadline': utctoshorttimelongdateformat(
+                                    framework['applicationsCloseAtUTC']
+                                ),
+                            },
+                        )
+
+    # An EmailTemplateError stops all the sending and is raised, other failures are counted
+    results = send_emails(mail_client, emails_to_send(), workers=workers, logger=logger, allow_resend=False)
+    return sum(1 for result in results if result.error)
@@ -1,15 +1,18 @@
 from itertools import chain
 
 
-def get_all_email_addresses_for_supplier(client, supplier_framework):
+def get_all_email_addresses_for_supplier(client, supplier_framework, email_addresses_by_supplier=None):
     # Combine the framework application contact email with all the active user emails
+    supplier_id = int(supplier_framework['frameworkInterest']['supplierId'])
+    if email_addresses_by_supplier is not None:
+        user_email_addresses = email_addresses_by_supplier.get(supplier_id, ())
+    else:
+        user_email_addresses = (
+            user["emailAddress"] for user in client.find_users_iter(supplier_id=supplier_id) if user["active"]
+        )
     return frozenset(chain(
         (supplier_framework["frameworkInterest"]["declaration"]["primaryContactEmail"],),
-        (
-            user["emailAddress"] for user in client.find_users_iter(
-                supplier_id=int(supplier_framework['frameworkInterest']['supplierId'])
-            ) if user["active"]
-        ),
+        user_email_addresses,
     ))
 
 
@@ -8,10 +8,11 @@ from dmapiclient import APIError
 from dmutils.documents import generate_timestamped_document_upload_path, generate_download_filename, \
     COUNTERPART_FILENAME
 from dmutils.email.helpers import hash_string
-from dmutils.email.exceptions import EmailError, EmailTemplateError
+from dmutils.email.exceptions import EmailError
 
 from dmscripts.bulk_upload_documents import get_supplier_id_from_framework_file_path
 from dmscripts.helpers import logging_helpers
+from dmscripts.helpers.email_helpers import DEFAULT_SEND_WORKERS, Email, send_emails
 
 
 def upload_counterpart_file(
@@ -25,6 +26,7 @@ def upload_counterpart_file(
     notify_template_id=None,
     notify_fail_early=True,
     logger=None,
+    workers=DEFAULT_SEND_WORKERS,
 ):
     if bool(dm_notify_client) != bool(notify_template_id):
         raise TypeError("Either specify both dm_notify_client and notify_template_id or neither")
@@ -79,32 +81,42 @@ def upload_counterpart_file(
             )
 
         failed_send_email_calls = 0
-        for notify_email in (email_addresses_to_notify or ()):
-            try:
-                if not dry_run:
-                    dm_notify_client.send_email(notify_email, notify_template_id, {
-                        "framework_slug": framework["slug"],
-                        "framework_name": framework["name"],
-                        "supplier_name": supplier_name,
-                        "contract_title": contract_title,
-                        "frameworkLiveAt_dateformat": nodaydateformat(framework['frameworkLiveAtUTC'])
-                    }, allow_resend=True)
+        if dry_run:
+            for notify_email in (email_addresses_to_notify or ()):
+                logger.info(
+                    f"[Dry-run] Send notify email to supplier '{supplier_id}' user {hash_string(notify_email)}")
+        elif email_addresses_to_notify:
+            personalisation = {
+                "framework_slug": framework["slug"],
+                "framework_name": framework["name"],
+                "supplier_name": supplier_name,
+                "contract_title": contract_title,
+                "frameworkLiveAt_dateformat": nodaydateformat(framework['frameworkLiveAtUTC'])
+            }
+            emails = [
+                Email(notify_email, notify_template_id, personalisation) for notify_email in email_addresses_to_notify
+            ]
+            # An EmailTemplateError stops all the sending and is raised
+            results = send_emails(
+                dm_notify_client,
+                emails,
+                workers=workers,
+                stop_on_error=notify_fail_early,
+                logger=logger,
+                allow_resend=True,
+            )
+            for result in results:
+                notify_email = result.email.to_email_address
+                if not result.error:
                     logger.debug(f"NOTIFY: sent email to supplier '{supplier_id}' user {hash_string(notify_email)}")
-                else:
-                    logger.info(
-                        f"[Dry-run] Send notify email to supplier '{supplier_id}' user {hash_string(notify_email)}")
-            except EmailError as e:
+                    continue
                 logger.error(
                     f"NOTIFY: Error sending email to supplier '{supplier_id}' user {hash_string(notify_email)}")
 
-                if isinstance(e, EmailTemplateError):
-                    raise  # do not try to continue
-
                 if notify_fail_early:
-                    raise
+                    raise result.error
 
-                else:
-                    failed_send_email_calls += 1
+                failed_send_email_calls += 1
 
     # just catching these exceptions for logging then reraising
     except (OSError, IOError) as e:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Compare the thread pool and the async engine used by index-to-search-service against a local fake search API.
+
+The fake search API takes `--latency` seconds to answer each request and handles at most `--capacity` requests at once,
+answering any more with a 429, so neither engine can simply win by sending everything at the same time.
+
+Usage:
+    benchmark-index-to-search-service.py [options]
+
+Options:
+    -h --help                   Show this screen.
+    --documents=<count>         Number of documents to index [default: 2000]
+    --latency=<seconds>         Time the fake search API takes to answer each request [default: 0.02]
+    --capacity=<count>          Number of requests the fake search API can handle at once [default: 30]
+    --max-concurrency=<count>   Maximum number of requests in flight for the async engine [default: 50]
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from multiprocessing.pool import ThreadPool
+from socketserver import ThreadingMixIn
+import sys
+import threading
+import time
+
+from docopt import docopt
+from dmapiclient import SearchAPIClient
+
+sys.path.insert(0, '.')
+from dmscripts.helpers import logging_helpers
+from dmscripts.index_to_search_service import AsyncIndexEngine, ServiceIndexer, bounded_imap_unordered
+
+
+class FakeSearchAPIServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency, capacity):
+        super().__init__(('127.0.0.1', 0), FakeSearchAPIHandler)
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+
+class FakeSearchAPIHandler(BaseHTTPRequestHandler):
+    def _respond(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            overloaded = self.server.in_flight >= self.server.capacity
+            if overloaded:
+                self.server.rejected += 1
+            else:
+                self.server.in_flight += 1
+
+        if overloaded:
+            status, body = 429, {'error': 'Too many requests'}
+        else:
+            time.sleep(self.server.latency)
+            with self.server.lock:
+                self.server.in_flight -= 1
+            status, body = 200, {'message': 'acknowledged'}
+
+        body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_PUT = do_DELETE = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+def run(name, server, mapper, documents):
+    indexer = ServiceIndexer('services', None, SearchAPIClient(server.url, 'myToken'), 'benchmark')
+    server.rejected = 0
+    start = time.monotonic()
+    results = list(mapper(indexer, documents))
+    elapsed = time.monotonic() - start
+    print("{:<12} {:>6} indexed, {:>6} failed, {:>6} rejected with 429 in {:>6.2f}s ({:>7.1f} documents/s)".format(
+        name, results.count(True), results.count(False), server.rejected, elapsed, len(documents) / elapsed,
+    ))
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    # failed documents are expected when the fake search API is overloaded, so don't log each one
+    logging_helpers.configure_logger({"script": logging_helpers.CRITICAL, "dmapiclient": logging_helpers.CRITICAL})
+
+    server = FakeSearchAPIServer(float(arguments['--latency']), int(arguments['--capacity']))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    documents = [{'id': i, 'status': 'published', 'serviceName': 'Service {}'.format(i)}
+                 for i in range(int(arguments['--documents']))]
+
+    pool = ThreadPool(10)
+    run('threads', server, lambda worker, items: bounded_imap_unordered(pool, worker, items, 100), documents)
+    run('async', server, AsyncIndexEngine(max_concurrency=int(arguments['--max-concurrency'])), documents)
+    server.shutdown()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Compare MultiCSVWriter against the writer it replaced, using a synthetic stream of framework results records.
+
+The records are written through the handlers used by export-framework-results-reasons.py, to a temporary directory.
+The previous writer asked every handler whether it matched each record, built a dict for each row to pass to a
+DictWriter, and used default buffering for each file.
+
+Usage:
+    benchmark-multi-csv-writer.py [options]
+
+Options:
+    -h --help               Show this screen.
+    --records=<count>       Number of supplier records to write [default: 200000]
+    --repeat=<count>        Number of times to time each writer, keeping the fastest [default: 3]
+"""
+from collections import Counter
+import csv
+import random
+import sys
+import tempfile
+import time
+
+from docopt import docopt
+
+sys.path.insert(0, '.')
+from dmscripts.export_framework_results_reasons import DiscretionaryHandler, FailedHandler, SuccessfulHandler
+from dmscripts.helpers.csv_helpers import MultiCSVWriter
+
+
+class PreviousMultiCSVWriter(MultiCSVWriter):
+    def write_row(self, record):
+        for handler in self.handlers:
+            should_write = handler.should_write(record)
+            if handler.matches(record) and should_write:
+                self._counters.update([handler.NAME])
+                row = handler.create_row(record)
+                return self.csv_writer(handler, row).writerow(dict(row))
+            elif not should_write:
+                return
+        raise ValueError("record not handled by any handler")
+
+    def csv_writer(self, handler, row):
+        if handler.NAME not in self._csv_writers:
+            fieldnames = [key for key, _ in row]
+            self._csv_writers[handler.NAME] = csv.DictWriter(self._csv_files[handler.NAME], fieldnames=fieldnames)
+            self._csv_writers[handler.NAME].writeheader()
+
+        return self._csv_writers[handler.NAME]
+
+    def _open(self, path):
+        return open(path, 'w+')
+
+
+def synthetic_records(count):
+    rng = random.Random(1)
+    for supplier_id in range(count):
+        failed_mandatory = rng.choice([[], [], ['INCOMPLETE'], ['Q3 - shouldBeFalseStrict']])
+        yield {
+            'supplier': {'id': supplier_id, 'name': 'Supplier {}'.format(supplier_id)},
+            'frameworkSlug': 'g-cloud-99',
+            'onFramework': rng.choice([True, True, False, None]),
+            'failed_mandatory': failed_mandatory,
+            'discretionary': [('Q7 - shouldBeFalseLax', True)] if rng.random() < 0.2 else [],
+            'counts': Counter({('cloud-hosting', rng.choice(['submitted', 'not-submitted', 'failed'])): 3}),
+            'declaration': {
+                'status': 'complete',
+                'primaryContact': 'Contact {}'.format(supplier_id),
+                'primaryContactEmail': 'supplier.{}@example.com'.format(supplier_id),
+                'mitigatingFactors': 'Mitigating factors ' * 10,
+            },
+        }
+
+
+def run(name, writer_class, records, repeat):
+    timings = []
+    for _ in range(repeat):
+        handlers = [handler('g-cloud-99', 'benchmark') for handler in (SuccessfulHandler, FailedHandler,
+                                                                       DiscretionaryHandler)]
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            with writer_class(output_dir, handlers) as writer:
+                for record in records:
+                    writer.write_row(record)
+            timings.append(time.perf_counter() - start)
+
+    elapsed = min(timings)
+    counts = " ".join("{}={}".format(handler.NAME, writer._counters[handler.NAME]) for handler in handlers)
+    print("{:<10} {:>7.2f}s ({:>9.0f} records/s) {}".format(name, elapsed, len(records) / elapsed, counts))
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    records = list(synthetic_records(int(arguments['--records'])))
+    repeat = int(arguments['--repeat'])
+
+    run('previous', PreviousMultiCSVWriter, records, repeat)
+    run('current', MultiCSVWriter, records, repeat)
+    run('gzip', lambda output_dir, handlers: MultiCSVWriter(output_dir, handlers, compress=True), records, repeat)
@@ -9,9 +9,10 @@ Usage:
 Options:
     -v --verbose                Print INFO level messages.
     --output-dir=<output_dir>   Directory to write csv files to [default: output]
+    --bulk                      Fetch suppliers, declarations and draft services in one sweep each
+    --from-snapshot=<file>      Read from a snapshot made by snapshot-framework.py instead of the API
 """
 import itertools
-from multiprocessing.pool import ThreadPool
 import os
 import sys
 sys.path.insert(0, '.')
@@ -22,6 +23,8 @@ from dmapiclient import DataAPIClient
 
 from dmscripts.helpers.auth_helpers import get_auth_token
 from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_services
+from dmscripts.helpers.pipeline_helpers import Pipeline
+from dmscripts.helpers.snapshot_helpers import SnapshotClient
 from dmscripts.helpers import logging_helpers
 from dmscripts.export_dos_labs import append_contact_information_to_services
 from dmutils.env_helpers import get_api_endpoint_from_stage
@@ -34,12 +37,13 @@ else:
 REQUIRED_CONTACT_DETAILS_KEYS = ['email', 'contactName', 'phoneNumber']
 
 
-def find_all_labs(client, map_impl=map):
+def find_all_labs(client, map_impl=map, bulk=False):
     records = find_suppliers_with_details_and_draft_services(client,
                                                              FRAMEWORK_SLUG,
                                                              lot="user-research-studios",
                                                              statuses="submitted",
                                                              map_impl=map_impl,
+                                                             bulk=bulk,
                                                              )
     records = list(filter(lambda record: record['onFramework'], records))
     records = append_contact_information_to_services(records, REQUIRED_CONTACT_DETAILS_KEYS)
@@ -77,13 +81,17 @@ if __name__ == '__main__':
         logger.info("Creating {} directory".format(OUTPUT_DIR))
         os.makedirs(OUTPUT_DIR)
 
-    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+    if arguments['--from-snapshot']:
+        client = SnapshotClient(arguments['--from-snapshot'])
+    else:
+        client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
 
-    pool = ThreadPool(3)
+    pipeline = Pipeline(workers=3)
 
     logger.info(f"Finding suppliers for User Research Studios on {FRAMEWORK_SLUG}")
     write_labs_csv(
-        find_all_labs(client, map_impl=pool.imap),
+        find_all_labs(client, map_impl=pipeline, bulk=arguments['--bulk']),
         os.path.join(OUTPUT_DIR, "user-research-studios.csv"),
         logger=logger
     )
+    pipeline.log_stats()
@@ -10,38 +10,45 @@ Usage:
 Options:
     -v --verbose                Print INFO level messages.
     --output-dir=<output_dir>   Directory to write csv files to [default: output]
+    --bulk                      Fetch suppliers, declarations and draft services in one sweep each
+    --from-snapshot=<file>      Read from a snapshot made by snapshot-framework.py instead of the API
+    --format=<format>           Output format, one of csv, jsonl or parquet [default: csv]
 
 """
-from multiprocessing.pool import ThreadPool
 import os
 import sys
 sys.path.insert(0, '.')
 
 import logging
-from dmscripts.helpers.csv_helpers import make_fields_from_content_questions
+from dmscripts.helpers.csv_helpers import ContentQuestionFields
 from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_services
+from dmscripts.helpers.pipeline_helpers import Pipeline
+from dmscripts.helpers.snapshot_helpers import SnapshotClient
 
 from docopt import docopt
 from dmscripts.helpers.csv_helpers import write_csv_with_make_row
 from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.export_helpers import export_format_error, export_path
 from dmapiclient import DataAPIClient
 from dmcontent.content_loader import ContentLoader
 from dmscripts.helpers import logging_helpers
 from dmutils.env_helpers import get_api_endpoint_from_stage
 
 
-def find_all_participants(client, map_impl=map):
+def find_all_participants(client, map_impl=map, bulk=False):
     return find_suppliers_with_details_and_draft_services(client,
                                                           FRAMEWORK_SLUG,
                                                           lot="user-research-participants",
                                                           statuses="submitted",
                                                           map_impl=map_impl,
+                                                          bulk=bulk,
                                                           )
 
 
 def make_row(content_manifest):
     question_ids = ["recruitMethods", "recruitFromList", "locations"]
     questions = [content_manifest.get_question(question_id) for question_id in question_ids]
+    question_fields = ContentQuestionFields(questions)
 
     def inner(record):
         row = [
@@ -50,13 +57,15 @@ def make_row(content_manifest):
             ("supplier_declaration_name", record["declaration"].get("supplierRegisteredName", "")),
             ("status", "PASSED" if record["onFramework"] else "FAILED"),
         ]
-        return row + make_fields_from_content_questions(questions, record)
+        return row + question_fields(record)
 
     return inner
 
 
 if __name__ == '__main__':
     arguments = docopt(__doc__)
+    if export_format_error(arguments['--format']):
+        sys.exit(export_format_error(arguments['--format']))
 
     STAGE = arguments['<stage>']
     CONTENT_PATH = arguments['<content_path>']
@@ -72,21 +81,26 @@ if __name__ == '__main__':
         logger.info("Creating {} directory".format(OUTPUT_DIR))
         os.makedirs(OUTPUT_DIR)
 
-    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+    if arguments['--from-snapshot']:
+        client = SnapshotClient(arguments['--from-snapshot'])
+    else:
+        client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
 
     content_loader = ContentLoader(CONTENT_PATH)
     content_loader.load_manifest(FRAMEWORK_SLUG, "services", "edit_submission")
     content_manifest = content_loader.get_manifest(FRAMEWORK_SLUG, "edit_submission")
 
-    pool = ThreadPool(3)
+    pipeline = Pipeline(workers=3)
 
     logger.info(f'Finding User Research Participants suppliers for {FRAMEWORK_SLUG}')
-    records = find_all_participants(client, map_impl=pool.imap)
+    records = find_all_participants(client, map_impl=pipeline, bulk=arguments['--bulk'])
+    pipeline.log_stats()
 
     logger.info(f"Building CSV for {len(records)} User Research Participants suppliers")
     write_csv_with_make_row(
         records,
         make_row(content_manifest),
-        os.path.join(OUTPUT_DIR, "user-research-participants-suppliers.csv"),
-        include_last_updated=True
+        export_path(os.path.join(OUTPUT_DIR, "user-research-participants-suppliers.csv"), arguments['--format']),
+        include_last_updated=True,
+        export_format=arguments['--format'],
     )
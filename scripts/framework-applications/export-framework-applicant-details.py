@@ -4,9 +4,14 @@
 
 Usage:
     scripts/framework-applications/export-framework-applicant-details.py <stage> <framework_slug> <output_dir>
+        [--format=<format>] [--bulk] [--from-snapshot=<file>] [--api-cache=<file>]
 
 Options:
     --verbose                   Show debug log messages
+    --format=<format>           Output format, one of csv, jsonl or parquet [default: csv]
+    --bulk                      Fetch suppliers, declarations and draft services in one sweep each
+    --from-snapshot=<file>      Read from a snapshot made by snapshot-framework.py instead of the API
+    --api-cache=<file>          Reuse suppliers and framework details fetched by earlier runs, cached in this file
     -h, --help                  Show this screen
 
 Example:
@@ -15,23 +20,28 @@ Example:
 """
 import datetime
 import errno
-from multiprocessing.pool import ThreadPool
 import os
 import sys
 
 sys.path.insert(0, '.')
 
 from docopt import docopt
+from dmscripts.helpers.api_cache_helpers import CachedDataAPIClient
 from dmscripts.helpers.auth_helpers import get_auth_token
 from dmscripts.helpers.logging_helpers import configure_logger, get_logger
 from dmscripts.helpers.logging_helpers import INFO as loglevel_INFO, DEBUG as loglevel_DEBUG
 from dmscripts.export_framework_applicant_details import export_supplier_details
+from dmscripts.helpers.export_helpers import export_format_error, export_path
+from dmscripts.helpers.pipeline_helpers import Pipeline
+from dmscripts.helpers.snapshot_helpers import SnapshotClient
 from dmapiclient import DataAPIClient
 from dmutils.env_helpers import get_api_endpoint_from_stage
 
 
 if __name__ == '__main__':
     arguments = docopt(__doc__)
+    if export_format_error(arguments['--format']):
+        sys.exit(export_format_error(arguments['--format']))
 
     STAGE = arguments['<stage>']
     FRAMEWORK = arguments['<framework_slug>']
@@ -40,11 +50,16 @@ if __name__ == '__main__':
     configure_logger({"script": loglevel_DEBUG if arguments["--verbose"] else loglevel_INFO})
     logger = get_logger()
 
-    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+    if arguments['--from-snapshot']:
+        client = SnapshotClient(arguments['--from-snapshot'])
+    else:
+        client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+        if arguments['--api-cache']:
+            client = CachedDataAPIClient(client, arguments['--api-cache'])
     now = datetime.datetime.now()
 
     filename = FRAMEWORK + "-supplier-about-you-data-" + now.strftime("%Y-%m-%d_%H.%M-") + STAGE + ".csv"
-    filepath = OUTPUT_DIR + os.sep + filename
+    filepath = export_path(OUTPUT_DIR + os.sep + filename, arguments['--format'])
 
     # Create output directory if it doesn't already exist
     if not os.path.exists(os.path.dirname(filepath)):
@@ -56,8 +71,11 @@ if __name__ == '__main__':
 
     framework_lot_slugs = tuple([lot['slug'] for lot in client.get_framework(FRAMEWORK)['frameworks']['lots']])
 
-    pool = ThreadPool(3)
+    pipeline = Pipeline(workers=3)
 
     export_supplier_details(
-        client, FRAMEWORK, filepath, framework_lot_slugs=framework_lot_slugs, map_impl=pool.imap, logger=logger
+        client, FRAMEWORK, filepath, framework_lot_slugs=framework_lot_slugs, map_impl=pipeline, logger=logger,
+        export_format=arguments['--format'],
+        bulk=arguments['--bulk'],
     )
+    pipeline.log_stats()
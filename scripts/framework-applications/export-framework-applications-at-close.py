@@ -31,10 +31,12 @@ from docopt import docopt
 sys.path.insert(0, '.')
 
 from dmscripts.export_framework_applications_at_close import GenerateFrameworkApplicationsCSV
+from dmscripts.helpers.logging_helpers import ProgressReporter, configure_logger
 from dmutils.env_helpers import get_api_endpoint_from_stage
 
 if __name__ == "__main__":
     arguments = docopt(__doc__)
+    configure_logger()
 
     output_dir = arguments['<output-dir>']
     stage = arguments['<stage>']
@@ -61,7 +63,5 @@ if __name__ == "__main__":
     if arguments.get('<exclude_suppliers>') is not None:  # updates the generator with any IDs the user wants excluded
         csv_builder.excluded_supplier_ids = [int(n) for n in arguments['<exclude_suppliers>'].split(',')]
 
-    csv_builder.populate_output()
-
     with open(os.path.join(output_dir, filename), 'w') as csvfile:
-        csv_builder.write_csv(outfile=csvfile)
+        csv_builder.stream_csv(outfile=csvfile, progress=ProgressReporter("suppliers", every=100))
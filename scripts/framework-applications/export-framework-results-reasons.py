@@ -14,18 +14,26 @@ Produces three files;
 
 Usage:
     scripts/framework-applications/export-framework-results-reasons.py [-h] <stage> <framework_slug> <content_path>
-        <output_dir> <declaration_schema_path> [<supplier_id_file>][-e <excluded_supplier_ids>]
+        <output_dir> <declaration_schema_path> [<supplier_id_file>][-e <excluded_supplier_ids>] [--gzip] [--bulk]
+        [--from-snapshot=<file>] [--api-cache=<file>]
 
 Options:
     -h --help
+    --gzip      Write gzipped .csv.gz files
+    --bulk      Fetch suppliers, declarations and draft services in one sweep each
+    --from-snapshot=<file>  Read from a snapshot made by snapshot-framework.py instead of the API
+    --api-cache=<file>      Reuse suppliers and framework details fetched by earlier runs, cached in this file
 """
 import json
-from multiprocessing.pool import ThreadPool
 import sys
 sys.path.insert(0, '.')
 
 from docopt import docopt
+from dmscripts.helpers.api_cache_helpers import CachedDataAPIClient
 from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.logging_helpers import configure_logger
+from dmscripts.helpers.pipeline_helpers import Pipeline
+from dmscripts.helpers.snapshot_helpers import SnapshotClient
 from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_file
 from dmscripts.export_framework_results_reasons import export_suppliers
 from dmapiclient import DataAPIClient
@@ -35,8 +43,14 @@ from dmutils.env_helpers import get_api_endpoint_from_stage
 
 if __name__ == '__main__':
     args = docopt(__doc__)
+    configure_logger()
 
-    client = DataAPIClient(get_api_endpoint_from_stage(args['<stage>']), get_auth_token('api', args['<stage>']))
+    if args['--from-snapshot']:
+        client = SnapshotClient(args['--from-snapshot'])
+    else:
+        client = DataAPIClient(get_api_endpoint_from_stage(args['<stage>']), get_auth_token('api', args['<stage>']))
+        if args['--api-cache']:
+            client = CachedDataAPIClient(client, args['--api-cache'])
     content_loader = ContentLoader(args['<content_path>'])
 
     declaration_definite_pass_schema = json.load(open(args["<declaration_schema_path>"], "r"))
@@ -48,7 +62,7 @@ if __name__ == '__main__':
     if args['<excluded_supplier_ids>'] is not None and supplier_ids is not None:
         supplier_ids = list(set(supplier_ids) - set([int(n) for n in args['<excluded_supplier_ids>'].split(',')]))
 
-    pool = ThreadPool(3)
+    pipeline = Pipeline(workers=3)
 
     export_suppliers(
         client,
@@ -58,5 +72,8 @@ if __name__ == '__main__':
         declaration_definite_pass_schema,
         declaration_discretionary_pass_schema,
         supplier_ids,
-        map_impl=pool.imap,
+        map_impl=pipeline,
+        compress=args['--gzip'],
+        bulk=args['--bulk'],
     )
+    pipeline.log_stats()
@@ -22,9 +22,14 @@ Options:
     -h, --help                  Show this help message
 
     -n, --dry-run               Run script without generating files.
-    -t <n>, --threads=<n>       Number of threads to use, if not supplied the
-                                script will be run without threading.
+    -t <n>, --threads=<n>       Number of threads to use for each stage of fetching
+                                supplier details, if not supplied the script will
+                                be run without threading.
     -v, --verbose               Show debug log messages.
+    --from-snapshot=<file>      Read supplier details from a snapshot made by
+                                snapshot-framework.py instead of the API.
+    --api-cache=<file>          Reuse suppliers and framework details fetched by
+                                earlier runs, cached in this file.
 
     If neither `--supplier-ids-from` or `--supplier-id` are provided then
     framework agreements will be generated for all valid suppliers.
@@ -38,7 +43,6 @@ online countries register.
 PDF signature pages are generated for all suppliers that have a framework
 interest and at least one completed draft service.
 """
-from multiprocessing.pool import ThreadPool
 import os
 import pathlib
 import sys
@@ -48,11 +52,14 @@ sys.path.insert(0, ".")
 
 from docopt import docopt
 
+from dmscripts.helpers.api_cache_helpers import CachedDataAPIClient
 from dmscripts.helpers.auth_helpers import get_auth_token
 from dmscripts.helpers.logging_helpers import (
     configure_logger,
     logging,
 )
+from dmscripts.helpers.pipeline_helpers import Pipeline
+from dmscripts.helpers.snapshot_helpers import SnapshotClient
 from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_file
 
 from dmapiclient import DataAPIClient
@@ -87,7 +94,7 @@ if __name__ == "__main__":
     dry_run = args["--dry-run"]
     verbose = args["--verbose"]
     if args["--threads"]:
-        map_impl = ThreadPool(int(args["--threads"])).imap
+        map_impl = Pipeline(workers=int(args["--threads"]))
     else:
         map_impl = map
 
@@ -97,11 +104,17 @@ if __name__ == "__main__":
         "script": logging.DEBUG if verbose else logging.INFO,
     })
 
-    logger.debug(f"connecting to api on {stage}")
-    client = DataAPIClient(
-        get_api_endpoint_from_stage(args["<stage>"]),
-        get_auth_token("api", args["<stage>"]),
-    )
+    if args["--from-snapshot"]:
+        logger.debug(f"reading snapshot {args['--from-snapshot']}")
+        client = SnapshotClient(args["--from-snapshot"])
+    else:
+        logger.debug(f"connecting to api on {stage}")
+        client = DataAPIClient(
+            get_api_endpoint_from_stage(args["<stage>"]),
+            get_auth_token("api", args["<stage>"]),
+        )
+        if args["--api-cache"]:
+            client = CachedDataAPIClient(client, args["--api-cache"])
 
     logger.debug(f"fetching lots for framework '{framework_slug}'")
     framework = client.get_framework(framework_slug)["frameworks"]
@@ -27,6 +27,7 @@ Usage:
 -v, --verbose                     Produce more detailed console output
 --supplier-id-file=<path>         Path to file containing supplier ids to check. One ID per line.
 --excluded-supplier-ids=<esis>    Supplier IDs to be excluded.
+--bulk                            Count all suppliers' draft services in one sweep rather than a request per supplier
 """
 import sys
 sys.path.insert(0, '.')
@@ -71,4 +72,5 @@ if __name__ == "__main__":
         dry_run=args["--dry-run"],
         supplier_ids=supplier_ids,
         excluded_supplier_ids=args["--excluded-supplier-ids"],
+        bulk=args["--bulk"],
     )
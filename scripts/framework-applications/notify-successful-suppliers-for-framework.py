@@ -27,6 +27,10 @@ Options:
     --supplier-id=<id>          ID(s) of supplier(s) to email.
     --supplier-ids-from=<file>  Path to file containing supplier ID(s), one per line.
 
+    --bulk                      Fetch draft services for all suppliers in one sweep rather than a request per
+                                supplier. Use this unless only a few supplier IDs are given.
+    -t <n>, --threads=<n>       Number of threads to use to fetch draft services for each supplier
+
     -n, --dry-run               Run script without sending emails.
 
     -h, --help                  Show this screen.
@@ -44,6 +48,7 @@ from dmutils.formats import nodaydateformat
 from dmscripts.helpers.email_helpers import scripts_notify_client
 from dmscripts.helpers.auth_helpers import get_auth_token
 from dmscripts.helpers import logging_helpers
+from dmscripts.helpers.pipeline_helpers import Pipeline
 from dmscripts.helpers.supplier_data_helpers import (
     SuccessfulSupplierContextForNotify,
     get_supplier_ids_from_args,
@@ -72,7 +77,8 @@ if __name__ == '__main__':
     context_helper = SuccessfulSupplierContextForNotify(
         api_client, FRAMEWORK_SLUG, supplier_ids=supplier_ids, logger=logger
     )
-    context_helper.populate_data()
+    map_impl = Pipeline(workers=int(arguments['--threads'])) if arguments['--threads'] else map
+    context_helper.populate_data(bulk=arguments['--bulk'], map_impl=map_impl)
     context_data = context_helper.get_users_personalisations()
     framework = api_client.get_framework(FRAMEWORK_SLUG).get('frameworks')
 
@@ -39,7 +39,7 @@ For all emails, the Notify email context includes:
     frameworkExpiresAt_datetimeformat: 'Thursday 6 January 2000 at 12:00am GMT'
 
 Usage: notify-suppliers-of-framework-application-event.py <stage> <framework_slug> <govuk_notify_api_key>
-    <govuk_notify_template_id> [--dry-run] [--resume-run-id=<run_id>]
+    <govuk_notify_template_id> [--dry-run] [--resume-run-id=<run_id>] [--workers=<n>] [--bulk]
 
 Options:
     --stage=<stage>                                       Stage to target
@@ -48,6 +48,9 @@ Options:
     --resume-run-id=<run_id>                              UUID of a previously failed run to use for notify ref
                                                           generation: useful to prevent emails being re-sent to those
                                                           users the previous run was already successful for
+    --workers=<n>                                         Number of emails to send at once [default: 4]
+    --bulk                                                Look up all suppliers' users in one sweep rather than a
+                                                          request per supplier
     --dry-run                                             List notifications that would be sent without sending emails
     -h, --help                                            Show this screen
 
@@ -97,6 +100,8 @@ if __name__ == "__main__":
         dry_run=arguments["--dry-run"],
         logger=logger,
         run_id=run_id,
+        workers=int(arguments["--workers"]),
+        bulk=arguments["--bulk"],
     )
 
     if failure_count:
@@ -40,7 +40,11 @@ from dmcontent.content_loader import ContentLoader
 from dmscripts.helpers.email_helpers import scripts_notify_client
 from dmscripts.helpers.auth_helpers import get_auth_token
 from dmscripts.helpers import logging_helpers
-from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_args, get_email_addresses_for_supplier
+from dmscripts.helpers.supplier_data_helpers import (
+    get_email_addresses_by_supplier,
+    get_email_addresses_for_supplier,
+    get_supplier_ids_from_args,
+)
 from dmutils.email.helpers import hash_string
 from dmutils.env_helpers import get_api_endpoint_from_stage
 
@@ -81,12 +85,16 @@ if __name__ == '__main__':
     contract_title = get_framework_contract_title(CONTENT_PATH, FRAMEWORK_SLUG)
 
     supplier_ids = get_supplier_ids_from_args(arguments)
+    email_addresses_by_supplier = None
     if supplier_ids is None:
         supplier_ids = get_supplier_ids_not_signed(api_client, FRAMEWORK_SLUG)
+        email_addresses_by_supplier = get_email_addresses_by_supplier(api_client)
 
     # Flatten list of lists
-    email_addresses = list(chain.from_iterable(get_email_addresses_for_supplier(api_client, supplier_id)
-                                               for supplier_id in supplier_ids))
+    email_addresses = list(chain.from_iterable(
+        get_email_addresses_for_supplier(api_client, supplier_id, email_addresses_by_supplier)
+        for supplier_id in supplier_ids
+    ))
 
     prefix = "[Dry Run] " if DRY_RUN else ""
     user_count = len(email_addresses)
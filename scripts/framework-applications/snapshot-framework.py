@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Save the suppliers, supplier frameworks (with declarations), draft services, users and framework agreements for a
+framework to a gzipped snapshot file.
+
+The framework report scripts can then be re-run against the snapshot with `--from-snapshot=<file>`, without making
+any requests to the API.
+
+Usage:
+    snapshot-framework.py <stage> <framework_slug> <output_file> [options]
+
+Options:
+    --threads=<n>   Number of threads to fetch framework agreements with [default: 3]
+    -h --help       Show this screen.
+
+Example:
+    ./scripts/framework-applications/snapshot-framework.py production g-cloud-12 g-cloud-12.snapshot.json.gz
+"""
+import sys
+
+from docopt import docopt
+
+sys.path.insert(0, '.')
+from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.logging_helpers import configure_logger
+from dmscripts.helpers.pipeline_helpers import Pipeline
+from dmscripts.helpers.snapshot_helpers import create_snapshot
+from dmapiclient import DataAPIClient
+from dmutils.env_helpers import get_api_endpoint_from_stage
+
+
+if __name__ == '__main__':
+    arguments = docopt(__doc__)
+    logger = configure_logger()
+
+    client = DataAPIClient(
+        get_api_endpoint_from_stage(arguments['<stage>']),
+        get_auth_token('api', arguments['<stage>']),
+    )
+    pipeline = Pipeline(workers=int(arguments['--threads']))
+
+    create_snapshot(
+        client, arguments['<framework_slug>'], arguments['<output_file>'], map_impl=pipeline, logger=logger
+    )
+    pipeline.log_stats()
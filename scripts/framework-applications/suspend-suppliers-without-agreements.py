@@ -51,7 +51,7 @@ from dmscripts.helpers.logging_helpers import (
     logging,
 )
 from dmscripts.helpers.framework_helpers import find_suppliers_without_agreements
-from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_args
+from dmscripts.helpers.supplier_data_helpers import get_email_addresses_by_supplier, get_supplier_ids_from_args
 from dmscripts.helpers.email_helpers import scripts_notify_client
 from dmscripts.suspend_suppliers_without_agreements import (
     suspend_supplier_services, get_all_email_addresses_for_supplier
@@ -102,6 +102,8 @@ if __name__ == "__main__":
     supplier_ids = get_supplier_ids_from_args(args)
     suppliers = find_suppliers_without_agreements(client, framework_slug, supplier_ids)
 
+    email_addresses_by_supplier = None if supplier_ids else get_email_addresses_by_supplier(client)
+
     framework_name = framework["name"]
     contract_title = get_framework_contract_title(FRAMEWORKS_PATH, framework_slug)
 
@@ -122,7 +124,9 @@ if __name__ == "__main__":
                 logger.warning(f"{prefix}Something went wrong - suspended 0 services for supplier {supplier_id}")
 
         # Send the reminder email to all users for that supplier
-        for supplier_email in get_all_email_addresses_for_supplier(client, framework_info):
+        for supplier_email in get_all_email_addresses_for_supplier(
+            client, framework_info, email_addresses_by_supplier=email_addresses_by_supplier
+        ):
             logger.info(f"{prefix}Sending email to supplier user: {hash_string(supplier_email)}")
             if not dry_run:
                 notify_client.send_email(
@@ -69,7 +69,11 @@ from dmscripts.helpers.framework_helpers import (
     framework_supports_e_signature
 )
 from dmscripts.helpers.logging_helpers import configure_logger
-from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_args, unsuspend_suspended_supplier_services
+from dmscripts.helpers.supplier_data_helpers import (
+    find_services_suspended_by_user,
+    get_supplier_ids_from_args,
+    unsuspend_suspended_supplier_services,
+)
 from dmscripts.generate_framework_agreement_signature_pages import (
     render_html_for_suppliers_awaiting_countersignature, render_pdf_for_each_html_page
 )
@@ -115,6 +119,11 @@ if __name__ == '__main__':
             f"Framework {framework_slug} supports e-signatures, unapproved agreements will be automatically approved"
             f" and suspended services unsuspended"
         )
+        # for a run over every supplier, find all the services that were suspended at once rather than supplier by
+        # supplier
+        suspended_services = (
+            None if supplier_ids else find_services_suspended_by_user(client, AUTOMATED_SUSPENDING_USER)
+        )
 
         def approve_supplier_framework_agreement(record):
             if not record["countersignedAt"]:
@@ -129,7 +138,8 @@ if __name__ == '__main__':
                                                           AUTOMATED_SUSPENDING_USER,
                                                           client,
                                                           logger,
-                                                          dry_run)
+                                                          dry_run,
+                                                          suspended_services=suspended_services)
                 else:
                     logger.info(f"countersigning agreement {agreement_id} for supplier {supplier_id}")
                     try:
@@ -143,7 +153,8 @@ if __name__ == '__main__':
                                                               AUTOMATED_SUSPENDING_USER,
                                                               client,
                                                               logger,
-                                                              dry_run)
+                                                              dry_run,
+                                                              suspended_services=suspended_services)
                     except dmapiclient.errors.HTTPError as e:
                         logger.warn(f"failed to countersign agreement {agreement_id} for supplier {supplier_id}: {e}")
             return record
@@ -16,7 +16,36 @@ Options:
                                                   should be done under user control. This mapping is a filename (without
                                                   .json suffix) as would be found by the search-api in its
                                                   digitalmarketplace-search-api/mappings directory.
+    --project-to-mapping=<mapping-file>           Path to a local copy of the search mapping JSON for the index. Fields
+                                                  that the mapping doesn't use are not sent to the search API
     --serial                                      Do not run in parallel (useful for debugging)
+    --async                                       Index with an asyncio engine that adjusts how many requests are in
+                                                  flight to how the search API is coping, instead of a fixed pool
+                                                  of ten threads
+    --max-concurrency=<count>                     Maximum number of requests in flight with --async [default: 50]
+    --since-checkpoint                            Only index briefs or services updated since the last successful run
+                                                  for the same index and frameworks
+    --checkpoint-file=<path>                      File recording when each index and framework was last indexed
+                                                  [default: data/index-to-search-service-checkpoints.json]
+    --journal-file=<path>                         Record the progress of the run in this file, so that it can be
+                                                  resumed if it is interrupted
+    --resume                                      Carry on from where an interrupted run recorded in --journal-file
+                                                  stopped, retrying only the items that failed
+    --cache-file=<path>                           File recording a hash of each document as it was last indexed, so
+                                                  that unchanged documents aren't sent again. Only use this for an
+                                                  index which nothing else has written to or rebuilt since the last
+                                                  run with the same file
+    --force                                       Send every document, even if it hasn't changed since it was last
+                                                  indexed
+    --queue-depth=<depth>                         Maximum number of items fetched from the API but not yet indexed.
+                                                  With --bulk this is rounded down to whole batches, but is always at
+                                                  least one batch for each worker [default: 100]
+    --prefetch-pages=<count>                      Number of pages to fetch from the data API ahead of the page being
+                                                  indexed. Use 0 to fetch each page only when it's needed [default: 0]
+    --bulk                                        Send documents to the search API in batches rather than one
+                                                  request per document, if the search API has a bulk endpoint
+    --bulk-batch-size=<count>                     Maximum number of documents in each bulk request [default: 500]
+    --bulk-max-batch-bytes=<bytes>                Maximum approximate size of each bulk request [default: 5242880]
     --api-url=<api-url>                           Override API URL (otherwise automatically populated)
     --api-token=<api_access_token>                Override API token (otherwise automatically populated)
     --search-api-url=<search-api-url>             Override search API URL (otherwise automatically populated)
@@ -41,6 +70,8 @@ from dmutils.env_helpers import get_api_endpoint_from_stage
 
 if __name__ == "__main__":
     arguments = docopt(__doc__)
+    if arguments['--resume'] and not arguments['--journal-file']:
+        sys.exit("--resume needs the --journal-file of the run to resume")
     ok = do_index(
         doc_type=arguments['<doc-type>'],
         data_api_url=arguments['--api-url'] or get_api_endpoint_from_stage(arguments['<stage>'], 'api'),
@@ -48,9 +79,22 @@ if __name__ == "__main__":
         search_api_url=arguments['--search-api-url'] or get_api_endpoint_from_stage(arguments['<stage>'], 'search-api'),
         search_api_access_token=arguments['--search-api-token'] or get_auth_token('search_api', arguments['<stage>']),
         mapping=arguments.get('--create-with-mapping'),
+        projection_mapping_file=arguments['--project-to-mapping'],
         serial=arguments['--serial'],
+        async_engine=arguments['--async'],
+        max_concurrency=int(arguments['--max-concurrency']),
+        queue_depth=int(arguments['--queue-depth']),
+        prefetch_pages=int(arguments['--prefetch-pages']),
+        checkpoint_file=arguments['--checkpoint-file'] if arguments['--since-checkpoint'] else None,
+        journal_file=arguments['--journal-file'],
+        resume=arguments['--resume'],
+        cache_file=arguments['--cache-file'],
+        force=arguments['--force'],
         index=arguments['--index'],
         frameworks=arguments['--frameworks'],
+        bulk=arguments['--bulk'],
+        bulk_batch_size=int(arguments['--bulk-batch-size']),
+        bulk_max_batch_bytes=int(arguments['--bulk-max-batch-bytes']),
     )
 
     if not ok:
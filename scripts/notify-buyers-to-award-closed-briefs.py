@@ -13,6 +13,7 @@ Options:
     --dry-run List notifications that would be sent without sending actual emails
     --buyer-ids List of buyer user IDs to be emailed
     --offset-days Days between brief closing and email being sent (defaults to 28)
+    --workers=<n>  Number of emails to send at once [default: 4]
 
 """
 
@@ -45,7 +46,8 @@ if __name__ == '__main__':
         date_closed=arguments['--date-closed'],
         dry_run=arguments['--dry-run'],
         user_id_list=list_of_buyer_ids,
-        offset_days=offset_days
+        offset_days=offset_days,
+        workers=int(arguments['--workers']),
     )
 
     if not ok:
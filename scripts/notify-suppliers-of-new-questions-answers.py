@@ -12,6 +12,8 @@ Options:
     --supplier-ids=SUPPLIERS                Comma separated list of suppliers IDs to be emailed. This is in case the
                                             script fails halfway and we need to resume it without sending emails twice
                                             to any supplier
+    --bulk                                  Look up all suppliers' users in one sweep rather than a request per
+                                            supplier, for days with a lot of interested suppliers
 
 Examples:
     ./scripts/notify-suppliers-of-new-questions-answers.py preview notify-token --dry-run --supplier-ids=2,3,4
@@ -40,7 +42,8 @@ if __name__ == "__main__":
         email_api_key=arguments['<notify_api_key>'],
         stage=arguments['<stage>'],
         dry_run=arguments['--dry-run'],
-        supplier_ids=list_of_supplier_ids
+        supplier_ids=list_of_supplier_ids,
+        bulk=arguments['--bulk'],
     )
 
     if not ok:
@@ -26,6 +26,9 @@ Options:
     --supplier-ids=SUPPLIERS    Comma separated list of suppliers IDs to be emailed. This is in case the
                                 script fails halfway and we need to resume it without sending emails twice
                                 to any supplier
+    --bulk                      Count all suppliers' draft services in one sweep rather than a request per
+                                supplier
+    --workers=<n>               Number of emails to send at once [default: 4]
     -h, --help                  Show this screen
 """
 from docopt import docopt
@@ -62,5 +65,7 @@ if __name__ == '__main__':
             doc_opt_arguments['--dry-run'],
             logger,
             supplier_ids=list_of_supplier_ids,
+            bulk=doc_opt_arguments['--bulk'],
+            workers=int(doc_opt_arguments['--workers']),
         )
     )
@@ -1,3 +1,5 @@
+from itertools import chain
+
 from mock import Mock, MagicMock
 
 
@@ -294,8 +296,10 @@ class BaseAssessmentTest(object):
             "interestedSuppliers": self.mock_supplier_frameworks.keys(),
         }
 
-    def _mock_find_draft_services_by_framework_iter_impl(self, framework, supplier_id=None):
+    def _mock_find_draft_services_by_framework_iter_impl(self, framework, supplier_id=None, lot=None):
         assert framework == self.framework_slug
+        if supplier_id is None:
+            return iter(chain.from_iterable(self.mock_draft_services.values()))
         return iter(self.mock_draft_services[supplier_id])
 
     def _mock_find_draft_services_iter_impl(self, supplier_id, framework=None):
@@ -0,0 +1,140 @@
+import threading
+
+import mock
+import pytest
+
+from dmapiclient import HTTPError
+
+from dmscripts.helpers.api_cache_helpers import CachedDataAPIClient
+
+
+class TestCachedDataAPIClient:
+
+    def setup(self):
+        self.now = 1000.0
+
+    def cached_client(self, client, tmpdir, **kwargs):
+        kwargs.setdefault('logger', mock.Mock())
+        path = str(tmpdir.join('cache', 'api.sqlite3'))
+        cached = CachedDataAPIClient(client, path, clock=lambda: self.now, **kwargs)
+        self.close_cache = cached.close
+        return cached
+
+    def teardown(self):
+        if hasattr(self, 'addCleanup'):
+            self.close_cache()
+
+    def test_read_responses_are_reused(self, mock_data_client, tmpdir):
+        mock_data_client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-12'}}
+        cached = self.cached_client(mock_data_client, tmpdir)
+
+        assert cached.get_framework('g-cloud-12') == {'frameworks': {'slug': 'g-cloud-12'}}
+        assert cached.get_framework('g-cloud-12') == {'frameworks': {'slug': 'g-cloud-12'}}
+
+        assert mock_data_client.get_framework.call_count == 1
+        assert cached.stats['hits'] == 1
+        assert cached.stats['misses'] == 1
+
+    def test_responses_are_keyed_by_arguments(self, mock_data_client, tmpdir):
+        mock_data_client.get_supplier.side_effect = lambda supplier_id: {'suppliers': {'id': supplier_id}}
+        cached = self.cached_client(mock_data_client, tmpdir)
+
+        assert cached.get_supplier(1) == {'suppliers': {'id': 1}}
+        assert cached.get_supplier(2) == {'suppliers': {'id': 2}}
+        assert cached.get_supplier(1) == {'suppliers': {'id': 1}}
+        assert mock_data_client.get_supplier.call_count == 2
+
+    def test_responses_are_kept_between_runs(self, mock_data_client, tmpdir):
+        mock_data_client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-12'}}
+        self.cached_client(mock_data_client, tmpdir).get_framework('g-cloud-12')
+        self.close_cache()
+
+        assert self.cached_client(mock_data_client, tmpdir).get_framework('g-cloud-12') == {
+            'frameworks': {'slug': 'g-cloud-12'}
+        }
+        assert mock_data_client.get_framework.call_count == 1
+
+    def test_responses_expire_after_the_ttl_for_the_method(self, mock_data_client, tmpdir):
+        mock_data_client.get_framework.side_effect = [
+            {'frameworks': {'status': 'open'}}, {'frameworks': {'status': 'live'}},
+        ]
+        cached = self.cached_client(mock_data_client, tmpdir, ttls={'get_framework': 60})
+
+        assert cached.get_framework('g-cloud-12') == {'frameworks': {'status': 'open'}}
+        self.now += 59
+        assert cached.get_framework('g-cloud-12') == {'frameworks': {'status': 'open'}}
+        self.now += 1
+        assert cached.get_framework('g-cloud-12') == {'frameworks': {'status': 'live'}}
+        assert cached.stats['expired'] == 1
+
+    def test_writes_and_unlisted_methods_go_straight_to_the_api(self, mock_data_client, tmpdir):
+        cached = self.cached_client(mock_data_client, tmpdir)
+
+        cached.set_framework_result(1, 'g-cloud-12', True, 'user')
+        cached.set_framework_result(1, 'g-cloud-12', True, 'user')
+        cached.find_services(supplier_id=1)
+        cached.find_services(supplier_id=1)
+        cached.uncached.get_framework('g-cloud-12')
+
+        assert mock_data_client.set_framework_result.call_count == 2
+        assert mock_data_client.find_services.call_count == 2
+        assert mock_data_client.get_framework.call_count == 1
+        assert cached.stats['misses'] == 0
+
+    def test_errors_are_not_cached(self, mock_data_client, tmpdir):
+        mock_data_client.get_supplier.side_effect = [HTTPError(), {'suppliers': {'id': 1}}]
+        cached = self.cached_client(mock_data_client, tmpdir)
+
+        with pytest.raises(HTTPError):
+            cached.get_supplier(1)
+        assert cached.get_supplier(1) == {'suppliers': {'id': 1}}
+
+    def test_least_recently_used_responses_are_evicted_over_the_size_limit(self, mock_data_client, tmpdir):
+        mock_data_client.get_supplier.side_effect = lambda supplier_id: {
+            'suppliers': {'id': supplier_id, 'description': str(supplier_id) * 200}
+        }
+        # each compressed response is about 50 bytes, so only two fit
+        cached = self.cached_client(mock_data_client, tmpdir, max_size=120)
+        for supplier_id in (1, 2, 1, 3):
+            self.now += 1
+            cached.get_supplier(supplier_id)
+
+        assert cached.stats['evictions'] == 1
+        cached.get_supplier(1)
+        cached.get_supplier(2)
+        assert mock_data_client.get_supplier.call_args_list == [
+            mock.call(1), mock.call(2), mock.call(3), mock.call(2),
+        ]
+
+    def test_can_be_read_from_several_threads(self, mock_data_client, tmpdir):
+        mock_data_client.get_supplier.side_effect = lambda supplier_id: {'suppliers': {'id': supplier_id}}
+        cached = self.cached_client(mock_data_client, tmpdir)
+        errors = []
+
+        def read():
+            try:
+                for supplier_id in range(20):
+                    assert cached.get_supplier(supplier_id) == {'suppliers': {'id': supplier_id}}
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert cached.stats['hits'] + cached.stats['misses'] == 80
+
+    def test_stats_are_logged_on_close(self, mock_data_client, tmpdir):
+        logger = mock.Mock()
+        cached = self.cached_client(mock_data_client, tmpdir, logger=logger)
+        cached.get_framework('g-cloud-12')
+        cached.get_framework('g-cloud-12')
+        cached.close()
+        cached.close()
+
+        logger.info.assert_called_once()
+        assert logger.info.call_args[1]['extra']['hits'] == 1
+        assert logger.info.call_args[1]['extra']['hit_rate'] == 50
@@ -1,3 +1,5 @@
+import gzip
+
 import pytest
 
 import dmscripts.helpers.csv_helpers as csv_helpers
@@ -81,3 +83,167 @@ class TestMakeFieldsFromContentQuestions:
         assert csv_helpers.make_fields_from_content_questions([locations_question], self.record) == [
             ('accessibleApplicationsOutcomes', 'True'),
         ]
+
+
+class _FieldsQuestion(dict):
+    def __init__(self, fields):
+        super(_FieldsQuestion, self).__init__(id='price', type='pricing')
+        self.fields = fields
+
+
+class TestContentQuestionFields:
+
+    def setup(self):
+        content_loader = ContentLoader('tests/fixtures/content')
+        content_loader.load_manifest('dos', "services", "edit_submission")
+        self.content_manifest = content_loader.get_manifest('dos', "edit_submission")
+
+    def test_content_question_fields_can_be_reused_for_many_records(self):
+        fields = csv_helpers.ContentQuestionFields([
+            self.content_manifest.get_question("locations"),
+            self.content_manifest.get_question("accessibleApplicationsOutcomes"),
+        ])
+
+        assert fields({"services": [
+            {"locations": ["Scotland", "Wales"], "accessibleApplicationsOutcomes": True},
+            {"locations": ["Wales"], "accessibleApplicationsOutcomes": False},
+        ]})[:10] == [
+            ('locations Offsite', 0),
+            ('locations Scotland', 1),
+            ('locations North East England', 0),
+            ('locations North West England', 0),
+            ('locations Yorkshire and the Humber', 0),
+            ('locations East Midlands', 0),
+            ('locations West Midlands', 0),
+            ('locations East of England', 0),
+            ('locations Wales', 2),
+            ('locations London', 0),
+        ]
+        assert fields({"services": [{"locations": ["London"]}]})[9:] == [
+            ('locations London', 1),
+            ('locations South East England', 0),
+            ('locations South West England', 0),
+            ('locations Northern Ireland', 0),
+            ('accessibleApplicationsOutcomes', ''),
+        ]
+
+    def test_content_question_fields_joins_values_for_questions_with_fields(self):
+        fields = csv_helpers.ContentQuestionFields([
+            _FieldsQuestion({'maximum_price': 'priceMax', 'minimum_price': 'priceMin'}),
+        ])
+
+        assert fields({"services": [{"priceMin": "1", "priceMax": "2"}, {"priceMin": "3"}]}) == [
+            ('priceMax', '2|'),
+            ('priceMin', '1|3'),
+        ]
+
+    def test_content_question_fields_does_not_need_services_without_questions(self):
+        assert csv_helpers.ContentQuestionFields([])({}) == []
+
+    @pytest.mark.parametrize('services', [
+        [],
+        [{}],
+        [{"locations": ["Offsite", "Offsite", "Wales"]}, {"locations": "Offsite in Wales"}],
+    ])
+    def test_content_question_fields_matches_counting_each_label(self, services):
+        locations_question = self.content_manifest.get_question("locations")
+        record = {"services": services}
+
+        assert csv_helpers.ContentQuestionFields([locations_question])(record) == [
+            (
+                csv_helpers.make_field_title("locations", option["label"]),
+                csv_helpers.count_field_in_record("locations", option["label"], record),
+            )
+            for option in locations_question.options
+        ]
+
+
+class _Handler(object):
+    def __init__(self, name, matches, should_write=lambda record: True):
+        self.NAME = self.filename = name
+        self._matches = matches
+        self._should_write = should_write
+
+    def matches(self, record):
+        return self._matches(record)
+
+    def should_write(self, record):
+        return self._should_write(record)
+
+    def create_row(self, record):
+        return [('id', record['id']), ('colour', record['colour'])]
+
+
+class _RoutedHandler(_Handler):
+    ROUTE_KEY = 'colour'
+
+    def __init__(self, name, colour, **kwargs):
+        super(_RoutedHandler, self).__init__(name, lambda record: record['colour'] == colour, **kwargs)
+        self.ROUTE_VALUE = colour
+
+
+class TestMultiCSVWriter:
+
+    records = [
+        {'id': 1, 'colour': 'red'},
+        {'id': 2, 'colour': 'blue'},
+        {'id': 3, 'colour': 'red'},
+    ]
+
+    def test_write_row_routes_records_to_the_first_matching_handler(self, tmpdir):
+        handlers = [
+            _Handler('red', lambda record: record['colour'] == 'red'),
+            _Handler('all', lambda record: True),
+        ]
+        with csv_helpers.MultiCSVWriter(str(tmpdir), handlers) as writer:
+            for record in self.records:
+                writer.write_row(record)
+
+        assert tmpdir.join('red.csv').read().splitlines() == ['id,colour', '1,red', '3,red']
+        assert tmpdir.join('all.csv').read().splitlines() == ['id,colour', '2,blue']
+        assert writer._counters == {'red': 2, 'all': 1}
+
+    def test_write_row_uses_routes_when_every_handler_has_one(self, tmpdir):
+        handlers = [_RoutedHandler('red', 'red'), _RoutedHandler('blue', 'blue')]
+        writer = csv_helpers.MultiCSVWriter(str(tmpdir), handlers)
+        handlers[0]._matches = handlers[1]._matches = None
+
+        assert writer.handler_for({'colour': 'blue'}) is handlers[1]
+        with pytest.raises(ValueError):
+            writer.handler_for({'colour': 'green'})
+
+    def test_write_row_only_asks_the_matching_handler_whether_to_write(self, tmpdir):
+        handlers = [
+            _RoutedHandler('red', 'red', should_write=lambda record: record['id'] != 3),
+            _RoutedHandler('blue', 'blue', should_write=lambda record: False),
+        ]
+        with csv_helpers.MultiCSVWriter(str(tmpdir), handlers) as writer:
+            for record in self.records:
+                writer.write_row(record)
+
+        assert tmpdir.join('red.csv').read().splitlines() == ['id,colour', '1,red']
+        assert tmpdir.join('blue.csv').read() == ''
+        assert writer._counters == {'red': 1}
+
+    def test_write_row_raises_if_no_handler_matches(self, tmpdir):
+        with csv_helpers.MultiCSVWriter(str(tmpdir), [_Handler('none', lambda record: False)]) as writer:
+            with pytest.raises(ValueError):
+                writer.write_row(self.records[0])
+
+    def test_write_row_raises_if_row_fields_do_not_match_the_header(self, tmpdir):
+        handler = _RoutedHandler('red', 'red')
+        with csv_helpers.MultiCSVWriter(str(tmpdir), [handler]) as writer:
+            writer.write_row(self.records[0])
+            handler.create_row = lambda record: [('colour', record['colour']), ('id', record['id'])]
+            with pytest.raises(ValueError):
+                writer.write_row(self.records[2])
+
+        assert tmpdir.join('red.csv').read().splitlines() == ['id,colour', '1,red']
+
+    def test_compress_writes_gzipped_files(self, tmpdir):
+        with csv_helpers.MultiCSVWriter(str(tmpdir), [_RoutedHandler('red', 'red')], compress=True) as writer:
+            writer.write_row(self.records[0])
+
+        assert [p.basename for p in tmpdir.listdir()] == ['red.csv.gz']
+        with gzip.open(str(tmpdir.join('red.csv.gz')), 'rt') as f:
+            assert f.read().splitlines() == ['id,colour', '1,red']
@@ -0,0 +1,167 @@
+import itertools
+import threading
+
+import mock
+import pytest
+
+from dmutils.email import DMNotifyClient
+from dmutils.email.exceptions import EmailError, EmailTemplateError
+
+from dmscripts.helpers.email_helpers import Email, TokenBucket, send_emails
+
+
+class _NotifyHTTPError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def _email_error(status_code):
+    # as DMNotifyClient raises it, from the Notify client's HTTPError
+    error = EmailError(f"error {status_code}")
+    error.__cause__ = _NotifyHTTPError(status_code)
+    return error
+
+
+class TestTokenBucket:
+
+    def test_waits_for_tokens_once_the_burst_is_used(self):
+        sleep = mock.Mock()
+        bucket = TokenBucket(2, capacity=2, clock=lambda: 10.0, sleep=sleep)
+
+        for _ in range(4):
+            bucket.take()
+
+        assert sleep.call_args_list == [mock.call(0.5), mock.call(1.0)]
+
+    def test_tokens_are_refilled_over_time(self):
+        now = [10.0]
+        sleep = mock.Mock()
+        bucket = TokenBucket(1, clock=lambda: now[0], sleep=sleep)
+
+        bucket.take()
+        now[0] += 1
+        bucket.take()
+
+        assert sleep.called is False
+
+
+class TestSendEmails:
+
+    def setup(self):
+        self.notify_client = mock.create_autospec(DMNotifyClient, instance=True)
+        self.notify_client.send_email.side_effect = lambda email_address, *args, **kwargs: {'id': email_address}
+        self.logger = mock.Mock()
+        self.sleep = mock.Mock()
+        self.emails = [
+            Email('one@example.com', 'template-id', {'name': 'One'}),
+            Email('two@example.com', 'template-id', {'name': 'Two'}, reference='ref-two'),
+            Email('three@example.com', 'template-id', {'name': 'Three'}),
+        ]
+
+    def send_emails(self, emails, **kwargs):
+        kwargs.setdefault('workers', 1)
+        # a clock a second further on each time it's read, so that only retries wait
+        kwargs.setdefault('clock', itertools.count().__next__)
+        return send_emails(self.notify_client, emails, logger=self.logger, sleep=self.sleep, **kwargs)
+
+    def test_sends_every_email_and_returns_their_results(self):
+        results = self.send_emails(iter(self.emails), allow_resend=True)
+
+        assert [(result.email, result.response, result.error, result.attempts) for result in results] == [
+            (self.emails[0], {'id': 'one@example.com'}, None, 1),
+            (self.emails[1], {'id': 'two@example.com'}, None, 1),
+            (self.emails[2], {'id': 'three@example.com'}, None, 1),
+        ]
+        assert self.notify_client.send_email.call_args_list == [
+            mock.call('one@example.com', 'template-id', {'name': 'One'}, allow_resend=True),
+            mock.call('two@example.com', 'template-id', {'name': 'Two'}, allow_resend=True, reference='ref-two'),
+            mock.call('three@example.com', 'template-id', {'name': 'Three'}, allow_resend=True),
+        ]
+
+    def test_sends_with_several_workers(self):
+        emails = [Email(f'{i}@example.com', 'template-id') for i in range(20)]
+        threads = set()
+        # the first two emails are only sent once both are being sent at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def send_email(email_address, *args, **kwargs):
+            threads.add(threading.current_thread())
+            if email_address in ('0@example.com', '1@example.com'):
+                barrier.wait()
+            return {}
+
+        self.notify_client.send_email.side_effect = send_email
+
+        results = self.send_emails(emails, workers=4)
+
+        assert [result.email for result in results] == emails
+        assert 1 < len(threads) <= 4
+
+    @pytest.mark.parametrize('status_code', (429, 500, 503))
+    def test_transient_errors_are_retried(self, status_code):
+        self.notify_client.send_email.side_effect = [_email_error(status_code), {'id': 'one'}]
+
+        results = self.send_emails(self.emails[:1], retry_delay=2)
+
+        assert results[0].error is None
+        assert results[0].attempts == 2
+        assert self.sleep.call_args_list == [mock.call(2)]
+
+    def test_retries_check_notify_for_the_reference_when_not_resending(self):
+        self.notify_client.send_email.side_effect = [_email_error(500), {'id': 'two'}]
+
+        results = self.send_emails(self.emails[1:2], allow_resend=False, use_recent_cache=True)
+
+        assert results[0].error is None
+        assert self.notify_client.send_email.call_args_list == [
+            mock.call(
+                'two@example.com', 'template-id', {'name': 'Two'},
+                allow_resend=False, use_recent_cache=True, reference='ref-two',
+            ),
+            mock.call(
+                'two@example.com', 'template-id', {'name': 'Two'},
+                allow_resend=False, use_recent_cache=False, reference='ref-two',
+            ),
+        ]
+
+    def test_transient_errors_give_up_after_max_tries(self):
+        self.notify_client.send_email.side_effect = _email_error(503)
+
+        results = self.send_emails(self.emails[:1], max_tries=3, retry_delay=1)
+
+        assert isinstance(results[0].error, EmailError)
+        assert results[0].attempts == 3
+        assert self.sleep.call_args_list == [mock.call(1), mock.call(2)]
+        self.logger.error.assert_called_once_with("Failed sending to {email_hash}: {e}", extra=mock.ANY)
+
+    @pytest.mark.parametrize('error', (_email_error(400), EmailError("no cause")))
+    def test_other_errors_are_not_retried_and_sending_continues(self, error):
+        self.notify_client.send_email.side_effect = [{}, error, {}]
+
+        results = self.send_emails(self.emails)
+
+        assert [result.error is not None for result in results] == [False, True, False]
+        assert self.notify_client.send_email.call_count == 3
+        assert self.sleep.called is False
+
+    def test_stop_on_error_stops_sending_after_a_failure(self):
+        self.notify_client.send_email.side_effect = [{}, _email_error(400), {}]
+
+        results = self.send_emails(self.emails, stop_on_error=True)
+
+        assert [result.error is not None for result in results] == [False, True]
+        assert self.notify_client.send_email.call_count == 2
+
+    def test_template_error_stops_all_workers_and_is_raised(self):
+        emails = [Email(f'{i}@example.com', 'template-id') for i in range(50)]
+        self.notify_client.send_email.side_effect = EmailTemplateError("Missing personalisation")
+
+        with pytest.raises(EmailTemplateError):
+            self.send_emails(iter(emails), workers=4)
+
+        assert self.notify_client.send_email.call_count <= 4
+
+    def test_sent_references_are_fetched_once_before_sending_when_not_resending(self):
+        self.send_emails(self.emails, workers=4, allow_resend=False)
+
+        self.notify_client.get_delivered_references.assert_called_once_with()
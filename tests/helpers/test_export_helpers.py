@@ -0,0 +1,149 @@
+import json
+
+import mock
+import pytest
+
+from dmscripts.helpers import export_helpers
+from dmscripts.helpers.csv_helpers import write_csv, write_csv_with_make_row
+
+
+ROWS = [
+    {'supplier_id': 1, 'name': 'One', 'on_framework': True, 'price': 1.5, 'lots': ['a', 'b']},
+    {'supplier_id': 2, 'name': 'Two', 'on_framework': False, 'price': 2, 'lots': []},
+    {'supplier_id': '', 'name': None, 'on_framework': None, 'price': ''},
+]
+FIELDNAMES = ['supplier_id', 'name', 'on_framework', 'price', 'lots']
+
+
+@pytest.mark.parametrize('filename,export_format,expected', [
+    ('output/suppliers.csv', 'csv', 'output/suppliers.csv'),
+    ('output/suppliers.csv', 'jsonl', 'output/suppliers.jsonl'),
+    ('output/suppliers', 'parquet', 'output/suppliers.parquet'),
+])
+def test_export_path(filename, export_format, expected):
+    with mock.patch.object(export_helpers, 'pyarrow', mock.sentinel.pyarrow):
+        assert export_helpers.export_path(filename, export_format) == expected
+
+
+def test_export_path_rejects_unknown_formats():
+    with pytest.raises(ValueError):
+        export_helpers.export_path('output/suppliers.csv', 'xls')
+
+
+@pytest.mark.parametrize('export_format,pyarrow,expected', [
+    ('csv', None, None),
+    ('parquet', mock.sentinel.pyarrow, None),
+    ('parquet', None, "Writing Parquet needs pyarrow, which isn't installed - install it with `pip install pyarrow`"),
+    ('xls', None, "Unknown export format 'xls', expected one of csv, jsonl, parquet"),
+])
+def test_export_format_error(export_format, pyarrow, expected):
+    with mock.patch.object(export_helpers, 'pyarrow', pyarrow):
+        assert export_helpers.export_format_error(export_format) == expected
+
+
+def test_open_export_writer_rejects_unknown_formats(tmpdir):
+    with pytest.raises(ValueError):
+        export_helpers.open_export_writer(str(tmpdir.join('out.xls')), FIELDNAMES, 'xls')
+
+
+def test_csv_writer_only_writes_header_with_first_row(tmpdir):
+    path = str(tmpdir.join('out.csv'))
+    with export_helpers.open_export_writer(path, FIELDNAMES, 'csv'):
+        pass
+    assert tmpdir.join('out.csv').read() == ''
+
+    with export_helpers.open_export_writer(path, FIELDNAMES, 'csv') as writer:
+        writer.write_row(ROWS[0])
+    assert tmpdir.join('out.csv').read().splitlines() == [
+        'supplier_id,name,on_framework,price,lots',
+        "1,One,True,1.5,\"['a', 'b']\"",
+    ]
+
+
+def test_json_lines_writer_keeps_value_types(tmpdir):
+    path = str(tmpdir.join('out.jsonl'))
+    with export_helpers.open_export_writer(path, FIELDNAMES, 'jsonl') as writer:
+        for row in ROWS:
+            writer.write_row(row)
+
+    assert writer.rows_written == 3
+    assert [json.loads(line) for line in tmpdir.join('out.jsonl').read().splitlines()] == [
+        ROWS[0], ROWS[1], dict(ROWS[2], lots=None),
+    ]
+
+
+def test_parquet_writer_needs_pyarrow(tmpdir):
+    with mock.patch.object(export_helpers, 'pyarrow', None):
+        with pytest.raises(ValueError):
+            export_helpers.open_export_writer(str(tmpdir.join('out.parquet')), FIELDNAMES, 'parquet')
+        with pytest.raises(ImportError):
+            export_helpers.ParquetExportWriter(str(tmpdir.join('out.parquet')), FIELDNAMES)
+
+
+class TestParquetExportWriter:
+
+    def setup(self):
+        self.pyarrow = pytest.importorskip('pyarrow')
+        self.parquet = pytest.importorskip('pyarrow.parquet')
+
+    def test_parquet_writer_types_columns_from_the_first_batch(self, tmpdir):
+        path = str(tmpdir.join('out.parquet'))
+        with export_helpers.open_export_writer(path, FIELDNAMES, 'parquet', batch_size=2) as writer:
+            for row in ROWS:
+                writer.write_row(row)
+
+        table = self.parquet.read_table(path)
+        assert table.schema.types == [
+            self.pyarrow.int64(), self.pyarrow.string(), self.pyarrow.bool_(), self.pyarrow.float64(),
+            self.pyarrow.string(),
+        ]
+        assert table.to_pydict() == {
+            'supplier_id': [1, 2, None],
+            'name': ['One', 'Two', None],
+            'on_framework': [True, False, None],
+            'price': [1.5, 2.0, None],
+            'lots': ["['a', 'b']", '[]', None],
+        }
+
+    def test_parquet_writer_rejects_values_that_do_not_fit_the_column_type(self, tmpdir):
+        writer = export_helpers.open_export_writer(str(tmpdir.join('out.parquet')), ['id'], 'parquet', batch_size=1)
+        writer.write_row({'id': 1})
+        with pytest.raises(ValueError):
+            writer.write_row({'id': 'not a number'})
+
+    def test_parquet_writer_writes_an_empty_file_with_no_rows(self, tmpdir):
+        path = str(tmpdir.join('out.parquet'))
+        with export_helpers.open_export_writer(path, ['id'], 'parquet'):
+            pass
+
+        assert self.parquet.read_table(path).num_rows == 0
+
+
+def test_write_csv_can_write_json_lines(tmpdir):
+    path = str(tmpdir.join('out.jsonl'))
+    write_csv(['id', 'name'], iter([[('id', 1), ('name', 'One')]]), path, export_format='jsonl')
+
+    assert tmpdir.join('out.jsonl').read() == '{"id": 1, "name": "One"}\n'
+
+
+def test_write_csv_with_make_row_only_adds_last_updated_to_csv(tmpdir):
+    def make_row(record):
+        return [('id', record['id'])]
+
+    write_csv_with_make_row([{'id': 1}], make_row, str(tmpdir.join('out.csv')))
+    write_csv_with_make_row([{'id': 1}], make_row, str(tmpdir.join('out.jsonl')), export_format='jsonl')
+
+    assert tmpdir.join('out.csv').read().splitlines()[:2] == ['id', '1']
+    assert tmpdir.join('out.csv').read().splitlines()[2].startswith('Last updated ')
+    assert tmpdir.join('out.jsonl').read() == '{"id": 1}\n'
+
+
+def test_write_csv_with_make_row_reports_progress_instead_of_printing(tmpdir, capsys):
+    progress = mock.Mock()
+    write_csv_with_make_row(
+        [{'id': 1}, {'id': 2}], lambda record: [('id', record['id'])], str(tmpdir.join('out.csv')), progress=progress
+    )
+
+    assert progress.update.call_count == 2
+    progress.finish.assert_called_once_with()
+    assert capsys.readouterr().out == ''
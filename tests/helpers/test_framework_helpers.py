@@ -378,6 +378,44 @@ def test_add_draft_counts(mock_data_client):
     }
 
 
+def test_add_draft_counts_uses_precomputed_draft_counts(mock_data_client):
+    draft_counts = {123: Counter({('saas', 'submitted'): 2})}
+
+    record = framework_helpers.add_draft_counts(
+        mock_data_client, 'g-things-23', {'supplier': {'id': 123}}, draft_counts=draft_counts
+    )
+    other_record = framework_helpers.add_draft_counts(
+        mock_data_client, 'g-things-23', {'supplier': {'id': 456}}, draft_counts=draft_counts
+    )
+
+    assert record['counts'] == {('saas', 'submitted'): 2}
+    assert other_record['counts'] == Counter()
+    record['counts']['saas', 'submitted'] += 1
+    assert draft_counts[123] == {('saas', 'submitted'): 2}
+    assert mock_data_client.find_draft_services_iter.called is False
+
+
+def test_find_draft_service_counts(mock_data_client):
+    mock_data_client.find_draft_services_by_framework_iter.return_value = iter([
+        {'supplierId': 1, 'status': 'submitted', 'lotSlug': 'saas'},
+        {'supplierId': 2, 'status': 'not-submitted', 'lotSlug': 'saas'},
+        {'supplierId': 1, 'status': 'submitted', 'lotSlug': 'saas'},
+        {'supplierId': 1, 'status': 'failed', 'lotSlug': 'paas'},
+    ])
+
+    assert framework_helpers.find_draft_service_counts(mock_data_client, 'g-things-23') == {
+        1: {('saas', 'submitted'): 2, ('paas', 'failed'): 1},
+        2: {('saas', 'not-submitted'): 1},
+    }
+    mock_data_client.find_draft_services_by_framework_iter.assert_called_once_with('g-things-23', lot=None)
+
+
+def test_count_draft_statuses():
+    assert framework_helpers.count_draft_statuses(Counter({
+        ('saas', 'submitted'): 2, ('paas', 'submitted'): 1, ('paas', 'not-submitted'): 1,
+    })) == {'submitted': 3, 'not-submitted': 1}
+
+
 def test_add_draft_services(mock_data_client):
     mock_data_client.find_draft_services.return_value = {"services": ["service1", "service2"]}
 
@@ -439,3 +477,134 @@ def test_add_draft_services_filtered_by_status(mock_data_client):
     mock_data_client.find_draft_services.assert_has_calls([
         call(123, framework='framework-slug'),
     ])
+
+
+class _FakeFrameworkClient(object):
+    """Answers both the per-supplier and the framework-wide requests from the same data"""
+    suppliers = {
+        2: {'id': 2, 'name': 'supplier 2'},
+        3: {'id': 3, 'name': 'supplier 3'},
+        4: {'id': 4, 'name': 'supplier 4'},
+        5: {'id': 5, 'name': 'supplier 5, not interested'},
+    }
+    supplier_frameworks = {
+        supplier_id: {
+            'supplierId': supplier_id,
+            'agreementId': None,
+            'declaration': {'status': 'complete' if supplier_id != 3 else 'started'},
+            'onFramework': supplier_id != 3,
+            'frameworkSlug': 'g-things-1',
+            'countersignedPath': None,
+            'countersignedAt': None,
+        }
+        for supplier_id in (2, 3, 4)
+    }
+    draft_services = [
+        {'id': 1, 'supplierId': 4, 'status': 'submitted', 'lotSlug': 'saas'},
+        {'id': 2, 'supplierId': 2, 'status': 'not-submitted', 'lotSlug': 'saas'},
+        {'id': 3, 'supplierId': 4, 'status': 'failed', 'lotSlug': 'paas'},
+        {'id': 4, 'supplierId': 4, 'status': 'submitted', 'lotSlug': 'saas'},
+    ]
+
+    def __init__(self):
+        self.calls = Counter()
+
+    def get_interested_suppliers(self, framework_slug):
+        return {'interestedSuppliers': [4, 3, 2]}
+
+    def get_supplier(self, supplier_id):
+        self.calls['get_supplier'] += 1
+        return {'suppliers': self.suppliers[supplier_id]}
+
+    def find_suppliers_iter(self, framework=None):
+        self.calls['find_suppliers_iter'] += 1
+        assert framework == 'g-things-1'
+        return iter(self.suppliers.values())
+
+    def get_supplier_framework_info(self, supplier_id, framework_slug):
+        self.calls['get_supplier_framework_info'] += 1
+        return {'frameworkInterest': self.supplier_frameworks[supplier_id]}
+
+    def find_framework_suppliers_iter(self, framework_slug, with_declarations=True):
+        self.calls['find_framework_suppliers_iter'] += 1
+        assert with_declarations
+        return iter(self.supplier_frameworks.values())
+
+    def find_draft_services(self, supplier_id, framework=None):
+        self.calls['find_draft_services'] += 1
+        return {'services': [draft for draft in self.draft_services if draft['supplierId'] == supplier_id]}
+
+    def find_draft_services_iter(self, supplier_id, framework=None):
+        return iter(self.find_draft_services(supplier_id, framework=framework)['services'])
+
+    def find_draft_services_by_framework_iter(self, framework_slug, lot=None):
+        self.calls['find_draft_services_by_framework_iter'] += 1
+        return iter(draft for draft in self.draft_services if not lot or draft['lotSlug'] == lot)
+
+
+@pytest.mark.parametrize('kwargs', ({}, {'lot': 'saas'}, {'statuses': ['submitted']}))
+def test_find_suppliers_with_details_and_draft_services_in_bulk_matches_per_supplier_requests(kwargs):
+    client = _FakeFrameworkClient()
+
+    expected = framework_helpers.find_suppliers_with_details_and_draft_services(client, 'g-things-1', **kwargs)
+    assert client.calls['get_supplier'] == 3
+
+    client = _FakeFrameworkClient()
+    records = framework_helpers.find_suppliers_with_details_and_draft_services(
+        client, 'g-things-1', bulk=True, **kwargs
+    )
+
+    assert records == expected
+    assert client.calls == {
+        'find_suppliers_iter': 1,
+        'find_framework_suppliers_iter': 1,
+        'find_draft_services_by_framework_iter': 1,
+    }
+
+
+def test_find_suppliers_with_details_and_draft_service_counts_in_bulk_matches_per_supplier_requests():
+    client = _FakeFrameworkClient()
+    expected = list(framework_helpers.find_suppliers_with_details_and_draft_service_counts(client, 'g-things-1'))
+
+    client = _FakeFrameworkClient()
+    records = list(framework_helpers.find_suppliers_with_details_and_draft_service_counts(
+        client, 'g-things-1', bulk=True
+    ))
+
+    assert records == expected
+    assert records[0]['counts'] == Counter({('saas', 'submitted'): 2, ('paas', 'failed'): 1})
+    assert records[1]['counts'] == Counter()
+    assert client.calls == {
+        'find_suppliers_iter': 1, 'find_framework_suppliers_iter': 1, 'find_draft_services_by_framework_iter': 1,
+    }
+
+
+class TestFrameworkSuppliersIndex:
+
+    def setup(self):
+        self.client = _FakeFrameworkClient()
+        self.index = framework_helpers.FrameworkSuppliersIndex(self.client, 'g-things-1')
+
+    def test_sweeps_each_list_once_when_first_needed(self):
+        assert self.index.get_supplier(2) == {'suppliers': {'id': 2, 'name': 'supplier 2'}}
+        assert self.index.get_supplier(3) == {'suppliers': {'id': 3, 'name': 'supplier 3'}}
+
+        assert self.client.calls == {'find_suppliers_iter': 1}
+
+    def test_falls_back_to_the_client_for_other_frameworks_and_missing_suppliers(self):
+        self.index.get_supplier_framework_info(2, 'g-things-2')
+        self.index.find_draft_services(4, framework='g-things-2')
+        self.index.supplier_frameworks.pop(3)
+        self.index.get_supplier_framework_info(3, 'g-things-1')
+
+        assert self.client.calls['get_supplier_framework_info'] == 2
+        assert self.client.calls['find_draft_services'] == 1
+
+    def test_suppliers_without_draft_services_have_none(self):
+        assert self.index.find_draft_services(3, framework='g-things-1') == {'services': []}
+        assert list(self.index.find_draft_services_iter(4, framework='g-things-1')) == [
+            draft for draft in self.client.draft_services if draft['supplierId'] == 4
+        ]
+
+    def test_other_client_methods_are_passed_through(self):
+        assert self.index.get_interested_suppliers('g-things-1') == {'interestedSuppliers': [4, 3, 2]}
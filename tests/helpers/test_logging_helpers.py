@@ -0,0 +1,58 @@
+import mock
+import pytest
+
+from dmscripts.helpers.logging_helpers import ProgressReporter
+
+
+class TestProgressReporter:
+
+    def setup(self):
+        self.logger = mock.Mock()
+        self.now = 100.0
+
+    def clock(self):
+        return self.now
+
+    def test_logs_every_n_items(self):
+        progress = ProgressReporter("suppliers", every=3, interval=60, logger=self.logger, clock=self.clock)
+
+        for _ in range(7):
+            self.now += 0.5
+            progress.update()
+
+        assert self.logger.info.call_count == 2
+        assert [c[1]['extra']['done'] for c in self.logger.info.call_args_list] == [3, 6]
+        assert self.logger.info.call_args_list[0][1]['extra']['rate'] == pytest.approx(2.0)
+
+    def test_logs_every_interval(self):
+        progress = ProgressReporter("suppliers", every=1000, interval=10, logger=self.logger, clock=self.clock)
+
+        for _ in range(5):
+            self.now += 4
+            progress.update()
+
+        assert [c[1]['extra']['done'] for c in self.logger.info.call_args_list] == [3]
+
+    def test_logs_percent_and_time_left_when_total_is_known(self):
+        progress = ProgressReporter(
+            "suppliers", total=10, every=4, logger=self.logger, detail=lambda: "failed=1", clock=self.clock
+        )
+
+        for _ in range(4):
+            self.now += 1
+            progress.update()
+
+        extra = self.logger.info.call_args[1]['extra']
+        assert extra['percent'] == 40.0
+        assert str(extra['eta']) == '0:00:06'
+        assert extra['detail'] == ' failed=1'
+        assert '{percent' in self.logger.info.call_args[0][0]
+
+    def test_finish_always_logs(self):
+        progress = ProgressReporter("suppliers", logger=self.logger, clock=self.clock)
+        progress.update(2)
+        progress.finish()
+
+        assert self.logger.info.call_count == 1
+        assert self.logger.info.call_args[1]['extra']['done'] == 2
+        assert self.logger.info.call_args[1]['extra']['rate'] == 0.0
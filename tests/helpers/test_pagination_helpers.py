@@ -0,0 +1,126 @@
+import threading
+
+import mock
+import pytest
+
+from dmapiclient import DataAPIClient, HTTPError
+
+from dmscripts.helpers.pagination_helpers import iter_pages, merge_iterators, Prefetcher
+
+
+class TestIterPages:
+
+    def setup(self):
+        self.client = mock.Mock(spec=DataAPIClient)
+        self.client.find_services.return_value = {
+            'services': [{'id': 1}, {'id': 2}],
+            'links': {'next': 'http://api/services?framework=g-cloud-12&page=2'},
+        }
+        self.client._get.return_value = {'services': [{'id': 3}], 'links': {}}
+
+    def test_pages_are_returned_with_next_page_links(self):
+        assert list(iter_pages(self.client, 'find_services', 'services', framework='g-cloud-12')) == [
+            ('http://api/services?framework=g-cloud-12&page=2', [{'id': 1}, {'id': 2}]),
+            (None, [{'id': 3}]),
+        ]
+        assert self.client.find_services.call_args_list == [mock.call(framework='g-cloud-12')]
+        assert self.client._get.call_args_list == [mock.call('http://api/services?framework=g-cloud-12&page=2')]
+
+    def test_pages_can_start_from_a_next_page_link(self):
+        pages = iter_pages(
+            self.client, 'find_services', 'services',
+            start_url='http://api/services?framework=g-cloud-12&page=2', framework='g-cloud-12',
+        )
+
+        assert list(pages) == [(None, [{'id': 3}])]
+        assert self.client.find_services.called is False
+
+    def test_pages_are_fetched_lazily(self):
+        pages = iter_pages(self.client, 'find_services', 'services', framework='g-cloud-12')
+
+        next(pages)
+        assert self.client._get.called is False
+
+
+class TestPrefetcher:
+
+    def test_values_are_returned_in_order(self):
+        assert list(Prefetcher(iter(range(10)), depth=3)) == list(range(10))
+
+    def test_values_are_fetched_ahead_of_the_consumer(self):
+        fetched = []
+        fetched_ahead = threading.Event()
+
+        def pages():
+            for i in range(5):
+                fetched.append(i)
+                if len(fetched) == 3:
+                    fetched_ahead.set()
+                yield i
+
+        prefetcher = Prefetcher(pages(), depth=2)
+        assert next(prefetcher) == 0
+        # the first value has been taken, so there's room for the next two in the queue plus one being put
+        assert fetched_ahead.wait(1)
+        assert list(prefetcher) == [1, 2, 3, 4]
+
+    def test_nothing_is_fetched_until_the_first_value_is_requested(self):
+        client = mock.Mock(spec=DataAPIClient)
+        Prefetcher(iter_pages(client, 'find_services', 'services'))
+
+        assert client.find_services.called is False
+
+    def test_errors_are_raised_to_the_consumer(self):
+        client = mock.Mock(spec=DataAPIClient)
+        client.find_services.return_value = {'services': [{'id': 1}], 'links': {'next': 'http://api/services?page=2'}}
+        client._get.side_effect = HTTPError()
+        prefetcher = Prefetcher(iter_pages(client, 'find_services', 'services'))
+
+        assert next(prefetcher) == ('http://api/services?page=2', [{'id': 1}])
+        with pytest.raises(HTTPError):
+            next(prefetcher)
+        assert list(prefetcher) == []
+
+    def test_time_spent_waiting_for_values_is_recorded(self):
+        prefetcher = Prefetcher(iter(range(3)))
+        list(prefetcher)
+
+        assert prefetcher.count == 3
+        assert prefetcher.waits >= 1
+        assert prefetcher.wait_time >= 0
+
+    def test_close_stops_the_background_thread(self):
+        prefetcher = Prefetcher(iter(range(100)), depth=1)
+        next(prefetcher)
+        prefetcher.close()
+        prefetcher._thread.join(1)
+
+        assert not prefetcher._thread.is_alive()
+        assert list(prefetcher) == []
+
+
+class TestMergeIterators:
+
+    def test_values_from_each_iterable_stay_in_order(self):
+        merged = list(merge_iterators([iter(range(0, 50)), iter(range(100, 150))], depth=5))
+
+        assert sorted(merged) == list(range(0, 50)) + list(range(100, 150))
+        assert [value for value in merged if value < 100] == list(range(0, 50))
+        assert [value for value in merged if value >= 100] == list(range(100, 150))
+
+    def test_iterables_are_read_at_the_same_time(self):
+        both_started = threading.Barrier(2, timeout=1)
+
+        def values(value):
+            both_started.wait()
+            yield value
+
+        assert sorted(merge_iterators([values(1), values(2)])) == [1, 2]
+
+    def test_errors_are_raised_to_the_consumer(self):
+        def failing():
+            yield 1
+            raise HTTPError()
+
+        with pytest.raises(HTTPError):
+            list(merge_iterators([failing(), iter(range(3))]))
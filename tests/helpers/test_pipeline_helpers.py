@@ -0,0 +1,118 @@
+from functools import partial
+import threading
+
+import mock
+import pytest
+
+from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_service_counts
+from dmscripts.helpers.pipeline_helpers import Pipeline, stage_name
+
+
+def add_one(record):
+    return record + 1
+
+
+def double(record):
+    return record * 2
+
+
+def test_stage_name_looks_through_partials():
+    assert stage_name(partial(partial(lambda a, b, c: c, 1), 2)) == '<lambda>'
+    assert stage_name(partial(add_one)) == 'add_one'
+
+
+class TestPipeline:
+
+    def setup(self):
+        self.pipeline = Pipeline(workers=2, queue_size=4, logger=mock.Mock())
+
+    def test_records_pass_through_each_stage_in_order(self):
+        records = self.pipeline(add_one, range(20))
+        records = self.pipeline(double, records)
+
+        assert list(records) == [(n + 1) * 2 for n in range(20)]
+        assert [(stats.name, stats.processed, stats.errors) for stats in self.pipeline.stats.values()] == [
+            ('add_one', 20, 0), ('double', 20, 0),
+        ]
+
+    def test_stages_can_have_their_own_worker_counts(self):
+        pipeline = Pipeline(workers=2, queue_size=1, stages={'double': {'workers': 5}})
+        list(pipeline(double, pipeline(add_one, range(3))))
+
+        assert pipeline.stats['add_one'].workers == 2
+        assert pipeline.stats['double'].workers == 5
+        assert pipeline.stats['double'].queue_size == 5
+
+    def test_each_stage_runs_its_records_concurrently(self):
+        both_started = threading.Barrier(2, timeout=5)
+
+        def wait_for_the_other(record):
+            both_started.wait()
+            return record
+
+        assert list(self.pipeline(wait_for_the_other, [1, 2])) == [1, 2]
+
+    def test_no_more_than_queue_size_records_are_taken_from_upstream_ahead_of_the_consumer(self):
+        taken = []
+
+        def upstream():
+            for n in range(100):
+                taken.append(n)
+                yield n
+
+        records = self.pipeline(add_one, upstream())
+        assert next(records) == 1
+        assert len(taken) == 4
+
+        records.close()
+
+    def test_errors_are_raised_to_the_consumer_and_counted(self):
+        def fail_on_three(record):
+            if record == 3:
+                raise ValueError(record)
+            return record
+
+        records = self.pipeline(fail_on_three, range(10))
+        assert [next(records) for _ in range(3)] == [0, 1, 2]
+        with pytest.raises(ValueError):
+            next(records)
+
+        assert self.pipeline.stats['fail_on_three'].errors == 1
+
+    def test_timings_are_recorded_for_each_stage(self):
+        clock = mock.Mock(side_effect=[0, 1, 1, 4])
+        pipeline = Pipeline(workers=1, clock=clock)
+        list(pipeline(add_one, range(2)))
+
+        stats = pipeline.stats['add_one']
+        assert stats.busy_time == 4
+        assert stats.wall_time == 4
+        assert stats.average_time == 2
+        assert stats.utilisation == 1
+
+    def test_log_stats_logs_the_busiest_stage_first(self):
+        self.pipeline.stats['add_one'] = mock.Mock(utilisation=0.5)
+        self.pipeline.stats['double'] = mock.Mock(utilisation=0.9)
+        self.pipeline.log_stats()
+
+        assert [call[1]['extra']['stage'] for call in self.pipeline.logger.info.call_args_list] == [
+            self.pipeline.stats['double'].name, self.pipeline.stats['add_one'].name,
+        ]
+
+    def test_can_be_used_as_map_impl_for_framework_helpers(self, mock_data_client):
+        mock_data_client.get_interested_suppliers.return_value = {'interestedSuppliers': [1, 2, 3]}
+        mock_data_client.get_supplier.side_effect = lambda id: {'suppliers': {'id': id}}
+        mock_data_client.get_supplier_framework_info.side_effect = lambda id, slug: {
+            'frameworkInterest': {
+                'onFramework': True, 'frameworkSlug': slug, 'declaration': {'status': 'complete'},
+                'countersignedPath': None, 'countersignedAt': None, 'agreementId': None,
+            },
+        }
+        mock_data_client.find_draft_services_iter.return_value = iter(())
+
+        records = list(find_suppliers_with_details_and_draft_service_counts(
+            mock_data_client, 'g-cloud-8', map_impl=self.pipeline
+        ))
+
+        assert [record['supplier']['id'] for record in records] == [1, 2, 3]
+        assert list(self.pipeline.stats) == ['add_supplier_info', 'add_framework_info', 'add_draft_counts']
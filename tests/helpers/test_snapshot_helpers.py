@@ -0,0 +1,191 @@
+import gzip
+import json
+
+import mock
+import pytest
+
+from dmscripts.helpers import framework_helpers
+from dmscripts.helpers.snapshot_helpers import SnapshotClient, SnapshotError, create_snapshot
+from dmscripts.helpers.supplier_data_helpers import SupplierFrameworkData, get_email_addresses_for_supplier
+
+
+FRAMEWORK = {'slug': 'g-things-1', 'lots': [{'slug': 'saas', 'name': 'Software'}]}
+SUPPLIERS = {
+    2: {'id': 2, 'name': 'supplier 2'},
+    3: {'id': 3, 'name': 'supplier 3'},
+    5: {'id': 5, 'name': 'supplier 5, not interested'},
+}
+SUPPLIER_FRAMEWORKS = {
+    supplier_id: {
+        'supplierId': supplier_id,
+        'frameworkSlug': 'g-things-1',
+        'declaration': {'status': 'complete', 'primaryContactEmail': f'contact{supplier_id}@example.com'},
+        'onFramework': supplier_id == 2,
+        'agreementId': 20 if supplier_id == 2 else None,
+        'agreementReturned': supplier_id == 2,
+        'agreementStatus': 'signed' if supplier_id == 2 else None,
+        'countersignedPath': None,
+        'countersignedAt': None,
+    }
+    for supplier_id in (2, 3)
+}
+DRAFT_SERVICES = [
+    {'id': 1, 'supplierId': 2, 'status': 'submitted', 'lotSlug': 'saas'},
+    {'id': 2, 'supplierId': 3, 'status': 'not-submitted', 'lotSlug': 'saas'},
+    {'id': 3, 'supplierId': 2, 'status': 'failed', 'lotSlug': 'paas'},
+]
+USERS = [
+    {'id': 11, 'emailAddress': 'one@example.com', 'active': True, 'personalDataRemoved': False,
+     'supplier': {'supplierId': 2}},
+    {'id': 12, 'emailAddress': 'two@example.com', 'active': False, 'personalDataRemoved': False,
+     'supplier': {'supplierId': 2}},
+    {'id': 13, 'emailAddress': '<removed>', 'active': False, 'personalDataRemoved': True,
+     'supplier': {'supplierId': 3}},
+    {'id': 15, 'emailAddress': 'five@example.com', 'active': True, 'personalDataRemoved': False,
+     'supplier': {'supplierId': 5}},
+]
+EXPORT_USERS = [{'supplier_id': 2, 'email address': 'one@example.com', 'user_name': 'One'}]
+AGREEMENTS = {
+    20: {'id': 20, 'status': 'signed', 'signedAgreementReturnedAt': '2017-01-02T03:04:05.000006Z',
+         'signedAgreementDetails': {'signerName': 'Signer', 'signerRole': 'Boss'}},
+}
+
+
+@pytest.fixture
+def api_client(mock_data_client):
+    mock_data_client.get_framework.return_value = {'frameworks': FRAMEWORK}
+    mock_data_client.get_interested_suppliers.return_value = {'interestedSuppliers': [2, 3]}
+    mock_data_client.get_supplier.side_effect = lambda supplier_id: {'suppliers': SUPPLIERS[supplier_id]}
+    mock_data_client.find_suppliers_iter.side_effect = lambda framework=None: iter(SUPPLIERS.values())
+    mock_data_client.get_supplier_framework_info.side_effect = lambda supplier_id, framework_slug: {
+        'frameworkInterest': SUPPLIER_FRAMEWORKS[supplier_id],
+    }
+    mock_data_client.find_framework_suppliers_iter.side_effect = lambda framework_slug, with_declarations=True: iter(
+        sf if with_declarations else {key: value for key, value in sf.items() if key != 'declaration'}
+        for sf in SUPPLIER_FRAMEWORKS.values()
+    )
+    mock_data_client.find_draft_services.side_effect = lambda supplier_id, framework=None: {
+        'services': [draft for draft in DRAFT_SERVICES if draft['supplierId'] == supplier_id],
+    }
+    mock_data_client.find_draft_services_iter.side_effect = lambda supplier_id, framework=None: iter(
+        draft for draft in DRAFT_SERVICES if draft['supplierId'] == supplier_id
+    )
+    mock_data_client.find_draft_services_by_framework_iter.side_effect = lambda *args, **kwargs: iter(DRAFT_SERVICES)
+    mock_data_client.find_users_iter.side_effect = lambda supplier_id=None, **kwargs: iter(
+        user for user in USERS if supplier_id is None or user['supplier']['supplierId'] == supplier_id
+    )
+    mock_data_client.export_users.return_value = {'users': EXPORT_USERS}
+    mock_data_client.get_framework_agreement.side_effect = lambda agreement_id: {
+        'agreement': AGREEMENTS[agreement_id],
+    }
+    return mock_data_client
+
+
+@pytest.fixture
+def snapshot_client(api_client, tmpdir):
+    path = str(tmpdir.join('g-things-1.snapshot.json.gz'))
+    create_snapshot(api_client, 'g-things-1', path)
+    return SnapshotClient(path)
+
+
+def test_create_snapshot_writes_gzipped_json_for_interested_suppliers_only(api_client, tmpdir):
+    path = tmpdir.join('snapshot.json.gz')
+    create_snapshot(api_client, 'g-things-1', str(path))
+
+    with gzip.open(str(path), 'rt') as f:
+        snapshot = json.load(f)
+
+    assert snapshot['frameworkSlug'] == 'g-things-1'
+    assert sorted(snapshot['suppliers']) == ['2', '3']
+    assert sorted(snapshot['users']) == ['2', '3']
+    assert list(snapshot['agreements']) == ['20']
+    assert not tmpdir.join('snapshot.json.gz.partial').exists()
+    api_client.find_framework_suppliers_iter.assert_called_once_with('g-things-1', with_declarations=True)
+    api_client.find_suppliers_iter.assert_called_once_with(framework='g-things-1')
+    assert api_client.get_supplier.called is False
+
+
+def test_create_snapshot_fetches_suppliers_missing_from_the_suppliers_sweep(api_client, tmpdir):
+    api_client.find_suppliers_iter.side_effect = lambda framework=None: iter([SUPPLIERS[2]])
+    path = tmpdir.join('snapshot.json.gz')
+    create_snapshot(api_client, 'g-things-1', str(path))
+
+    with gzip.open(str(path), 'rt') as f:
+        snapshot = json.load(f)
+
+    assert sorted(snapshot['suppliers']) == ['2', '3']
+    api_client.get_supplier.assert_called_once_with(3)
+
+
+def test_create_snapshot_fetches_agreements_with_map_impl(api_client, tmpdir):
+    map_impl = mock.Mock(side_effect=map)
+    create_snapshot(api_client, 'g-things-1', str(tmpdir.join('snapshot.json.gz')), map_impl=map_impl)
+
+    assert list(map_impl.call_args[0][1]) == [20]
+
+
+@pytest.mark.parametrize('find_suppliers, kwargs', [
+    (framework_helpers.find_suppliers_with_details_and_draft_services, {'lot': 'saas'}),
+    (framework_helpers.find_suppliers_with_details_and_draft_service_counts, {}),
+    (framework_helpers.find_suppliers_with_details_and_draft_service_counts, {'bulk': True}),
+    (framework_helpers.find_suppliers_with_signed_framework_agreements, {}),
+])
+def test_framework_helpers_give_the_same_records_from_a_snapshot(api_client, snapshot_client, find_suppliers, kwargs):
+    assert list(find_suppliers(snapshot_client, 'g-things-1', **kwargs)) == \
+        list(find_suppliers(api_client, 'g-things-1', **kwargs))
+
+
+@pytest.mark.parametrize('bulk', (False, True))
+def test_supplier_framework_data_is_the_same_from_a_snapshot(api_client, snapshot_client, bulk):
+    from_api = SupplierFrameworkData(api_client, 'g-things-1')
+    from_api.populate_data()
+    from_snapshot = SupplierFrameworkData(snapshot_client, 'g-things-1')
+    from_snapshot.populate_data(bulk=bulk)
+
+    assert from_snapshot.data == from_api.data
+
+
+def test_get_email_addresses_for_supplier_from_a_snapshot(snapshot_client):
+    assert get_email_addresses_for_supplier(snapshot_client, 2) == ['one@example.com']
+    assert get_email_addresses_for_supplier(snapshot_client, 3) == []
+
+
+class TestSnapshotClient:
+
+    def test_other_frameworks_are_not_in_the_snapshot(self, snapshot_client):
+        with pytest.raises(SnapshotError):
+            snapshot_client.get_framework('g-things-2')
+        with pytest.raises(SnapshotError):
+            snapshot_client.get_supplier_framework_info(2, 'g-things-2')
+
+    def test_suppliers_not_in_the_snapshot_raise_snapshot_error(self, snapshot_client):
+        with pytest.raises(SnapshotError):
+            snapshot_client.get_supplier(5)
+
+    def test_framework_suppliers_can_be_filtered_like_the_api(self, snapshot_client):
+        def supplier_ids(**kwargs):
+            return [sf['supplierId'] for sf in snapshot_client.find_framework_suppliers_iter('g-things-1', **kwargs)]
+
+        assert supplier_ids(agreement_returned=False) == [3]
+        assert supplier_ids(statuses='signed') == [2]
+        assert all(
+            'declaration' not in sf
+            for sf in snapshot_client.find_framework_suppliers_iter('g-things-1', with_declarations=False)
+        )
+
+    def test_draft_services_can_be_filtered_by_lot(self, snapshot_client):
+        assert [
+            draft['id'] for draft in snapshot_client.find_draft_services_by_framework_iter('g-things-1', lot='saas')
+        ] == [1, 2]
+
+    def test_has_no_write_methods(self, snapshot_client):
+        with pytest.raises(AttributeError):
+            snapshot_client.set_framework_result
+
+    def test_rejects_files_that_are_not_snapshots(self, tmpdir):
+        path = tmpdir.join('other.json.gz')
+        with gzip.open(str(path), 'wt') as f:
+            json.dump({'frameworkSlug': 'g-things-1'}, f)
+
+        with pytest.raises(SnapshotError):
+            SnapshotClient(str(path))
@@ -3,11 +3,17 @@ import requests
 
 from docopt import docopt
 
+from dmapiclient.audit import AuditTypes
+
 from dmscripts.helpers.supplier_data_helpers import (
     country_code_to_name,
     get_supplier_ids_from_args,
     AppliedToFrameworkSupplierContextForNotify,
+    SuccessfulSupplierContextForNotify,
     SupplierFrameworkData, unsuspend_suspended_supplier_services,
+    find_services_suspended_by_user,
+    get_email_addresses_by_supplier,
+    get_email_addresses_for_supplier,
 )
 from dmscripts.data_retention_remove_supplier_declarations import SupplierFrameworkDeclarations
 from tests.assessment_helpers import BaseAssessmentTest
@@ -171,6 +177,137 @@ class TestSupplierFrameworkData:
         assert data.data == [{"supplierId": 2, "users": [{"id": 2, "supplier_id": 2}], "draft_services": []}]
         assert mock_data_client.find_draft_services_iter.call_args_list == [mock.call(2, framework="g-cloud-11")]
 
+    def test_populate_data_can_fetch_draft_services_in_bulk(self, mock_data_client):
+        data = SupplierFrameworkData(mock_data_client, "g-cloud-11", supplier_ids=[1, 2])
+
+        mock_data_client.find_framework_suppliers_iter.return_value = [
+            {"supplierId": 1},
+            {"supplierId": 2},
+            {"supplierId": 3},
+        ]
+        mock_data_client.export_users.return_value = {"users": [{"id": 1, "supplier_id": 1}]}
+        mock_data_client.find_draft_services_by_framework_iter.return_value = iter([
+            {"id": 11, "supplierId": 1},
+            {"id": 13, "supplierId": 3},
+            {"id": 12, "supplierId": 1},
+        ])
+
+        data.populate_data(bulk=True)
+
+        assert data.data == [
+            {"supplierId": 1, "users": [{"id": 1, "supplier_id": 1}], "draft_services": [
+                {"id": 11, "supplierId": 1}, {"id": 12, "supplierId": 1},
+            ]},
+            {"supplierId": 2, "users": [], "draft_services": []},
+        ]
+        mock_data_client.find_draft_services_by_framework_iter.assert_called_once_with("g-cloud-11")
+        assert mock_data_client.find_draft_services_iter.called is False
+
+    def test_populate_data_fetches_draft_services_with_map_impl(self, mock_data_client):
+        data = SupplierFrameworkData(mock_data_client, "g-cloud-11")
+
+        mock_data_client.find_framework_suppliers_iter.return_value = [{"supplierId": 1}, {"supplierId": 2}]
+        mock_data_client.export_users.return_value = {"users": []}
+        mock_data_client.find_draft_services_iter.side_effect = lambda supplier_id, framework: iter([
+            {"id": supplier_id * 10, "supplierId": supplier_id},
+        ])
+        map_impl = mock.Mock(side_effect=map)
+
+        data.populate_data(map_impl=map_impl)
+
+        assert list(map_impl.call_args[0][1]) == [1, 2]
+        assert [supplier_framework["draft_services"] for supplier_framework in data.data] == [
+            [{"id": 10, "supplierId": 1}], [{"id": 20, "supplierId": 2}],
+        ]
+
+
+class TestSuccessfulSupplierContextForNotify:
+
+    def setup(self):
+        self.client = mock.Mock()
+        self.client.get_framework.return_value = {'frameworks': {
+            'name': 'G-Cloud 11',
+            'slug': 'g-cloud-11',
+            'lots': [{'name': 'Cloud hosting'}, {'name': 'Cloud software'}],
+        }}
+        self.context = SuccessfulSupplierContextForNotify(self.client, 'g-cloud-11')
+        self.context.date_today = '1 July 2019'
+        self.context.data = [
+            {
+                'supplierId': 1,
+                'supplierName': 'Supplier 1',
+                'onFramework': True,
+                'declaration': {'primaryContactEmail': 'primary@example.com'},
+                'users': [{'email address': 'one@example.com'}, {'email address': 'primary@example.com'}],
+                'draft_services': [
+                    {'lotName': 'Cloud software', 'status': 'submitted'},
+                    {'lotName': 'Cloud hosting', 'status': 'failed'},
+                ],
+            },
+            {
+                'supplierId': 2,
+                'supplierName': 'Supplier 2',
+                'onFramework': False,
+                'declaration': {},
+                'users': [{'email address': 'two@example.com'}],
+                'draft_services': [{'lotName': 'Cloud software', 'status': 'submitted'}],
+            },
+            {
+                'supplierId': 3,
+                'supplierName': 'Supplier 3',
+                'onFramework': True,
+                'declaration': {},
+                'users': [{'email address': 'three@example.com'}],
+                'draft_services': [{'lotName': 'Cloud software', 'status': 'not-submitted'}],
+            },
+        ]
+
+    def test_iter_users_personalisations_yields_each_successful_supplier_email_address_once(self):
+        personalisation = {
+            'date': '1 July 2019',
+            'company_name': 'Supplier 1',
+            'framework_name': 'G-Cloud 11',
+            'framework_slug': 'g-cloud-11',
+            'lot_1': 'Cloud hosting - Unsuccessful',
+            'lot_2': 'Cloud software - Successful',
+        }
+
+        assert list(self.context.iter_users_personalisations()) == [
+            ('one@example.com', personalisation),
+            ('primary@example.com', personalisation),
+        ]
+        assert self.context.get_users_personalisations() == {
+            'one@example.com': personalisation,
+            'primary@example.com': personalisation,
+        }
+
+    def test_email_address_of_users_of_several_suppliers_gets_the_last_suppliers_personalisation(self):
+        self.context.data[2]['users'].append({'email address': 'primary@example.com'})
+        self.context.data[2]['draft_services'][0]['status'] = 'submitted'
+
+        personalisations = self.context.get_users_personalisations()
+
+        assert list(personalisations) == ['one@example.com', 'primary@example.com', 'three@example.com']
+        assert personalisations['one@example.com']['company_name'] == 'Supplier 1'
+        assert personalisations['primary@example.com']['company_name'] == 'Supplier 3'
+
+    def test_primary_contact_does_not_replace_an_earlier_suppliers_user(self):
+        self.context.data[2]['declaration']['primaryContactEmail'] = 'one@example.com'
+        self.context.data[2]['draft_services'][0]['status'] = 'submitted'
+
+        personalisations = self.context.get_users_personalisations()
+
+        assert personalisations['one@example.com']['company_name'] == 'Supplier 1'
+
+    def test_lots_are_only_worked_out_once_per_supplier(self):
+        with mock.patch.object(self.context, 'get_lot_dict', wraps=self.context.get_lot_dict) as get_lot_dict:
+            personalisations = list(self.context.iter_users_personalisations())
+
+        assert get_lot_dict.call_count == 2
+        # users get their own copy, so adding to one doesn't change the others
+        personalisations[0][1]['extra'] = 'value'
+        assert 'extra' not in personalisations[1][1]
+
 
 class TestAppliedToFrameworkSupplierContextForNotify:
     def test_get_suppliers_with_users_personalisations_groups_users_by_supplier_id(
@@ -202,21 +339,6 @@ class TestAppliedToFrameworkSupplierContextForNotify:
 
 
 class TestCountryCodeToName:
-    GB_COUNTRY_JSON = {
-        "GB": {
-            "index-entry-number": "6",
-            "entry-number": "6",
-            "entry-timestamp": "2016-04-05T13:23:05Z",
-            "key": "GB",
-            "item": [{
-                "country": "GB",
-                "official-name": "The United Kingdom of Great Britain and Northern Ireland",
-                "name": "United Kingdom",
-                "citizen-names": "Briton;British citizen"
-            }]
-        }
-    }
-
     GG_TERRITORY_JSON = {
         "GG": {
             "index-entry-number": "35",
@@ -234,43 +356,39 @@ class TestCountryCodeToName:
     def setup(self):
         country_code_to_name.cache_clear()
 
-    @pytest.mark.parametrize('full_code, expected_url, response, expected_name',
-                             (
-                                 ('country:GB', 'https://country.register.gov.uk/records/GB.json',
-                                  GB_COUNTRY_JSON, 'United Kingdom'),
-                                 ('territory:GG', 'https://territory.register.gov.uk/records/GG.json',
-                                  GG_TERRITORY_JSON, 'Guernsey'),
-                             ))
-    def test_correct_url_requested_and_code_converted_to_name(self, rmock, full_code, expected_url, response,
-                                                              expected_name):
+    def test_countries_are_named_from_the_bundled_country_register_without_requests(self, rmock):
+        assert country_code_to_name('country:GB') == 'United Kingdom'
+        assert rmock.request_history == []
+
+    def test_correct_url_requested_and_territory_code_converted_to_name(self, rmock):
         rmock.get(
-            expected_url,
-            json=response,
+            'https://territory.register.gov.uk/records/GG.json',
+            json=self.GG_TERRITORY_JSON,
             status_code=200
         )
 
-        country_name = country_code_to_name(full_code)
+        country_name = country_code_to_name('territory:GG')
 
-        assert country_name == expected_name
+        assert country_name == 'Guernsey'
 
     def test_404_raises(self, rmock):
         rmock.get(
-            'https://country.register.gov.uk/records/GB.json',
+            'https://territory.register.gov.uk/records/GG.json',
             status_code=404,
         )
 
         with pytest.raises(requests.exceptions.RequestException):
-            country_code_to_name('country:GB')
+            country_code_to_name('territory:GG')
 
     def test_responses_are_cached(self, rmock):
         rmock.get(
-            'https://country.register.gov.uk/records/GB.json',
-            json=self.GB_COUNTRY_JSON,
+            'https://territory.register.gov.uk/records/GG.json',
+            json=self.GG_TERRITORY_JSON,
             status_code=200
         )
 
-        country_code_to_name('country:GB')
-        country_code_to_name('country:GB')
+        country_code_to_name('territory:GG')
+        country_code_to_name('territory:GG')
 
         assert len(rmock.request_history) == 1
         assert country_code_to_name.cache_info().hits == 1
@@ -279,14 +397,14 @@ class TestCountryCodeToName:
 
     def test_retries_if_not_200(self, rmock):
         rmock.get(
-            'https://country.register.gov.uk/records/GB.json',
+            'https://territory.register.gov.uk/records/GG.json',
             [{'json': {}, 'status_code': 500},
-             {'json': self.GB_COUNTRY_JSON, 'status_code': 200}],
+             {'json': self.GG_TERRITORY_JSON, 'status_code': 200}],
         )
 
-        country_name = country_code_to_name('country:GB')
+        country_name = country_code_to_name('territory:GG')
 
-        assert country_name == 'United Kingdom'
+        assert country_name == 'Guernsey'
         assert len(rmock.request_history) == 2
 
 
@@ -385,3 +503,77 @@ class TestUnsuspendSuspendedSupplierServices:
         unsuspend_suspended_supplier_services(record, "suspending user", data_api_client, logger, dry_run=False)
         assert data_api_client.update_service_status.call_count == 1
         data_api_client.update_service_status.assert_called_with('1', 'published', 'Unsuspend services helper')
+
+    def test_uses_suspended_services_index_instead_of_audit_events(self, record, logger, data_api_client):
+        data_api_client.find_services.return_value = {'meta': {'total': 2}, 'services': [
+            {'id': '1'}, {'id': '2'}
+        ]}
+        suspended_services = {92237: {'2', '3'}, 12345: {'1'}}
+
+        unsuspend_suspended_supplier_services(
+            record, "suspending user", data_api_client, logger, dry_run=False, suspended_services=suspended_services
+        )
+
+        data_api_client.update_service_status.assert_called_once_with('2', 'published', 'Unsuspend services helper')
+        assert data_api_client.find_audit_events_iter.called is False
+
+    def test_supplier_missing_from_suspended_services_index_is_not_unsuspended(self, record, logger, data_api_client):
+        data_api_client.find_services.return_value = {'meta': {'total': 1}, 'services': [{'id': '1'}]}
+
+        unsuspend_suspended_supplier_services(
+            record, "suspending user", data_api_client, logger, dry_run=False, suspended_services={}
+        )
+
+        assert data_api_client.update_service_status.called is False
+
+
+def test_find_services_suspended_by_user(data_api_client):
+    data_api_client.find_audit_events_iter.return_value = iter([
+        {'data': {'supplierId': 92237, 'serviceId': '1'}},
+        {'data': {'supplierId': '12345', 'serviceId': '2'}},
+        {'data': {'supplierId': 92237, 'serviceId': '3'}},
+        {'data': {'supplierId': 92237, 'serviceId': '1'}},
+    ])
+
+    assert find_services_suspended_by_user(data_api_client, "suspending user") == {
+        92237: {'1', '3'},
+        12345: {'2'},
+    }
+    data_api_client.find_audit_events_iter.assert_called_once_with(
+        audit_type=AuditTypes.update_service_status, user="suspending user"
+    )
+
+
+def test_find_services_suspended_by_user_skips_events_without_a_supplier_or_service(data_api_client):
+    data_api_client.find_audit_events_iter.return_value = iter([
+        {'data': {'serviceId': '1'}},
+        {'data': {'supplierId': 92237}},
+        {'data': {}},
+        {'data': {'supplierId': 92237, 'serviceId': '3'}},
+    ])
+
+    assert find_services_suspended_by_user(data_api_client, "suspending user") == {92237: {'3'}}
+
+
+class TestGetEmailAddressesBySupplier:
+
+    def test_active_users_are_indexed_by_supplier_from_one_sweep(self, data_api_client):
+        data_api_client.find_users_iter.return_value = iter([
+            {'emailAddress': 'one@example.com', 'active': True, 'supplier': {'supplierId': 1}},
+            {'emailAddress': 'two@example.com', 'active': False, 'supplier': {'supplierId': 1}},
+            {'emailAddress': 'three@example.com', 'active': True, 'supplier': {'supplierId': 2}},
+            {'emailAddress': 'four@example.com', 'active': True, 'supplier': {'supplierId': 1}},
+        ])
+
+        assert get_email_addresses_by_supplier(data_api_client) == {
+            1: ['one@example.com', 'four@example.com'],
+            2: ['three@example.com'],
+        }
+        data_api_client.find_users_iter.assert_called_once_with(role='supplier', personal_data_removed=False)
+
+    def test_get_email_addresses_for_supplier_can_look_up_from_the_index(self, data_api_client):
+        email_addresses_by_supplier = {1: ['one@example.com']}
+
+        assert get_email_addresses_for_supplier(data_api_client, 1, email_addresses_by_supplier) == ['one@example.com']
+        assert get_email_addresses_for_supplier(data_api_client, 2, email_addresses_by_supplier) == []
+        assert data_api_client.find_users_iter.called is False
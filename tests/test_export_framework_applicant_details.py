@@ -93,6 +93,6 @@ def test_export_supplier_details_calls_helper_functions(find_suppliers, get_csv_
     get_csv_rows.return_value = ['header1', 'header2'], 'rows_iter'
     export_supplier_details(data_api_client, 'g-things-23', "filename.csv", "lot-1,lot-2")
 
-    find_suppliers.assert_called_once_with(data_api_client, 'g-things-23', map_impl=mock.ANY)
+    find_suppliers.assert_called_once_with(data_api_client, 'g-things-23', map_impl=mock.ANY, bulk=False)
     get_csv_rows.assert_called_once_with(find_suppliers.return_value, 'g-things-23', "lot-1,lot-2", logger=None)
-    write_csv.assert_called_once_with(['header1', 'header2'], 'rows_iter', "filename.csv")
+    write_csv.assert_called_once_with(['header1', 'header2'], 'rows_iter', "filename.csv", export_format='csv')
@@ -4,6 +4,7 @@ from collections import OrderedDict
 import json
 import mock
 import os
+import pytest
 from six.moves import cStringIO
 
 from dmscripts.export_framework_applications_at_close import GenerateFrameworkApplicationsCSV
@@ -174,3 +175,41 @@ def test_many_suppliers_many_lots(mock_data_client):
 
     with open(os.path.join(FIXTURES_DIR, 'test_many_suppliers_many_lots_result.csv')) as expected_file:
         assert f.getvalue() == expected_file.read()
+
+
+def test_stream_csv_matches_populated_output(mock_data_client):
+    """Streaming the rows writes the same CSV as populating the output first."""
+    with open(os.path.join(FIXTURES_DIR, 'test_supplier_frameworks_response.json')) as supplier_frameworks_response:
+        mock_data_client.find_framework_suppliers.return_value = json.loads(supplier_frameworks_response.read())
+    csv_builder = GenerateFrameworkApplicationsCSV(client=mock_data_client, target_framework_slug='test_framework_slug')
+    f = cStringIO()
+    progress = mock.Mock()
+
+    rows_written = csv_builder.stream_csv(outfile=f, progress=progress)
+
+    with open(os.path.join(FIXTURES_DIR, 'test_populate_output_suppliers_expected_result.csv')) as expected_file:
+        assert f.getvalue() == expected_file.read()
+    assert csv_builder.output == []
+    assert rows_written == csv_builder.rows_written == progress.update.call_count
+    progress.finish.assert_called_once_with()
+
+
+def test_stream_csv_keeps_rows_written_before_a_failure(mock_data_client):
+    """Rows written before the API fails are already in the output file."""
+    mock_data_client.get_framework.return_value = {'frameworks': {'lots': [{'slug': 'saas'}]}}
+    mock_data_client.find_framework_suppliers.return_value = {
+        'supplierFrameworks': [
+            {'supplierId': 123, 'supplierName': 'First supplier', 'declaration': ''},
+            {'supplierId': 456, 'supplierName': 'Second supplier', 'declaration': ''},
+        ]
+    }
+    mock_data_client.find_draft_services_iter.side_effect = [iter([]), Exception("API went away")]
+    csv_builder = GenerateFrameworkApplicationsCSV(client=mock_data_client, target_framework_slug='test_framework_slug')
+    f = mock.Mock(wraps=cStringIO())
+
+    with pytest.raises(Exception):
+        csv_builder.stream_csv(outfile=f, flush_every=1)
+
+    assert f.getvalue().splitlines()[1:] == ['123,First supplier,application,,0,0']
+    assert f.flush.called
+    assert csv_builder.rows_written == 1
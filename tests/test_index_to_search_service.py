@@ -1,13 +1,37 @@
+from multiprocessing.pool import ThreadPool
+import json
+import threading
+import time
+
+from freezegun import freeze_time
 import mock
 import pytest
 
-from dmapiclient import HTTPError
+from dmapiclient import DataAPIClient, HTTPError, SearchAPIClient
+from dmscripts.helpers.pagination_helpers import Prefetcher
 from dmscripts.index_to_search_service import (
-    do_index, BriefIndexer, ServiceIndexer
-
+    bounded_imap_unordered, checkpoint_for_run, do_index, AdaptiveConcurrencyLimit, AsyncIndexEngine, BriefIndexer,
+    BulkIndexer, FrameworkCounts, IndexCheckpoints, IndexedDocumentCache, IndexJournal, MappingProjection,
+    ServiceIndexer,
 )
 
 
+@pytest.fixture
+def local_bulk_search_api(rmock):
+    """A stand-in for the search API bulk endpoint, which rejects any document with a 'bad' field"""
+    def bulk(request, context):
+        results = []
+        for action in request.json()['actions']:
+            if 'bad' in action.get('document', {}):
+                results.append({'id': action['id'], 'status': 400, 'error': 'mapper_parsing_exception'})
+            else:
+                results.append({'id': action['id'], 'status': 200})
+        return {'results': results}
+
+    rmock.post('http://search-api/myIndex/services/bulk', json=bulk)
+    return rmock
+
+
 class TestIndexers:
 
     def setup(self):
@@ -49,34 +73,66 @@ class TestIndexers:
             indexer.create_index('myMapping')
             assert e.message == 'disaster'
 
-    def test_brief_indexer_request_items_calls_data_api_client_with_frameworks(self):
+    def test_brief_indexer_request_items_calls_data_api_client_for_each_framework(self):
         self.data_api_client.return_value.find_briefs_iter.side_effect = lambda *args, **kwargs: {
-            "live,cancelled,unsuccessful,awarded,closed": iter(('brief1', 'brief2',)),
-            "withdrawn": iter(('brief3',)),
+            "live,cancelled,unsuccessful,awarded,closed": iter((kwargs['framework'] + '-brief1',)),
+            "withdrawn": iter((kwargs['framework'] + '-brief2',)),
         }[kwargs.get("status")]
         indexer = BriefIndexer(
             'briefs', self.data_api_client.return_value, self.search_api_client.return_value, 'myIndex'
         )
-        assert tuple(indexer.request_items('framework1,framework2')) == ('brief1', 'brief2', 'brief3',)
+        assert tuple(indexer.request_items('framework1,framework2')) == (
+            'framework1-brief1', 'framework1-brief2', 'framework2-brief1', 'framework2-brief2',
+        )
         assert self.data_api_client.mock_calls == [
-            mock.call().find_briefs_iter(
-                framework='framework1,framework2',
-                status="live,cancelled,unsuccessful,awarded,closed",
-            ),
-            mock.call().find_briefs_iter(
-                framework='framework1,framework2',
-                status="withdrawn",
-            ),
+            mock.call().find_briefs_iter(framework='framework1', status="live,cancelled,unsuccessful,awarded,closed"),
+            mock.call().find_briefs_iter(framework='framework1', status="withdrawn"),
+            mock.call().find_briefs_iter(framework='framework2', status="live,cancelled,unsuccessful,awarded,closed"),
+            mock.call().find_briefs_iter(framework='framework2', status="withdrawn"),
         ]
 
-    def test_service_indexer_request_items_calls_data_api_client_with_frameworks(self):
-        self.data_api_client.return_value.find_services_iter.return_value = iter(('service1', 'service2',))
+    def test_service_indexer_request_items_calls_data_api_client_for_each_framework(self):
+        self.data_api_client.return_value.find_services_iter.side_effect = lambda framework: iter(
+            (framework + '-service1', framework + '-service2')
+        )
         indexer = ServiceIndexer(
             'services', self.data_api_client.return_value, self.search_api_client.return_value, 'myIndex'
         )
-        assert tuple(indexer.request_items('framework1,framework2')) == ('service1', 'service2',)
+        assert tuple(indexer.request_items('framework1,framework2')) == (
+            'framework1-service1', 'framework1-service2', 'framework2-service1', 'framework2-service2',
+        )
         assert self.data_api_client.return_value.find_services_iter.call_args_list == [
-            mock.call(framework='framework1,framework2')
+            mock.call(framework='framework1'),
+            mock.call(framework='framework2'),
+        ]
+
+    def test_frameworks_are_requested_concurrently(self):
+        both_started = threading.Barrier(2, timeout=1)
+
+        def find_services_iter(framework):
+            # each framework's iterator waits for the other one to have started
+            both_started.wait()
+            yield {'id': framework}
+
+        self.data_api_client.return_value.find_services_iter.side_effect = find_services_iter
+        indexer = ServiceIndexer(
+            'services', self.data_api_client.return_value, self.search_api_client.return_value, 'myIndex'
+        )
+
+        items = indexer.request_items('framework1,framework2', concurrent=True)
+
+        assert sorted(item['id'] for item in items) == ['framework1', 'framework2']
+
+    def test_requests_are_named_by_framework_if_there_are_several(self):
+        indexer = ServiceIndexer(
+            'services', self.data_api_client.return_value, self.search_api_client.return_value, 'myIndex'
+        )
+
+        assert [request[:2] for request in indexer.framework_requests('framework1')] == [
+            ('framework1', 'services'),
+        ]
+        assert [request[:2] for request in indexer.framework_requests('framework1,framework2')] == [
+            ('framework1', 'services:framework1'), ('framework2', 'services:framework2'),
         ]
 
     def test_brief_indexer_index_items_calls_search_api_client(self):
@@ -119,7 +175,7 @@ class TestIndexers:
     @mock.patch.object(BriefIndexer, 'request_items', autospec=True)
     def test_do_index_creates_brief_indexer_class_and_indexes_items(self, request_items, index_item, indexer_init):
         indexer_init.return_value = None
-        request_items.return_value = iter(('brief1', 'brief2',))
+        request_items.return_value = iter(({'id': 'brief1'}, {'id': 'brief2'},))
         do_index(
             'briefs',
             "http://search-api-url", "mySearchAPIToken",
@@ -140,11 +196,11 @@ class TestIndexers:
         assert self.search_api_client.call_args_list == [mock.call('http://search-api-url', 'mySearchAPIToken')]
 
         assert request_items.call_args_list == [
-            mock.call(mock.ANY, "framework1,framework2")
+            mock.call(mock.ANY, "framework1,framework2", prefetch_pages=0, concurrent=False)
         ]
         assert index_item.call_args_list == [
-            mock.call(mock.ANY, 'brief1'),
-            mock.call(mock.ANY, 'brief2'),
+            mock.call(mock.ANY, {'id': 'brief1'}),
+            mock.call(mock.ANY, {'id': 'brief2'}),
         ]
 
     @mock.patch.object(ServiceIndexer, '__init__', autospec=True)
@@ -152,7 +208,7 @@ class TestIndexers:
     @mock.patch.object(ServiceIndexer, 'request_items', autospec=True)
     def test_do_index_creates_service_indexer_class_and_indexes_items(self, request_items, index_item, indexer_init):
         indexer_init.return_value = None
-        request_items.return_value = iter(('service1', 'service2',))
+        request_items.return_value = iter(({'id': 'service1'}, {'id': 'service2'},))
         do_index(
             'services',
             "http://search-api-url", "mySearchAPIToken",
@@ -173,11 +229,11 @@ class TestIndexers:
         assert self.search_api_client.call_args_list == [mock.call('http://search-api-url', 'mySearchAPIToken')]
 
         assert request_items.call_args_list == [
-            mock.call(mock.ANY, "framework1,framework2")
+            mock.call(mock.ANY, "framework1,framework2", prefetch_pages=0, concurrent=False)
         ]
         assert index_item.call_args_list == [
-            mock.call(mock.ANY, 'service1'),
-            mock.call(mock.ANY, 'service2'),
+            mock.call(mock.ANY, {'id': 'service1'}),
+            mock.call(mock.ANY, {'id': 'service2'}),
         ]
 
     @mock.patch.object(ServiceIndexer, 'create_index', autospec=True)
@@ -237,3 +293,862 @@ class TestIndexers:
         assert str(e.value) == "Incorrect mapping 'services' for the supplied framework(s): g-cloud-10"
 
         assert create_index.call_args_list == []
+
+    def test_service_indexer_request_items_with_prefetching(self):
+        self.data_api_client.return_value.find_services.return_value = {
+            'services': ['service1', 'service2'], 'links': {'next': 'http://data-api-url/services?page=2'},
+        }
+        self.data_api_client.return_value._get.return_value = {'services': ['service3'], 'links': {}}
+        indexer = ServiceIndexer(
+            'services', self.data_api_client.return_value, self.search_api_client.return_value, 'myIndex'
+        )
+
+        assert tuple(indexer.request_items('framework1', prefetch_pages=2)) == ('service1', 'service2', 'service3')
+        assert self.data_api_client.return_value.find_services_iter.called is False
+        assert [(name, prefetcher.count) for name, prefetcher in indexer.prefetchers] == [('services', 2)]
+
+    def test_do_index_closes_prefetchers_if_indexing_fails(self):
+        self.data_api_client.return_value.find_services.return_value = {
+            'services': [{'id': 1, 'status': 'published'}], 'links': {'next': 'http://data-api-url/services?page=2'},
+        }
+        self.data_api_client.return_value._get.return_value = {'services': [], 'links': {}}
+        self.search_api_client.return_value.index.side_effect = ValueError()
+
+        with mock.patch.object(Prefetcher, 'close', autospec=True) as close:
+            with pytest.raises(ValueError):
+                do_index(
+                    'services',
+                    "http://search-api-url", "mySearchAPIToken",
+                    "http://data-api-url", "myDataAPIToken",
+                    mapping=False,
+                    serial=True,
+                    index="myIndex",
+                    frameworks="g-cloud-12",
+                    prefetch_pages=2,
+                )
+
+        assert close.call_count == 1
+
+    @mock.patch.object(ServiceIndexer, 'index_item', autospec=True)
+    def test_do_index_counts_items_for_each_framework(self, index_item):
+        self.data_api_client.return_value.find_services_iter.side_effect = lambda framework: iter([
+            {'id': framework + '-1', 'frameworkSlug': framework},
+            {'id': framework + '-2', 'frameworkSlug': framework},
+        ])
+
+        def fail_one_item(indexer, item):
+            if item['id'] == 'g-cloud-11-2':
+                raise HTTPError()
+
+        index_item.side_effect = fail_one_item
+
+        with mock.patch('dmscripts.index_to_search_service.FrameworkCounts.summary', autospec=True) as summary:
+            summary.return_value = ''
+            assert do_index(
+                'services',
+                "http://search-api-url", "mySearchAPIToken",
+                "http://data-api-url", "myDataAPIToken",
+                mapping=False,
+                serial=False,
+                index="myIndex",
+                frameworks="g-cloud-11,g-cloud-12",
+            ) is False
+            framework_counts = summary.call_args[0][0]
+
+        assert framework_counts.indexed == {'g-cloud-11': 1, 'g-cloud-12': 2}
+        assert framework_counts.failed == {'g-cloud-11': 1}
+
+
+class TestFrameworkCounts:
+
+    def test_summary_lists_each_framework(self):
+        counts = FrameworkCounts()
+        counts.add({'frameworkSlug': 'g-cloud-12'}, True)
+        counts.add({'frameworkSlug': 'g-cloud-11'}, True)
+        counts.add({'frameworkSlug': 'g-cloud-11'}, False)
+
+        assert counts.summary() == "g-cloud-11: 1 indexed, 1 failed, g-cloud-12: 1 indexed, 0 failed"
+
+    def test_batch_results_are_counted_per_item(self):
+        counts = FrameworkCounts()
+        worker = counts.counting(lambda batch: [True, False], batched=True)
+
+        assert worker([{'frameworkSlug': 'g-cloud-11'}, {'frameworkSlug': 'g-cloud-12'}]) == [True, False]
+        assert counts.indexed == {'g-cloud-11': 1}
+        assert counts.failed == {'g-cloud-12': 1}
+
+
+class TestBulkIndexer:
+
+    def setup(self):
+        self.indexer = ServiceIndexer(
+            'services',
+            mock.Mock(spec=DataAPIClient),
+            SearchAPIClient('http://search-api', 'mySearchAPIToken'),
+            'myIndex',
+        )
+
+    def test_batches_are_limited_by_count(self):
+        bulk_indexer = BulkIndexer(self.indexer, batch_size=2)
+        items = [{'id': i} for i in range(5)]
+
+        assert list(bulk_indexer.batches(items)) == [
+            [{'id': 0}, {'id': 1}], [{'id': 2}, {'id': 3}], [{'id': 4}],
+        ]
+
+    def test_batches_are_limited_by_size(self):
+        bulk_indexer = BulkIndexer(self.indexer, batch_size=500, max_batch_bytes=40)
+        items = [{'id': i, 'serviceName': 'x' * 10} for i in range(3)]
+
+        assert [len(batch) for batch in bulk_indexer.batches(items)] == [1, 1, 1]
+
+    def test_oversized_item_is_sent_in_a_batch_on_its_own(self):
+        bulk_indexer = BulkIndexer(self.indexer, batch_size=500, max_batch_bytes=10)
+
+        assert list(bulk_indexer.batches([{'id': 'a' * 20}])) == [[{'id': 'a' * 20}]]
+
+    def test_batch_is_sent_in_one_request(self, local_bulk_search_api):
+        bulk_indexer = BulkIndexer(self.indexer)
+        batch = [{'id': 1, 'status': 'published'}, {'id': 2, 'status': 'disabled'}]
+
+        assert bulk_indexer(batch) == [True, True]
+        assert len(local_bulk_search_api.request_history) == 1
+        assert local_bulk_search_api.request_history[0].json() == {
+            'actions': [
+                {'action': 'index', 'id': 1, 'document': {'id': 1, 'status': 'published'}},
+                {'action': 'delete', 'id': 2},
+            ],
+        }
+
+    def test_bad_document_does_not_fail_the_rest_of_the_batch(self, local_bulk_search_api):
+        bulk_indexer = BulkIndexer(self.indexer)
+        batch = [
+            {'id': 1, 'status': 'published'},
+            {'id': 2, 'status': 'published', 'bad': True},
+            {'id': 3, 'status': 'published'},
+        ]
+
+        assert bulk_indexer(batch) == [True, False, True]
+
+    def test_batch_fails_if_request_fails(self, rmock):
+        rmock.post('http://search-api/myIndex/services/bulk', status_code=400, json={'error': 'disaster'})
+        bulk_indexer = BulkIndexer(self.indexer)
+
+        assert bulk_indexer([{'id': 1, 'status': 'published'}, {'id': 2, 'status': 'published'}]) == [False, False]
+
+    def test_is_supported_sends_an_empty_batch(self, local_bulk_search_api):
+        assert BulkIndexer(self.indexer).is_supported() is True
+        assert local_bulk_search_api.request_history[0].json() == {'actions': []}
+
+    def test_is_not_supported_if_the_search_api_has_no_bulk_endpoint(self, rmock):
+        rmock.post('http://search-api/myIndex/services/bulk', status_code=404, json={'error': 'Not found'})
+
+        assert BulkIndexer(self.indexer).is_supported() is False
+
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True)
+    def test_do_index_in_bulk_mode(self, data_api_client, local_bulk_search_api):
+        data_api_client.return_value.find_services_iter.return_value = iter(
+            [{'id': i, 'status': 'published'} for i in range(5)]
+        )
+
+        assert do_index(
+            'services',
+            "http://search-api", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=True,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            bulk=True,
+            bulk_batch_size=2,
+        ) is True
+        # one request to check the endpoint exists, then one for each batch
+        assert len(local_bulk_search_api.request_history) == 4
+
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True)
+    def test_do_index_indexes_one_item_at_a_time_without_a_bulk_endpoint(self, data_api_client, rmock):
+        data_api_client.return_value.find_services_iter.return_value = iter(
+            [{'id': i, 'status': 'published'} for i in range(3)]
+        )
+        rmock.post('http://search-api/myIndex/services/bulk', status_code=404, json={'error': 'Not found'})
+        for i in range(3):
+            rmock.put(f'http://search-api/myIndex/services/{i}', json={'message': 'acknowledged'})
+
+        assert do_index(
+            'services',
+            "http://search-api", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=True,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            bulk=True,
+            bulk_batch_size=2,
+        ) is True
+        assert [request.method for request in rmock.request_history] == ['POST', 'PUT', 'PUT', 'PUT']
+
+
+class TestBoundedImapUnordered:
+
+    @pytest.mark.parametrize('bulk, queue_depth, expected_task_queue_depth', [
+        (False, 100, 100),
+        (True, 100, 10),
+        (True, 1000, 10),
+        (True, 10000, 20),
+    ])
+    @mock.patch('dmscripts.index_to_search_service.bounded_imap_unordered', autospec=True)
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.SearchAPIClient', autospec=True)
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True)
+    def test_queue_depth_is_in_batches_in_bulk_mode(
+        self, data_api_client, search_api_client, bounded_imap_unordered_mock, bulk, queue_depth,
+        expected_task_queue_depth,
+    ):
+        bounded_imap_unordered_mock.return_value = iter([])
+        do_index(
+            'services',
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=False,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            bulk=bulk,
+            bulk_batch_size=500,
+            queue_depth=queue_depth,
+        )
+
+        assert bounded_imap_unordered_mock.call_args[1]['queue_depth'] == expected_task_queue_depth
+
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.SearchAPIClient', autospec=True)
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True)
+    def test_several_batches_are_indexed_at_once_in_bulk_mode(self, data_api_client, search_api_client):
+        data_api_client.return_value.find_services_iter.return_value = iter(
+            [{'id': i, 'status': 'published'} for i in range(10)]
+        )
+        # each batch is only indexed once another is being indexed at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def bulk(url, data):
+            if data['actions']:
+                barrier.wait()
+            return {'results': [{'id': action['id'], 'status': 200} for action in data['actions']]}
+
+        search_api_client.return_value._post.side_effect = bulk
+
+        assert do_index(
+            'services',
+            "http://search-api", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=False,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            bulk=True,
+            bulk_batch_size=5,
+            queue_depth=5,
+        ) is True
+
+    def test_only_queue_depth_items_are_read_ahead_of_the_workers(self):
+        read = []
+        unblock = threading.Event()
+
+        def items():
+            for i in range(20):
+                read.append(i)
+                yield i
+
+        def slow_worker(item):
+            unblock.wait()
+            return item * 2
+
+        pool = ThreadPool(2)
+        try:
+            results = bounded_imap_unordered(pool, slow_worker, items(), queue_depth=5)
+            # give the pool's task feeder a chance to read as far ahead as it can
+            unblock.wait(0.2)
+            assert len(read) == 5
+        finally:
+            unblock.set()
+
+        assert sorted(results) == [i * 2 for i in range(20)]
+        pool.terminate()
+
+    def test_slots_are_released_if_the_worker_raises(self):
+        def worker(item):
+            if item == 0:
+                raise ValueError(item)
+            return item
+
+        pool = ThreadPool(2)
+        results = bounded_imap_unordered(pool, worker, iter(range(4)), queue_depth=1)
+        with pytest.raises(ValueError):
+            list(results)
+        pool.terminate()
+
+    def test_the_pool_can_be_terminated_with_items_in_flight(self):
+        started, unblock = threading.Event(), threading.Event()
+
+        def blocked_worker(item):
+            started.set()
+            unblock.wait()
+
+        pool = ThreadPool(1)
+        bounded_imap_unordered(pool, blocked_worker, iter(range(4)), queue_depth=1)
+        assert started.wait(5)
+
+        terminate = threading.Thread(target=pool.terminate)
+        terminate.start()
+        terminate.join(5)
+        unblock.set()
+
+        assert not terminate.is_alive()
+
+
+class TestAdaptiveConcurrencyLimit:
+
+    def test_concurrency_ramps_up_while_the_search_api_is_healthy(self):
+        limit = AdaptiveConcurrencyLimit(initial=2, maximum=4)
+        for _ in range(20):
+            limit.record(0.1)
+
+        assert limit.concurrency == 4
+
+    def test_one_unusually_quick_request_does_not_stop_concurrency_ramping_up(self):
+        limit = AdaptiveConcurrencyLimit(initial=10)
+        limit.record(0.00002)
+        for _ in range(200):
+            limit.record(0.05)
+
+        assert limit.concurrency > 10
+
+    @pytest.mark.parametrize('status_code', [429, 503])
+    def test_concurrency_is_halved_when_the_search_api_is_overloaded(self, status_code):
+        limit = AdaptiveConcurrencyLimit(initial=10)
+        limit.record(0.1, [status_code])
+
+        assert limit.concurrency == 5
+
+    def test_bad_documents_do_not_reduce_concurrency(self):
+        limit = AdaptiveConcurrencyLimit(initial=10)
+        limit.record(0.1, [400])
+
+        assert limit.concurrency == 10
+
+    def test_concurrency_is_reduced_when_latency_rises(self):
+        limit = AdaptiveConcurrencyLimit(initial=10)
+        for _ in range(10):
+            limit.record(0.1)
+        for _ in range(30):
+            limit.record(1.0)
+
+        assert limit.concurrency < 10
+
+    def test_concurrency_never_drops_below_the_minimum(self):
+        limit = AdaptiveConcurrencyLimit(initial=1, minimum=1)
+        limit.record(0.1, [429])
+
+        assert limit.concurrency == 1
+
+
+class TestAsyncIndexEngine:
+
+    def test_results_are_returned_for_every_item(self):
+        engine = AsyncIndexEngine(initial_concurrency=3)
+
+        assert sorted(engine(lambda item: item * 2, range(20))) == [i * 2 for i in range(20)]
+
+    def test_only_concurrency_limit_items_are_in_flight(self):
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+
+        def worker(item):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return True
+
+        engine = AsyncIndexEngine(initial_concurrency=3, max_concurrency=3)
+
+        assert all(engine(worker, range(12)))
+        assert peak[0] <= 3
+
+    def test_concurrency_backs_off_when_indexer_reports_overload(self):
+        search_api_client = mock.Mock()
+        search_api_client.index.side_effect = HTTPError(mock.Mock(status_code=429))
+        indexer = ServiceIndexer('services', mock.Mock(), search_api_client, 'myIndex')
+        engine = AsyncIndexEngine(initial_concurrency=8)
+
+        assert list(engine(indexer, [{'id': 1, 'status': 'published'}])) == [False]
+        assert engine.limit.concurrency == 4
+
+    def test_items_skipped_by_the_cache_do_not_affect_concurrency(self, tmp_path):
+        indexer = ServiceIndexer('services', mock.Mock(), mock.Mock(), 'myIndex')
+        cache = IndexedDocumentCache(str(tmp_path / 'cache.sqlite'), 'myIndex')
+        service = {'id': 1, 'status': 'published'}
+        cache.record(1, cache.document_hash(indexer, service))
+        engine = AsyncIndexEngine()
+
+        assert list(engine(cache.skipping(indexer, indexer), [service])) == [True]
+        assert engine.limit.baseline_latency is None
+
+    def test_worker_exceptions_are_raised(self):
+        def worker(item):
+            raise ValueError(item)
+
+        with pytest.raises(ValueError):
+            list(AsyncIndexEngine()(worker, range(3)))
+
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.SearchAPIClient', autospec=True)
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True)
+    def test_do_index_with_async_engine(self, data_api_client, search_api_client):
+        data_api_client.return_value.find_services_iter.return_value = iter(
+            [{'id': i, 'status': 'published'} for i in range(5)]
+        )
+
+        assert do_index(
+            'services',
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=False,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            async_engine=True,
+        ) is True
+        assert search_api_client.return_value.index.call_count == 5
+
+
+class TestIndexCheckpoints:
+
+    def test_checkpoint_allows_for_clock_skew(self):
+        assert checkpoint_for_run('2020-01-02T00:10:00.000000Z') == '2020-01-01T23:55:00.000000Z'
+
+    def test_missing_checkpoint_file_has_no_checkpoints(self, tmp_path):
+        checkpoints = IndexCheckpoints(str(tmp_path / 'checkpoints.json'))
+
+        assert checkpoints.get('myIndex', 'g-cloud-11') is None
+
+    def test_checkpoints_are_saved_per_index_and_framework(self, tmp_path):
+        path = str(tmp_path / 'state' / 'checkpoints.json')
+        IndexCheckpoints(path).set('myIndex', 'g-cloud-11,g-cloud-12', '2020-01-01T00:00:00.000000Z')
+
+        checkpoints = IndexCheckpoints(path)
+        assert checkpoints.get('myIndex', 'g-cloud-11') == '2020-01-01T00:00:00.000000Z'
+        assert checkpoints.get('myIndex', 'g-cloud-12') == '2020-01-01T00:00:00.000000Z'
+        assert checkpoints.get('otherIndex', 'g-cloud-12') is None
+
+    def test_earliest_checkpoint_is_used_for_several_frameworks(self, tmp_path):
+        checkpoints = IndexCheckpoints(str(tmp_path / 'checkpoints.json'))
+        checkpoints.set('myIndex', 'g-cloud-11', '2020-01-01T00:00:00.000000Z')
+        checkpoints.set('myIndex', 'g-cloud-12', '2020-02-01T00:00:00.000000Z')
+
+        assert checkpoints.get('myIndex', 'g-cloud-11,g-cloud-12') == '2020-01-01T00:00:00.000000Z'
+        assert checkpoints.get('myIndex', 'g-cloud-10,g-cloud-12') is None
+
+
+class TestIndexSinceCheckpoint:
+
+    services = [
+        {'id': 1, 'status': 'published', 'updatedAt': '2020-01-01T00:00:00.000000Z'},
+        {'id': 2, 'status': 'disabled', 'updatedAt': '2020-01-03T00:00:00.000000Z'},
+        {'id': 3, 'status': 'published', 'updatedAt': '2020-01-04T00:00:00.000000Z'},
+    ]
+
+    def setup(self):
+        self.data_api_client_patch = mock.patch(
+            'dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True
+        )
+        self.data_api_client = self.data_api_client_patch.start()
+        self.data_api_client.return_value.find_services_iter.side_effect = lambda **kwargs: iter(self.services)
+        self.search_api_client_patch = mock.patch(
+            'dmscripts.index_to_search_service.dmapiclient.SearchAPIClient', autospec=True
+        )
+        self.search_api_client = self.search_api_client_patch.start()
+
+    def teardown(self):
+        self.data_api_client_patch.stop()
+        self.search_api_client_patch.stop()
+
+    def _do_index(self, checkpoint_file):
+        return do_index(
+            'services',
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=True,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            checkpoint_file=checkpoint_file,
+        )
+
+    def test_request_items_updated_since(self):
+        indexer = ServiceIndexer('services', self.data_api_client.return_value, mock.Mock(), 'myIndex')
+
+        items = indexer.request_items_updated_since('g-cloud-12', '2020-01-03T00:00:00.000000Z')
+
+        assert [service['id'] for service in items] == [2, 3]
+
+    @freeze_time('2020-01-02')
+    def test_first_run_indexes_everything_and_saves_checkpoint(self, tmp_path):
+        checkpoint_file = str(tmp_path / 'checkpoints.json')
+
+        assert self._do_index(checkpoint_file) is True
+
+        assert self.search_api_client.return_value.index.call_count == 2
+        assert self.search_api_client.return_value.delete.call_count == 1
+        assert IndexCheckpoints(checkpoint_file).get('myIndex', 'g-cloud-12') == '2020-01-01T23:45:00.000000Z'
+
+    @freeze_time('2020-01-05')
+    def test_later_run_only_indexes_items_updated_since_checkpoint(self, tmp_path):
+        checkpoint_file = str(tmp_path / 'checkpoints.json')
+        IndexCheckpoints(checkpoint_file).set('myIndex', 'g-cloud-12', '2020-01-02T00:00:00.000000Z')
+
+        assert self._do_index(checkpoint_file) is True
+
+        assert self.search_api_client.return_value.delete.call_args_list == [mock.call('myIndex', 2)]
+        assert self.search_api_client.return_value.index.call_args_list == [
+            mock.call('myIndex', 3, self.services[2], 'services'),
+        ]
+        assert IndexCheckpoints(checkpoint_file).get('myIndex', 'g-cloud-12') == '2020-01-04T23:45:00.000000Z'
+
+    @freeze_time('2020-01-05')
+    def test_checkpoint_is_not_moved_if_indexing_fails(self, tmp_path):
+        checkpoint_file = str(tmp_path / 'checkpoints.json')
+        IndexCheckpoints(checkpoint_file).set('myIndex', 'g-cloud-12', '2020-01-02T00:00:00.000000Z')
+        self.search_api_client.return_value.index.side_effect = HTTPError()
+
+        assert self._do_index(checkpoint_file) is False
+
+        assert IndexCheckpoints(checkpoint_file).get('myIndex', 'g-cloud-12') == '2020-01-02T00:00:00.000000Z'
+
+
+class TestMappingProjection:
+
+    mapping = {
+        'mappings': {
+            'services': {
+                '_meta': {
+                    'transformations': [
+                        {'append_conditionally': {'field': 'lot', 'target_field': 'lotName'}},
+                    ],
+                },
+                'properties': {
+                    'dmtext_serviceName': {'type': 'text'},
+                    'dmfilter_lot': {'type': 'keyword'},
+                    'sortonly_serviceName': {'type': 'keyword'},
+                    'supplierName': {'type': 'text'},
+                },
+            },
+        },
+    }
+
+    def test_fields_not_used_by_the_mapping_are_stripped(self):
+        projection = MappingProjection(self.mapping)
+        service = {
+            'id': 1, 'serviceName': 'Cloud hosting', 'lot': 'cloud-hosting', 'supplierName': 'Supplier',
+            'serviceDescription': 'A very long description',
+        }
+
+        assert projection(service) == {
+            'id': 1, 'serviceName': 'Cloud hosting', 'lot': 'cloud-hosting', 'supplierName': 'Supplier',
+        }
+        assert projection.bytes_saved > len('A very long description')
+
+    def test_savings_are_only_counted_for_documents_that_are_sent(self, tmp_path):
+        projection = MappingProjection(self.mapping)
+        indexer = ServiceIndexer('services', mock.Mock(), mock.Mock(), 'myIndex')
+        indexer.projection = projection
+        cache = IndexedDocumentCache(str(tmp_path / 'cache.sqlite'), 'myIndex')
+        worker = cache.skipping(indexer, indexer)
+        service = {'id': 1, 'status': 'published', 'serviceDescription': 'A very long description'}
+
+        worker(service)
+        saved_once = projection.bytes_saved
+        worker(service)
+
+        assert saved_once > 0
+        assert projection.bytes_saved == saved_once
+
+    def test_mappings_without_document_types(self):
+        projection = MappingProjection({'mappings': {'properties': {'dmtext_title': {'type': 'text'}}}})
+
+        assert projection({'id': 1, 'title': 'Brief', 'requirementsLength': '1 week'}) == {'id': 1, 'title': 'Brief'}
+
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.SearchAPIClient', autospec=True)
+    @mock.patch('dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True)
+    def test_do_index_sends_projected_documents(self, data_api_client, search_api_client, tmp_path):
+        mapping_file = tmp_path / 'services.json'
+        mapping_file.write_text(json.dumps(self.mapping))
+        data_api_client.return_value.find_services_iter.return_value = iter([
+            {'id': 1, 'status': 'published', 'serviceName': 'Cloud hosting', 'serviceDescription': 'Hosting'},
+        ])
+
+        assert do_index(
+            'services',
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=True,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            projection_mapping_file=str(mapping_file),
+        ) is True
+        assert search_api_client.return_value.index.call_args_list == [
+            mock.call('myIndex', 1, {'id': 1, 'serviceName': 'Cloud hosting'}, 'services'),
+        ]
+
+
+class TestIndexedDocumentCache:
+
+    services = [
+        {'id': 1, 'status': 'published', 'serviceName': 'Cloud hosting'},
+        {'id': 2, 'status': 'published', 'serviceName': 'Cloud support'},
+    ]
+
+    def setup(self):
+        self.data_api_client_patch = mock.patch(
+            'dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True
+        )
+        self.data_api_client = self.data_api_client_patch.start().return_value
+        self.data_api_client.find_services_iter.side_effect = lambda **kwargs: iter(self.services)
+        self.search_api_client_patch = mock.patch(
+            'dmscripts.index_to_search_service.dmapiclient.SearchAPIClient', autospec=True
+        )
+        self.search_api_client = self.search_api_client_patch.start().return_value
+
+    def teardown(self):
+        self.data_api_client_patch.stop()
+        self.search_api_client_patch.stop()
+
+    def _do_index(self, cache_file, force=False, index='myIndex', search_api_url="http://search-api-url"):
+        return do_index(
+            'services',
+            search_api_url, "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=True,
+            index=index,
+            frameworks="g-cloud-12",
+            cache_file=cache_file,
+            force=force,
+        )
+
+    def test_unchanged_documents_are_not_sent_again(self, tmp_path):
+        cache_file = str(tmp_path / 'cache.sqlite')
+        assert self._do_index(cache_file) is True
+        self.search_api_client.index.reset_mock()
+        self.services = [self.services[0], dict(self.services[1], serviceName='Cloud support and training')]
+
+        assert self._do_index(cache_file) is True
+
+        assert self.search_api_client.index.call_args_list == [
+            mock.call('myIndex', 2, self.services[1], 'services'),
+        ]
+
+    def test_change_from_indexed_to_deleted_is_sent(self, tmp_path):
+        cache_file = str(tmp_path / 'cache.sqlite')
+        self._do_index(cache_file)
+        self.services = [dict(self.services[0], status='disabled'), self.services[1]]
+
+        assert self._do_index(cache_file) is True
+
+        assert self.search_api_client.delete.call_args_list == [mock.call('myIndex', 1)]
+
+    def test_force_sends_unchanged_documents(self, tmp_path):
+        cache_file = str(tmp_path / 'cache.sqlite')
+        self._do_index(cache_file)
+        self.search_api_client.index.reset_mock()
+
+        assert self._do_index(cache_file, force=True) is True
+
+        assert self.search_api_client.index.call_count == 2
+
+    def test_documents_are_cached_per_index(self, tmp_path):
+        cache_file = str(tmp_path / 'cache.sqlite')
+        self._do_index(cache_file)
+        self.search_api_client.index.reset_mock()
+
+        assert self._do_index(cache_file, index='otherIndex') is True
+
+        assert self.search_api_client.index.call_count == 2
+
+    def test_documents_are_cached_per_search_api(self, tmp_path):
+        cache_file = str(tmp_path / 'cache.sqlite')
+        self._do_index(cache_file)
+        self.search_api_client.index.reset_mock()
+
+        assert self._do_index(cache_file, search_api_url="http://other-search-api-url") is True
+
+        assert self.search_api_client.index.call_count == 2
+
+    @mock.patch.object(ServiceIndexer, 'create_index', autospec=True)
+    def test_documents_are_sent_again_when_the_index_is_created(self, create_index, tmp_path):
+        cache_file = str(tmp_path / 'cache.sqlite')
+        self._do_index(cache_file)
+        self.search_api_client.index.reset_mock()
+
+        assert do_index(
+            'services',
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping='services-g-cloud-12',
+            serial=True,
+            index='myIndex',
+            frameworks="g-cloud-12",
+            cache_file=cache_file,
+        ) is True
+
+        assert create_index.called is True
+        assert self.search_api_client.index.call_count == 2
+
+    def test_failed_documents_are_not_cached(self, tmp_path):
+        cache_file = str(tmp_path / 'cache.sqlite')
+        self.search_api_client.index.side_effect = HTTPError()
+        assert self._do_index(cache_file) is False
+        self.search_api_client.index.reset_mock()
+        self.search_api_client.index.side_effect = None
+
+        assert self._do_index(cache_file) is True
+
+        assert self.search_api_client.index.call_count == 2
+
+    def test_skipped_and_written_documents_are_counted(self, tmp_path):
+        indexer = ServiceIndexer('services', self.data_api_client, self.search_api_client, 'myIndex')
+        cache = IndexedDocumentCache(str(tmp_path / 'cache.sqlite'), 'myIndex')
+        worker = cache.skipping(indexer, indexer)
+
+        assert [worker(service) for service in self.services + self.services] == [True] * 4
+        assert (cache.written, cache.skipped) == (2, 2)
+
+    def test_only_changed_documents_in_a_batch_are_sent(self, tmp_path):
+        indexer = ServiceIndexer('services', self.data_api_client, self.search_api_client, 'myIndex')
+        bulk_indexer = mock.Mock(side_effect=lambda batch: [False] * len(batch))
+        cache = IndexedDocumentCache(str(tmp_path / 'cache.sqlite'), 'myIndex')
+        cache.record(1, cache.document_hash(indexer, self.services[0]))
+
+        assert cache.skipping(indexer, bulk_indexer, batched=True)(self.services) == [True, False]
+        assert bulk_indexer.call_args_list == [mock.call([self.services[1]])]
+
+
+class TestResumableIndexing:
+
+    services = [
+        {'id': 1, 'status': 'published'},
+        {'id': 2, 'status': 'published'},
+        {'id': 3, 'status': 'published'},
+    ]
+    page_2_url = 'http://data-api-url/services?framework=g-cloud-12&page=2'
+
+    def setup(self):
+        self.data_api_client_patch = mock.patch(
+            'dmscripts.index_to_search_service.dmapiclient.DataAPIClient', autospec=True
+        )
+        self.data_api_client = self.data_api_client_patch.start().return_value
+        self.data_api_client.find_services.return_value = {
+            'services': self.services[:2], 'links': {'next': self.page_2_url},
+        }
+        self.data_api_client.get_service.side_effect = lambda service_id: {'services': self.services[service_id - 1]}
+        self.search_api_client_patch = mock.patch(
+            'dmscripts.index_to_search_service.dmapiclient.SearchAPIClient', autospec=True
+        )
+        self.search_api_client = self.search_api_client_patch.start().return_value
+
+    def teardown(self):
+        self.data_api_client_patch.stop()
+        self.search_api_client_patch.stop()
+
+    def _do_index(self, journal_file, resume=False, index='myIndex'):
+        return do_index(
+            'services',
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping=False,
+            serial=True,
+            index=index,
+            frameworks="g-cloud-12",
+            journal_file=journal_file,
+            resume=resume,
+        )
+
+    def _interrupted_run(self, journal_file):
+        # indexing service 2 fails, then the data API fails fetching the second page
+        self.search_api_client.index.side_effect = lambda index, service_id, *args: (
+            self._raise(HTTPError()) if service_id == 2 else None
+        )
+        self.data_api_client._get.side_effect = HTTPError(mock.Mock(status_code=503))
+        with pytest.raises(HTTPError):
+            self._do_index(journal_file)
+        self.search_api_client.index.reset_mock()
+        self.search_api_client.index.side_effect = None
+        self.data_api_client._get.side_effect = None
+        self.data_api_client._get.reset_mock()
+        self.data_api_client.find_services.reset_mock()
+
+    @staticmethod
+    def _raise(e):
+        raise e
+
+    def test_journal_records_unfinished_pages_and_failed_items(self, tmp_path):
+        journal_file = str(tmp_path / 'journal.json')
+        self._interrupted_run(journal_file)
+
+        journal = IndexJournal(journal_file, 'myIndex', 'g-cloud-12', None, resume=True)
+        assert journal.cursors == {'services': self.page_2_url}
+        assert journal.completed == set()
+        assert journal.failed == {2}
+
+    def test_resume_skips_finished_pages_and_retries_failures(self, tmp_path):
+        journal_file = str(tmp_path / 'journal.json')
+        self._interrupted_run(journal_file)
+        self.data_api_client._get.return_value = {'services': self.services[2:], 'links': {}}
+
+        assert self._do_index(journal_file, resume=True) is True
+
+        assert self.data_api_client.find_services.called is False
+        assert self.data_api_client._get.call_args_list == [mock.call(self.page_2_url)]
+        assert self.search_api_client.index.call_args_list == [
+            mock.call('myIndex', 2, self.services[1], 'services'),
+            mock.call('myIndex', 3, self.services[2], 'services'),
+        ]
+        journal = IndexJournal(journal_file, 'myIndex', 'g-cloud-12', None, resume=True)
+        assert journal.completed == {'services'}
+        assert journal.failed == set()
+
+    def test_resumed_run_fails_if_earlier_failure_still_fails(self, tmp_path):
+        journal_file = str(tmp_path / 'journal.json')
+        self._interrupted_run(journal_file)
+        self.data_api_client._get.return_value = {'services': self.services[2:], 'links': {}}
+        self.data_api_client.get_service.side_effect = HTTPError(mock.Mock(status_code=503))
+
+        assert self._do_index(journal_file, resume=True) is False
+
+    def test_run_without_resume_starts_again(self, tmp_path):
+        journal_file = str(tmp_path / 'journal.json')
+        self._interrupted_run(journal_file)
+        self.data_api_client._get.return_value = {'services': self.services[2:], 'links': {}}
+
+        assert self._do_index(journal_file) is True
+
+        assert self.data_api_client.find_services.called is True
+        assert self.search_api_client.index.call_count == 3
+
+    def test_cannot_resume_from_journal_for_a_different_index(self, tmp_path):
+        journal_file = str(tmp_path / 'journal.json')
+        self._interrupted_run(journal_file)
+
+        with pytest.raises(ValueError):
+            self._do_index(journal_file, resume=True, index='otherIndex')
+
+    def test_pages_finished_out_of_order_only_move_cursor_when_earlier_pages_are_done(self, tmp_path):
+        journal = IndexJournal(str(tmp_path / 'journal.json'), 'myIndex', 'g-cloud-12', None)
+        pages = iter([('page-2', [{'id': 1}]), ('page-3', [{'id': 2}]), (None, [])])
+        items = list(journal._track_pages('services', pages, None))
+
+        journal.item_done(items[1], True)
+        assert journal.cursors == {}
+        journal.item_done(items[0], True)
+        assert journal.cursors == {}
+        assert journal.completed == {'services'}
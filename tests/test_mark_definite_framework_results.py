@@ -119,6 +119,29 @@ class TestNoPrevResults(BaseAssessmentTest):
 
         _assert_set_framework_result_actions(self.mock_data_client, expected_set_framework_actions, dry_run=dry_run)
 
+    @pytest.mark.parametrize("dry_run", (False, True,),)
+    def test_draft_services_can_be_counted_in_bulk(self, dry_run):
+        mark_definite_framework_results(
+            self.mock_data_client,
+            "Blazes Boylan",
+            "h-cloud-99",
+            self._declaration_definite_pass_schema(),
+            declaration_discretionary_pass_schema=self._declaration_definite_pass_schema()["definitions"]["baseline"],
+            dry_run=dry_run,
+            bulk=True,
+        )
+
+        expected_set_framework_actions = (
+            (2345, False),
+            (3456, True),
+            (4321, True),
+            (4567, False),
+            (5432, False),
+            (8765, True),
+        )
+        _assert_set_framework_result_actions(self.mock_data_client, expected_set_framework_actions, dry_run=dry_run)
+        self.mock_data_client.find_draft_services_by_framework_iter.assert_called_once_with("h-cloud-99", lot=None)
+
 
 class TestPrevResults(BaseAssessmentMismatchedOnFrameworksTestMixin, BaseAssessmentTest):
     # it's very easy to flip some of the assertions for the dry_run mode so using parametrization here
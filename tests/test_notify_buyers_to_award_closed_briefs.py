@@ -5,9 +5,10 @@ import pytest
 
 from dmutils.email.exceptions import EmailError, EmailTemplateError
 from dmscripts import notify_buyers_to_award_closed_briefs
+from dmscripts.helpers.email_helpers import Email
 
 
-class TestSendEmailToBriefUserViaNotify:
+class TestEmailForBriefUser:
 
     brief = {
         'id': 100,
@@ -21,51 +22,24 @@ class TestSendEmailToBriefUserViaNotify:
         ],
     }
 
-    @staticmethod
-    def _get_notify_email_api_response(status="success"):
-        return {
-            "id": "notify_id",
-            "reference": "client reference",
-            "email_address": "something@example.com",
-            "type": "email",
-            "status": status,
-            "template": {
-                "version": 1,  # template version num # required
-                "id": 123,  # template id # required
-                "uri": "/v2/template/123/1",  # required
-            },
-            "body": "I love notifications",
-            "subject": "Your recently closed brief",
-            "created_at": "2017-01-01",
-            "sent_at": "2017-01-01",
-            "completed_at": "2017-01-01"
-        }
-
     @mock.patch('dmscripts.notify_buyers_to_award_closed_briefs.logger', autospec=True)
-    def test_notify_users_sends_emails_to_all_active_users(self, logger):
-        notify_client = mock.Mock()
-        notify_client.send_email.return_value = self._get_notify_email_api_response()
-
+    def test_email_for_brief_user_for_an_active_user(self, logger):
         with freeze_time('2017-01-01'):
-            failed_user = notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify(
-                notify_client, 'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, None, None
+            email = notify_buyers_to_award_closed_briefs.email_for_brief_user(
+                'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, None, None
             )
 
-        assert failed_user is None
-        assert notify_client.send_email.call_args_list == [
-            mock.call(
-                'a@example.com',
-                'NOTIFY_TEMPLATE_ID',
-                {
-                    'brief_id': 100,
-                    'brief_title': 'My brief title',
-                    'framework_slug': 'framework-slug',
-                    'lot_slug': 'lot-slug',
-                    'utm_date': '20170101',
-                },
-                allow_resend=False
-            )
-        ]
+        assert email == Email(
+            'a@example.com',
+            'NOTIFY_TEMPLATE_ID',
+            {
+                'brief_id': 100,
+                'brief_title': 'My brief title',
+                'framework_slug': 'framework-slug',
+                'lot_slug': 'lot-slug',
+                'utm_date': '20170101',
+            },
+        )
         assert logger.info.call_args_list == [
             mock.call(
                 "Notifying user ID {user_id} about brief ID {brief_id}: '{brief_title}'",
@@ -73,79 +47,46 @@ class TestSendEmailToBriefUserViaNotify:
             )
         ]
 
-    def test_send_email_to_brief_user_via_notify_skips_inactive_users(self):
-        notify_client = mock.Mock()
-
+    def test_email_for_brief_user_skips_inactive_users(self):
         with freeze_time('2017-01-01'):
-            failed_user = notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify(
-                notify_client, 'NOTIFY_TEMPLATE_ID', self.brief['users'][1], self.brief, None, None
+            email = notify_buyers_to_award_closed_briefs.email_for_brief_user(
+                'NOTIFY_TEMPLATE_ID', self.brief['users'][1], self.brief, None, None
             )
 
-        assert failed_user is None
-        notify_client.assert_not_called()
-
-    def test_send_email_to_brief_user_via_notify_sends_to_user_present_in_user_id_list(self):
-        notify_client = mock.Mock()
+        assert email is None
 
+    def test_email_for_brief_user_includes_user_present_in_user_id_list(self):
         with freeze_time('2017-01-01'):
-            failed_user = notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify(
-                notify_client, 'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, [9], None
+            email = notify_buyers_to_award_closed_briefs.email_for_brief_user(
+                'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, [9], None
             )
 
-        assert failed_user is None
-        notify_client.assert_not_called()
-
-    def test_send_email_to_brief_user_via_notify_skips_user_if_not_present_in_user_id_list(self):
-        notify_client = mock.Mock()
+        assert email.to_email_address == 'a@example.com'
 
+    def test_email_for_brief_user_skips_user_if_not_present_in_user_id_list(self):
         with freeze_time('2017-01-01'):
-            failed_user = notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify(
-                notify_client, 'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, [123], None
+            email = notify_buyers_to_award_closed_briefs.email_for_brief_user(
+                'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, [123], None
             )
 
-        assert failed_user is None
-        notify_client.assert_not_called()
-
-    def test_send_email_to_brief_user_via_notify_catches_email_errors_and_returns_user_id(self):
-        notify_client = mock.Mock()
-        notify_client.send_email.side_effect = [EmailError]
-
-        with freeze_time('2017-01-01'):
-            failed_user = notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify(
-                notify_client, 'NOTIFY_TEMPLATE_ID', self.brief['users'][2], self.brief, None, None
-            )
-
-        assert failed_user == 999
-
-    def test_send_email_to_brief_user_via_notify_does_not_catch_email_template_errors(self):
-        notify_client = mock.Mock()
-        notify_client.send_email.side_effect = EmailTemplateError
-
-        with pytest.raises(EmailTemplateError):
-            notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify(
-                notify_client, 'NOTIFY_TEMPLATE_ID', self.brief['users'][2], self.brief, None, None
-            )
+        assert email is None
 
     @mock.patch('dmscripts.notify_buyers_to_award_closed_briefs.logger', autospec=True)
-    def test_send_email_to_brief_user_via_notify_logs_instead_of_sending_for_dry_runs(self, logger):
-        notify_client = mock.Mock()
-        notify_client.send_email.return_value = self._get_notify_email_api_response()
-
+    def test_email_for_brief_user_logs_instead_of_sending_for_dry_runs(self, logger):
         with freeze_time('2017-01-01'):
-            failed_user = notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify(
-                notify_client, 'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, None, True
+            email = notify_buyers_to_award_closed_briefs.email_for_brief_user(
+                'NOTIFY_TEMPLATE_ID', self.brief['users'][0], self.brief, None, True
             )
 
-        assert failed_user is None
+        assert email is None
         assert logger.info.call_args_list == [mock.call(
             "Would notify user ID {user_id} about brief ID {brief_id}: '{brief_title}'",
             extra={'brief_title': 'My brief title', 'brief_id': 100, 'user_id': 9}
         )]
-        notify_client.assert_not_called()
 
 
 @mock.patch('dmscripts.notify_buyers_to_award_closed_briefs.scripts_notify_client')
-@mock.patch('dmscripts.notify_buyers_to_award_closed_briefs.send_email_to_brief_user_via_notify')
+@mock.patch('dmscripts.notify_buyers_to_award_closed_briefs.email_for_brief_user')
 @mock.patch('dmscripts.helpers.brief_data_helpers.get_briefs_closed_on_date')
 @mock.patch('dmscripts.notify_buyers_to_award_closed_briefs.logger', autospec=True)
 class TestMain:
@@ -175,10 +116,14 @@ class TestMain:
         ]
     }
 
-    def test_main_sends_email_to_brief_user_via_notify_for_each_user_on_each_closed_brief(
-            self, logger, get_briefs_closed_on_date, send_email_to_brief_user_via_notify, notify_client):
+    @staticmethod
+    def _email(notify_template_id, user, brief, user_id_list, dry_run):
+        return Email(user['emailAddress'], notify_template_id)
+
+    def test_main_sends_email_to_each_user_on_each_closed_brief(
+            self, logger, get_briefs_closed_on_date, email_for_brief_user, notify_client):
         get_briefs_closed_on_date.return_value = [self.brief1, self.brief2]
-        send_email_to_brief_user_via_notify.return_value = []
+        email_for_brief_user.side_effect = self._email
 
         with freeze_time('2016-01-29 03:04:05'):
             assert notify_buyers_to_award_closed_briefs.main(
@@ -187,12 +132,12 @@ class TestMain:
             )
             get_briefs_closed_on_date.assert_called_once_with(mock.ANY, datetime.date(2016, 1, 1))
             notify_client.assert_called_once_with('NOTIFY_KEY', logger=mock.ANY)
-            assert send_email_to_brief_user_via_notify.call_args_list == [
+            assert email_for_brief_user.call_args_list == [
                 mock.call(
-                    notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief1['users'][0], self.brief1, None, None
+                    'NOTIFY_TEMPLATE_ID', self.brief1['users'][0], self.brief1, None, None
                 ),
                 mock.call(
-                    notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief2['users'][0], self.brief2, None, None
+                    'NOTIFY_TEMPLATE_ID', self.brief2['users'][0], self.brief2, None, None
                 ),
             ]
             assert logger.info.call_args_list == [
@@ -204,10 +149,10 @@ class TestMain:
             ]
 
     def test_main_notifies_about_briefs_closed_on_date_8_weeks_ago_using_offset_days(
-        self, logger, get_briefs_closed_on_date, send_email_to_brief_user_via_notify, notify_client
+        self, logger, get_briefs_closed_on_date, email_for_brief_user, notify_client
     ):
         get_briefs_closed_on_date.return_value = [self.brief1, self.brief2]
-        send_email_to_brief_user_via_notify.return_value = []
+        email_for_brief_user.side_effect = self._email
 
         with freeze_time('2016-02-26 03:04:05'):
             assert notify_buyers_to_award_closed_briefs.main(
@@ -215,40 +160,48 @@ class TestMain:
             )
             get_briefs_closed_on_date.assert_called_once_with(mock.ANY, datetime.date(2016, 1, 1))
             notify_client.assert_called_once_with('NOTIFY_KEY', logger=mock.ANY)
-            assert send_email_to_brief_user_via_notify.call_args_list == [
+            assert email_for_brief_user.call_args_list == [
                 mock.call(
-                    notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief1['users'][0], self.brief1, None, None
+                    'NOTIFY_TEMPLATE_ID', self.brief1['users'][0], self.brief1, None, None
                 ),
                 mock.call(
-                    notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief2['users'][0], self.brief2, None, None
+                    'NOTIFY_TEMPLATE_ID', self.brief2['users'][0], self.brief2, None, None
                 ),
             ]
 
-    def test_main_fails_when_send_email_to_brief_user_via_notify_fails(
-            self, logger, get_briefs_closed_on_date, send_email_to_brief_user_via_notify, notify_client):
+    def test_main_fails_when_sending_emails_fails(
+            self, logger, get_briefs_closed_on_date, email_for_brief_user, notify_client):
         get_briefs_closed_on_date.return_value = [self.brief1, self.brief2, self.brief3]
-        send_email_to_brief_user_via_notify.side_effect = [9, None, 999, 9999]
+        email_for_brief_user.side_effect = self._email
+        notify_client.return_value.send_email.side_effect = [EmailError("9"), {}, EmailError("999"), EmailError("9999")]
 
         assert not notify_buyers_to_award_closed_briefs.main(
             'URL', 'API_KEY', 'NOTIFY_KEY', 'NOTIFY_TEMPLATE_ID', self.OFFSET_DAYS,
-            date_closed="2017-01-01", dry_run=None
+            date_closed="2017-01-01", dry_run=None, workers=1
         )
         notify_client.assert_called_with('NOTIFY_KEY', logger=mock.ANY)
-        assert send_email_to_brief_user_via_notify.call_args_list == [
+        assert email_for_brief_user.call_args_list == [
             mock.call(
-                notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief1['users'][0], self.brief1, None, None
+                'NOTIFY_TEMPLATE_ID', self.brief1['users'][0], self.brief1, None, None
             ),
             mock.call(
-                notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief2['users'][0], self.brief2, None, None
+                'NOTIFY_TEMPLATE_ID', self.brief2['users'][0], self.brief2, None, None
             ),
             mock.call(
-                notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief3['users'][0], self.brief3, None, None
+                'NOTIFY_TEMPLATE_ID', self.brief3['users'][0], self.brief3, None, None
             ),
             mock.call(
-                notify_client.return_value, 'NOTIFY_TEMPLATE_ID', self.brief3['users'][1], self.brief3, None, None
+                'NOTIFY_TEMPLATE_ID', self.brief3['users'][1], self.brief3, None, None
             ),
         ]
-        assert logger.error.call_args_list == [
+        assert notify_client.return_value.send_email.call_args_list == [
+            mock.call('failed@example.com', 'NOTIFY_TEMPLATE_ID', None, allow_resend=False),
+            mock.call('success@example.com', 'NOTIFY_TEMPLATE_ID', None, allow_resend=False),
+            mock.call('success300@example.com', 'NOTIFY_TEMPLATE_ID', None, allow_resend=False),
+            mock.call('failed300@example.com', 'NOTIFY_TEMPLATE_ID', None, allow_resend=False),
+        ]
+        # send_emails logs each of the three failures first
+        assert logger.error.call_args_list[3:] == [
             mock.call(
                 'Email sending failed for the following buyer users of brief ID {brief_id}: {buyer_ids}',
                 extra={'brief_id': 100, 'buyer_ids': '9'}
@@ -263,8 +216,21 @@ class TestMain:
             )
         ]
 
+    def test_main_raises_email_template_errors(
+            self, logger, get_briefs_closed_on_date, email_for_brief_user, notify_client):
+        get_briefs_closed_on_date.return_value = [self.brief1, self.brief2, self.brief3]
+        email_for_brief_user.side_effect = self._email
+        notify_client.return_value.send_email.side_effect = EmailTemplateError("Missing personalisation")
+
+        with pytest.raises(EmailTemplateError):
+            notify_buyers_to_award_closed_briefs.main(
+                'URL', 'API_KEY', 'NOTIFY_KEY', 'NOTIFY_TEMPLATE_ID', self.OFFSET_DAYS,
+                date_closed="2017-01-01", dry_run=None, workers=1
+            )
+        notify_client.return_value.send_email.assert_called_once()
+
     def test_main_with_no_briefs_logs_and_returns_true(
-            self, logger, get_briefs_closed_on_date, send_email_to_brief_user_via_notify, notify_client):
+            self, logger, get_briefs_closed_on_date, email_for_brief_user, notify_client):
         get_briefs_closed_on_date.return_value = []
 
         assert notify_buyers_to_award_closed_briefs.main(
@@ -276,11 +242,11 @@ class TestMain:
             mock.call("No briefs closed on {date_closed}", extra={"date_closed": datetime.date(2017, 1, 1)})
         ]
         notify_client.assert_called_with('NOTIFY_KEY', logger=mock.ANY)
-        send_email_to_brief_user_via_notify.assert_not_called()
+        email_for_brief_user.assert_not_called()
 
     @pytest.mark.parametrize('offset_days, date_closed', [(28, '2016-01-02'), (56, '2015-12-05')])
     def test_main_doesnt_allow_date_closed_to_be_less_than_x_days_ago_by_default(
-            self, logger, get_briefs_closed_on_date, send_email_to_brief_user_via_notify, notify_client,
+            self, logger, get_briefs_closed_on_date, email_for_brief_user, notify_client,
             offset_days, date_closed
     ):
         get_briefs_closed_on_date.return_value = [self.brief1, self.brief2]
@@ -291,7 +257,7 @@ class TestMain:
                 date_closed=date_closed, dry_run=None,
             )
         notify_client.assert_not_called()
-        send_email_to_brief_user_via_notify.assert_not_called()
+        email_for_brief_user.assert_not_called()
         logger.error.assert_called_with(
             'Not allowed to notify about briefs that closed less than {} days ago', offset_days
         )
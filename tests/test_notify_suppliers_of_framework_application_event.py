@@ -141,16 +141,17 @@ class TestNotifySuppliersOfFrameworkApplicationEvent:
                 stage="production",
                 logger=self.mock_logger,
                 run_id=None,
+                workers=1,
             ) == 0
 
         assert mock_uuid4.mock_calls == [mock.call()]
         assert self.mock_data_api_client.mock_calls == [
             mock.call.get_framework("g-cloud-99"),
             mock.call.find_framework_suppliers_iter("g-cloud-99"),
-            mock.call.find_users_iter(supplier_id=303132),
-            mock.call.find_users_iter(supplier_id=303233),
-            mock.call.find_users_iter(supplier_id=303133),
-            mock.call.find_users_iter(supplier_id=313233),
+            mock.call.find_users_iter(supplier_id=303132, personal_data_removed=False),
+            mock.call.find_users_iter(supplier_id=303233, personal_data_removed=False),
+            mock.call.find_users_iter(supplier_id=303133, personal_data_removed=False),
+            mock.call.find_users_iter(supplier_id=313233, personal_data_removed=False),
         ]
 
         expected_run_id = "12345678-1234-5678-1234-567812345678"
@@ -238,16 +239,17 @@ class TestNotifySuppliersOfFrameworkApplicationEvent:
                 stage="production",
                 logger=self.mock_logger,
                 run_id=run_id,
+                workers=1,
             ) == 0
 
         assert mock_uuid4.mock_calls == []
         assert self.mock_data_api_client.mock_calls == [
             mock.call.get_framework("g-cloud-99"),
             mock.call.find_framework_suppliers_iter("g-cloud-99"),
-            mock.call.find_users_iter(supplier_id=303132),
-            mock.call.find_users_iter(supplier_id=303233),
-            mock.call.find_users_iter(supplier_id=303133),
-            mock.call.find_users_iter(supplier_id=313233),
+            mock.call.find_users_iter(supplier_id=303132, personal_data_removed=False),
+            mock.call.find_users_iter(supplier_id=303233, personal_data_removed=False),
+            mock.call.find_users_iter(supplier_id=303133, personal_data_removed=False),
+            mock.call.find_users_iter(supplier_id=313233, personal_data_removed=False),
         ]
 
         expected_run_id = str(run_id)
@@ -326,6 +328,37 @@ class TestNotifySuppliersOfFrameworkApplicationEvent:
             ) in self.mock_logger.mock_calls
         )
 
+    @mock.patch("dmscripts.notify_suppliers_of_framework_application_event.uuid4")
+    def test_bulk_looks_up_users_from_one_sweep(self, mock_uuid4):
+        mock_uuid4.return_value = uuid.UUID("12345678-1234-5678-1234-567812345678")
+        self.mock_data_api_client.find_users_iter.side_effect = lambda *a, **k: iter([
+            dict(user, supplier={"supplierId": user["supplierId"]})
+            for users in _supplier_users_by_supplier.values() for user in users
+        ])
+
+        with freeze_time('2000-06-29 02:55:55'):
+            assert notify_suppliers_of_framework_application_event(
+                data_api_client=self.mock_data_api_client,
+                notify_client=self.mock_notify_client,
+                notify_template_id="8877eeff",
+                framework_slug="g-cloud-99",
+                dry_run=False,
+                stage="production",
+                logger=self.mock_logger,
+                run_id=None,
+                workers=1,
+                bulk=True,
+            ) == 0
+
+        assert self.mock_data_api_client.mock_calls == [
+            mock.call.get_framework("g-cloud-99"),
+            mock.call.find_users_iter(role="supplier", personal_data_removed=False),
+            mock.call.find_framework_suppliers_iter("g-cloud-99"),
+        ]
+        assert [call[1][0] for call in self.mock_notify_client.send_email.mock_calls] == [
+            "one@peasoup.net", "two@peasoup.net", "two@shirts.co.ua", "three@shirts.co.ua",
+        ]
+
     def test_sending_failure_continues(self):
 
         def _send_email_side_effect(email_address, *args, **kwargs):
@@ -344,6 +377,7 @@ class TestNotifySuppliersOfFrameworkApplicationEvent:
             stage="production",
             logger=self.mock_logger,
             run_id=uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            workers=1,
         ) == 1
 
         assert mock.call.error(
@@ -376,6 +410,7 @@ class TestNotifySuppliersOfFrameworkApplicationEvent:
                 stage="production",
                 logger=self.mock_logger,
                 run_id=uuid.UUID("12345678-1234-5678-1234-567812345678"),
+                workers=1,
             )
 
         assert mock.call.error(
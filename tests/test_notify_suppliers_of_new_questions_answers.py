@@ -427,6 +427,35 @@ def test_main_can_restrict_to_custom_list_of_suppliers(
     ]
 
 
+@mock.patch(MODULE_UNDER_TEST + '.send_supplier_emails', autospec=True)
+@mock.patch(MODULE_UNDER_TEST + '.get_supplier_email_addresses_by_supplier_id', autospec=True)
+@mock.patch(MODULE_UNDER_TEST + '.get_email_addresses_by_supplier', autospec=True)
+@mock.patch(MODULE_UNDER_TEST + '.get_ids_of_interested_suppliers_for_briefs', autospec=True)
+@mock.patch(MODULE_UNDER_TEST + '.get_live_briefs_with_new_questions_and_answers_between_two_dates', autospec=True)
+@mock.patch(MODULE_UNDER_TEST + '.dmapiclient.DataAPIClient')
+def test_main_bulk_looks_up_email_addresses_from_one_index(
+    data_api_client,
+    get_live_briefs_with_new_questions_and_answers_between_two_dates,
+    get_ids_of_interested_suppliers_for_briefs,
+    get_email_addresses_by_supplier,
+    get_supplier_email_addresses_by_supplier_id,
+    send_supplier_emails
+):
+    get_live_briefs_with_new_questions_and_answers_between_two_dates.return_value = [FILTERED_BRIEFS[0]]
+    get_ids_of_interested_suppliers_for_briefs.return_value = {
+        3: [FILTERED_BRIEFS[0]["id"]],
+        4: [FILTERED_BRIEFS[0]["id"]],
+    }
+    get_email_addresses_by_supplier.return_value = {3: ['a@example.com'], 5: ['c@example.com']}
+
+    with freeze_time('2017-04-19 08:00:00'):
+        assert main('api_url', 'api_token', NOTIFY_API_KEY, 'preview', dry_run=False, bulk=True)
+
+    assert get_email_addresses_by_supplier.call_args_list == [mock.call(data_api_client.return_value)]
+    assert get_supplier_email_addresses_by_supplier_id.called is False
+    assert [c[0][1] for c in send_supplier_emails.call_args_list] == [['a@example.com']]
+
+
 @mock.patch(MODULE_UNDER_TEST + '.logger', autospec=True)
 @mock.patch(MODULE_UNDER_TEST + '.send_supplier_emails', autospec=True)
 @mock.patch(MODULE_UNDER_TEST + '.get_supplier_email_addresses_by_supplier_id', autospec=True)
@@ -4,6 +4,8 @@ import pytest
 from freezegun import freeze_time
 
 from dmutils.email import DMNotifyClient
+from dmutils.email.exceptions import EmailError
+from dmutils.email.helpers import hash_string
 from dmapiclient import DataAPIClient
 from dmscripts.notify_suppliers_with_incomplete_applications import (
     notify_suppliers_with_incomplete_applications,
@@ -150,7 +152,7 @@ class TestNotifySuppliersWithIncompleteApplications:
         with freeze_time('2025-06-24 16:00:00'):
             # Test localisation during BST, 1 week before the deadline
             notify_suppliers_with_incomplete_applications(
-                'g-cloud-10', self.data_api_client_mock, 'notify_api_key', False, self.logging_mock
+                'g-cloud-10', self.data_api_client_mock, 'notify_api_key', False, self.logging_mock, workers=1
             )
 
         assert mail_client_mock.send_email.call_count == len(expected_mails)
@@ -197,6 +199,65 @@ class TestNotifySuppliersWithIncompleteApplications:
         else:
             assert mail_client_mock.send_email.call_count == 0
 
+    @pytest.mark.parametrize(
+        'draft_services_case,framework_supplier_case,users_case,expected_mails,expected_message', message_test_cases
+    )
+    @mock.patch('dmscripts.notify_suppliers_with_incomplete_applications.scripts_notify_client', autospec=True)
+    def test_draft_services_can_be_counted_in_bulk(
+        self, mail_client_constructor_mock,
+        draft_services_case, framework_supplier_case, users_case, expected_mails, expected_message
+    ):
+        self.data_api_client_mock.find_draft_services_by_framework_iter.return_value = iter([
+            dict(draft_service, supplierId=framework_supplier_case[0]['supplierId'], lotSlug='saas')
+            for draft_service in draft_services_case
+        ] + [{'supplierId': 99, 'status': 'submitted', 'lotSlug': 'saas'}])
+        self.data_api_client_mock.find_framework_suppliers_iter.return_value = framework_supplier_case
+        self.data_api_client_mock.find_users.return_value = users_case
+
+        mail_client_mock = mail_client_constructor_mock.return_value = mock.Mock(spec=DMNotifyClient)
+        mail_client_mock.logger = mock.Mock(spec=Logger)
+
+        notify_suppliers_with_incomplete_applications(
+            'g-cloud-10', self.data_api_client_mock, 'notify_api_key', False, self.logging_mock, bulk=True, workers=1
+        )
+
+        assert [call[0][0] for call in mail_client_mock.send_email.call_args_list] == expected_mails
+        assert all(call[0][2]['message'] == expected_message for call in mail_client_mock.send_email.call_args_list)
+        self.data_api_client_mock.find_draft_services_by_framework_iter.assert_called_once_with('g-cloud-10', lot=None)
+        assert self.data_api_client_mock.find_draft_services_iter.called is False
+
+    @mock.patch('dmscripts.notify_suppliers_with_incomplete_applications.scripts_notify_client', autospec=True)
+    def test_failed_emails_are_counted(self, mail_client_constructor_mock):
+        self.data_api_client_mock.find_draft_services_iter.return_value = []
+        self.data_api_client_mock.find_framework_suppliers_iter.return_value = FRAMEWORK_SUPPLIERS_TEST_CASES[1][0]
+        self.data_api_client_mock.find_users.return_value = USERS_TEST_CASES[1][0]
+
+        mail_client_mock = mail_client_constructor_mock.return_value = mock.Mock(spec=DMNotifyClient)
+        mail_client_mock.send_email.side_effect = [EmailError("bad address"), {}]
+
+        assert notify_suppliers_with_incomplete_applications(
+            'g-cloud-10', self.data_api_client_mock, 'notify_api_key', False, self.logging_mock, workers=1
+        ) == 1
+        assert mail_client_mock.send_email.call_args_list == [
+            mock.call('abc@example.com', mock.ANY, mock.ANY, allow_resend=False),
+            mock.call('efg@efg.com', mock.ANY, mock.ANY, allow_resend=False),
+        ]
+
+    @mock.patch('dmscripts.notify_suppliers_with_incomplete_applications.scripts_notify_client', autospec=True)
+    def test_dry_run_sends_no_emails(self, mail_client_constructor_mock):
+        self.data_api_client_mock.find_draft_services_iter.return_value = []
+        self.data_api_client_mock.find_framework_suppliers_iter.return_value = FRAMEWORK_SUPPLIERS_TEST_CASES[1][0]
+        self.data_api_client_mock.find_users.return_value = USERS_TEST_CASES[1][0]
+
+        assert notify_suppliers_with_incomplete_applications(
+            'g-cloud-10', self.data_api_client_mock, 'notify_api_key', True, self.logging_mock
+        ) == 0
+        assert mail_client_constructor_mock.return_value.send_email.called is False
+        assert self.logging_mock.info.call_args_list == [
+            mock.call(f"[Dry Run] Sending email to supplier '1' user '{hash_string('abc@example.com')}'"),
+            mock.call(f"[Dry Run] Sending email to supplier '1' user '{hash_string('efg@efg.com')}'"),
+        ]
+
     @pytest.mark.parametrize('framework_status', ['coming', 'pending', 'standstill', 'live', 'expired'])
     def test_notify_suppliers_with_incomplete_applications_fails_for_non_open_frameworks(self, framework_status):
         self.data_api_client_mock.get_framework.return_value = FrameworkStub(
@@ -167,3 +167,22 @@ class TestGetAllEmailAddressesForSupplier:
         assert data_api_client.find_users_iter.call_args_list == [
             mock.call(supplier_id=12345)
         ]
+
+    def test_get_all_email_addresses_for_supplier_from_index(self):
+        data_api_client = mock.Mock()
+        framework_interest = {
+            "frameworkInterest": {
+                "supplierId": "12345",
+                "declaration": {
+                    "primaryContactEmail": "trent.reznor@example.com"
+                }
+            }
+        }
+
+        assert get_all_email_addresses_for_supplier(
+            data_api_client, framework_interest, email_addresses_by_supplier={12345: ["one_inch_nail@example.com"]}
+        ) == {
+            "trent.reznor@example.com",
+            "one_inch_nail@example.com",
+        }
+        assert data_api_client.find_users_iter.called is False
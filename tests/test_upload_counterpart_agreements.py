@@ -227,6 +227,7 @@ def test_upload_counterpart_file_sends_correct_emails(
                 dm_notify_client=dm_notify_client,
                 notify_template_id="dead-beef-baad-f00d",
                 notify_fail_early=notify_fail_early,
+                workers=1,
             )
 
         assert bucket.save.called is True
@@ -362,6 +363,7 @@ def test_fails_if_email_template_error(
                 dm_notify_client=dm_notify_client,
                 notify_template_id="dead-beef-baad-f00d",
                 notify_fail_early=notify_fail_early,
+                workers=1,
             )
 
         assert bucket.save.called is True